@@ -7,6 +7,7 @@ import os
 # Third-party
 import colorlog  # noqa: F401
 from django.conf.locale import LANG_INFO
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 # SETTINGS_DIR is where this settings file is
@@ -43,6 +44,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "legal_tools.middleware.PageCacheMiddleware",
 ]
 
 ROOT_URLCONF = "cc_legal_tools.urls"
@@ -53,7 +55,6 @@ TEMPLATES = [
         "DIRS": [
             os.path.join(PROJECT_ROOT, "templates"),
         ],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.debug",
@@ -62,9 +63,91 @@ TEMPLATES = [
                 "django.contrib.messages.context_processors.messages",
                 "dealer.contrib.django.context_processor",
             ],
+            # Cached loader that records the templates of each page for the
+            # publish dependency graph (see legal_tools.dependencies)
+            "loaders": [
+                (
+                    "legal_tools.dependencies.TemplateLoader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
         },
     },
 ]
+try:
+    # Third-party
+    import jinja2
+except ImportError:  # pragma: no cover
+    jinja2 = None
+else:
+    TEMPLATES.append(
+        {
+            "BACKEND": "django.template.backends.jinja2.Jinja2",
+            "DIRS": [
+                os.path.join(PROJECT_ROOT, "templates", "jinja2"),
+            ],
+            "OPTIONS": {
+                "environment": "legal_tools.jinja2.environment",
+            },
+        },
+    )
+
+# Unix socket of the render daemon (manage.py render_daemon), which publish
+# uses to render the pages when it is running
+RENDER_DAEMON_SOCKET = os.getenv(
+    "RENDER_DAEMON_SOCKET", os.path.join(PROJECT_ROOT, ".render_daemon.sock")
+)
+
+# Template engine used to render the public pages (deeds, legal codes, lists,
+# and redirects): "django" or "jinja2" (requires the jinja2 module)
+PUBLIC_TEMPLATE_ENGINE = os.getenv("PUBLIC_TEMPLATE_ENGINE", "django")
+if PUBLIC_TEMPLATE_ENGINE == "jinja2" and jinja2 is None:
+    raise ImproperlyConfigured(
+        "PUBLIC_TEMPLATE_ENGINE=jinja2 requires the jinja2 module."
+    )
+
+# Serve the public pages from the page cache (CACHES["pages"]) when the app is
+# served dynamically (see legal_tools.middleware.PageCacheMiddleware)
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Maximum number of database queries of a page rendered by publish (publish
+# fails if a page exceeds it, see publish --query-budget). Unset: no budget
+PUBLISH_QUERY_BUDGET = os.getenv("PUBLISH_QUERY_BUDGET")
+if PUBLISH_QUERY_BUDGET is not None:
+    PUBLISH_QUERY_BUDGET = int(PUBLISH_QUERY_BUDGET)
+
+# Dependency graph of the pages written by publish (see publish
+# --changed-since and legal_tools.dependencies)
+PUBLISH_DEPENDENCIES_FILE = os.getenv(
+    "PUBLISH_DEPENDENCIES_FILE",
+    os.path.join(PROJECT_ROOT, ".publish_dependencies.json"),
+)
+
+# Maximum peak of the memory allocated by Python during publish, in MiB
+# (publish fails if it is exceeded, see publish --max-memory). Unset: no limit
+PUBLISH_MAX_MEMORY = os.getenv("PUBLISH_MAX_MEMORY")
+if PUBLISH_MAX_MEMORY is not None:
+    PUBLISH_MAX_MEMORY = int(PUBLISH_MAX_MEMORY)
+
+# Extraction cache of load_html_files: the messages, titles, and HTML it
+# extracted from the legacy HTML files (see IMPORTER_VERSION)
+EXTRACTION_CACHE_DIR = os.getenv(
+    "EXTRACTION_CACHE_DIR", os.path.join(PROJECT_ROOT, ".extraction_cache")
+)
+
+# Hashes of the .po files and of the .mo files compiled from them (see the
+# compile_translations command)
+TRANSLATION_HASHES_FILE = os.getenv(
+    "TRANSLATION_HASHES_FILE",
+    os.path.join(PROJECT_ROOT, ".translation_hashes.json"),
+)
 
 WSGI_APPLICATION = "cc_legal_tools.wsgi.application"
 
@@ -330,7 +413,30 @@ CACHES = {
         # memcached running or not.
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     },
+    "fragments": {
+        # Rendered template fragments (see the fragmentcache template tag).
+        # The keys include the translation files, so entries never expire.
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    "pages": {
+        # Rendered public pages (see PAGE_CACHE_ENABLED). The keys include the
+        # build identifier, so entries never expire.
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
 }
+# A file-based page cache is shared by the processes serving the app and
+# survives restarts
+if "PAGE_CACHE_DIR" in os.environ:
+    CACHES["pages"] = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ["PAGE_CACHE_DIR"],
+        "TIMEOUT": None,
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
 # This will use memcached if we have it, and otherwise just not cache.
 if "CACHE_HOST" in os.environ:
     CACHES["default"] = {
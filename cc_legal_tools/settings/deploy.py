@@ -114,9 +114,10 @@ for backend in TEMPLATES:  # noqa: F405
             backend["APP_DIRS"] = False
         loaders = backend["OPTIONS"].get("loaders", default_loaders)
         for loader in loaders:
-            if (
-                len(loader) == 2
-                and loader[0] == "django.template.loaders.cached.Loader"
+            if len(loader) == 2 and loader[0] in (
+                "django.template.loaders.cached.Loader",
+                # Cached loader that records the templates of each page
+                "legal_tools.dependencies.TemplateLoader",
             ):
                 # We're already caching our templates
                 break
@@ -42,6 +42,7 @@ docker-compose exec app ./manage.py \
         --ignore **/includes/legalcode_licenses_4.0.html \
         --ignore **/includes/legalcode_menu_sidebar.html \
         --ignore **/includes/legalcode_zero.html \
+        --ignore templates/jinja2 \
         --no-obsolete
 echo
 
@@ -145,6 +146,7 @@ docker-compose exec app ./manage.py \
         --ignore **/includes/legalcode_licenses_4.0.html \
         --ignore **/includes/legalcode_menu_sidebar.html \
         --ignore **/includes/legalcode_zero.html \
+        --ignore templates/jinja2 \
         --no-obsolete
 echo
 
@@ -33,6 +33,7 @@ docker-compose exec app coverage run manage.py \
         --ignore **/includes/legalcode_licenses_4.0.html \
         --ignore **/includes/legalcode_menu_sidebar.html \
         --ignore **/includes/legalcode_zero.html \
+        --ignore templates/jinja2 \
         --no-obsolete \
         --verbosity 2
 echo
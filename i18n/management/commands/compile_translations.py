@@ -0,0 +1,134 @@
+# Standard library
+import glob
+import json
+import logging
+import os
+from argparse import ArgumentParser
+
+# Third-party
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+# First-party/Local
+from i18n.utils import compile_pofiles
+
+LOG = logging.getLogger(__name__)
+LOG_LEVELS = {
+    0: logging.ERROR,
+    1: logging.WARNING,
+    2: logging.INFO,
+    3: logging.DEBUG,
+}
+
+
+def load_hashes(path):
+    """
+    Load the recorded hashes, keyed by absolute .po path.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as hashes_file:
+            hashes = json.load(hashes_file)["pofiles"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return {}
+    return {
+        os.path.join(settings.DATA_REPOSITORY_DIR, relpath): recorded
+        for relpath, recorded in hashes.items()
+    }
+
+
+def save_hashes(path, hashes):
+    """
+    Save the hashes (of the .po files that still exist), keyed by .po path
+    relative to the data repository.
+    """
+    hashes = {
+        os.path.relpath(pofile_path, settings.DATA_REPOSITORY_DIR): recorded
+        for pofile_path, recorded in hashes.items()
+        if os.path.isfile(pofile_path)
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as hashes_file:
+        json.dump({"pofiles": hashes}, hashes_file, indent=2, sort_keys=True)
+        hashes_file.write("\n")
+    os.replace(temp_path, path)
+
+
+class Command(BaseCommand):
+    """
+    Compile the translation (.po) files into .mo files across a pool of
+    processes. Only the .po files that changed since their .mo files were
+    compiled (or whose .mo files are missing or were changed by something
+    else) are compiled, per the hashes recorded in
+    settings.TRANSLATION_HASHES_FILE. Each .mo file is written to a temporary
+    file that is then renamed into place.
+    """
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            help="PO files or directories containing PO files, relative to"
+            f" {settings.DATA_REPOSITORY_DIR} (default: the directories of"
+            " settings.LOCALE_PATHS)",
+            metavar="FILE_OR_DIRECTORY",
+        )
+        parser.add_argument(
+            "-f",
+            "--force",
+            action="store_true",
+            help="Compile every PO file, even if its MO file is current",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="Number of processes (default: the number of CPUs)",
+        )
+
+    def get_pofile_paths(self, paths):
+        pofile_paths = set()
+        for path in paths:
+            target = os.path.abspath(
+                os.path.join(settings.DATA_REPOSITORY_DIR, path)
+            )
+            if os.path.isfile(target) and target.endswith(".po"):
+                pofile_paths.add(target)
+            elif os.path.isdir(target):
+                pofile_paths.update(
+                    glob.glob(f"{target}/**/*.po", recursive=True)
+                )
+            else:
+                raise CommandError(
+                    "invalid FILE_OR_DIRECTORY--resulting path is not a PO"
+                    f" file or a directory: {target}"
+                )
+        return sorted(pofile_paths)
+
+    def handle(self, **options):
+        LOG.setLevel(LOG_LEVELS[int(options["verbosity"])])
+        paths = options["paths"] or [
+            str(path) for path in settings.LOCALE_PATHS
+        ]
+        pofile_paths = self.get_pofile_paths(paths)
+        hashes_path = settings.TRANSLATION_HASHES_FILE
+        hashes = load_hashes(hashes_path)
+        try:
+            recompiled, skipped, failed = compile_pofiles(
+                pofile_paths,
+                hashes,
+                force=options["force"],
+                max_workers=options["jobs"],
+            )
+        finally:
+            save_hashes(hashes_path, hashes)
+        for pofile_path in recompiled:
+            LOG.info(f"Compiled {pofile_path}")
+        self.stdout.write(
+            f"{len(recompiled)} catalogs recompiled, {len(skipped)} skipped"
+            " (unchanged)"
+        )
+        if failed:
+            raise CommandError(
+                f"{len(failed)} catalogs could not be compiled."
+            )
@@ -1,6 +1,7 @@
 # Standard library
 import datetime
 import os
+import tempfile
 from unittest import mock
 from unittest.mock import MagicMock
 
@@ -13,6 +14,8 @@ from django.test import TestCase, override_settings
 # First-party/Local
 from i18n.utils import (
     active_translation,
+    compile_pofile,
+    compile_pofiles,
     get_default_language_for_jurisdiction,
     get_jurisdiction_name,
     get_pofile_creation_date,
@@ -297,6 +300,69 @@ class PofileTestSimple(TestCase):
         pofile.save.assert_called_with(path)
         pofile.save_as_mofile.assert_called_with("/foo/bar.mo")
 
+    def test_compile_pofile(self):
+        pofile = polib.POFile()
+        pofile.metadata = {"Content-Type": "text/plain; charset=UTF-8"}
+        pofile.append(
+            polib.POEntry(msgid="Attribution", msgstr="Naamsvermelding")
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pofile_path = os.path.join(tmpdir, "django.po")
+            pofile.save(pofile_path)
+            mofile_path = compile_pofile(pofile_path)
+            self.assertEqual(os.path.join(tmpdir, "django.mo"), mofile_path)
+            # No temporary file is left behind
+            self.assertEqual(
+                ["django.mo", "django.po"], sorted(os.listdir(tmpdir))
+            )
+            mofile = polib.mofile(mofile_path)
+            self.assertEqual(
+                "Naamsvermelding", mofile.find("Attribution").msgstr
+            )
+
+    def test_compile_pofiles(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            pofile_paths = []
+            for name in ["nl", "de", "invalid"]:
+                pofile_path = os.path.join(tmpdir, f"{name}.po")
+                with open(pofile_path, "w") as f:
+                    if name == "invalid":
+                        f.write('msgid "Attribution"\nmsgstr\n')
+                    else:
+                        f.write(f'msgid "Attribution"\nmsgstr "{name}"\n')
+                pofile_paths.append(pofile_path)
+            nl, de, invalid = pofile_paths
+            hashes = {}
+            with self.assertLogs("i18n.utils", "ERROR"):
+                self.assertEqual(
+                    ([de, nl], [], [invalid]),
+                    compile_pofiles(pofile_paths, hashes, max_workers=2),
+                )
+            self.assertEqual([de, nl], sorted(hashes))
+            pofile_paths.remove(invalid)
+
+            # Unchanged
+            self.assertEqual(
+                ([], [nl, de], []), compile_pofiles(pofile_paths, hashes)
+            )
+            # Changed .po file, changed .mo file
+            with open(nl, "a") as f:
+                f.write('\nmsgid "Share"\nmsgstr "Delen"\n')
+            with open(de.replace(".po", ".mo"), "wb") as f:
+                f.write(b"")
+            self.assertEqual(
+                ([de, nl], [], []), compile_pofiles(pofile_paths, hashes)
+            )
+            self.assertEqual(
+                "Delen",
+                polib.mofile(nl.replace(".po", ".mo")).find("Share").msgstr,
+            )
+            # Forced
+            self.assertEqual(
+                ([de, nl], [], []),
+                compile_pofiles(pofile_paths, hashes, force=True),
+            )
+
 
 class PofileTestWithData(TestCase):
     def test_write_transstats_csv(self):
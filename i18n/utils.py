@@ -1,7 +1,11 @@
 # Standard library
 import csv
+import gettext as gettext_module
+import hashlib
+import logging
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from contextlib import contextmanager
 
 # Third-party
@@ -22,6 +26,7 @@ from i18n import (
     LANGMAP_LEGACY_TO_DJANGO,
 )
 
+LOG = logging.getLogger(__name__)
 CACHED_APPLICABLE_LANGS = {}
 CACHED_WELL_TRANSLATED_LANGS = {}
 
@@ -129,6 +134,28 @@ def active_translation(
         _active.value = previous_translation
 
 
+def get_translation_files(language_code: str, domain: str) -> tuple:
+    """
+    Return the path, modification time (ns), and size of each compiled
+    translation (.mo) file in settings.LOCALE_PATHS that gettext would use for
+    the language code and domain (including the base language fallbacks).
+
+    Unlike the translation objects, this reflects the files as they are right
+    now, so it can be used to identify cached translated content.
+    """
+    locale = translation.to_locale(language_code)
+    translation_files = []
+    for localedir in settings.LOCALE_PATHS:
+        for mofile_path in gettext_module.find(
+            domain, localedir, [locale], all=True
+        ):
+            stat = os.stat(mofile_path)
+            translation_files.append(
+                (mofile_path, stat.st_mtime_ns, stat.st_size)
+            )
+    return tuple(translation_files)
+
+
 def save_pofile_as_pofile_and_mofile(pofile: polib.POFile, pofile_path: str):
     """Returns pofile_abspath, mofile_abspath"""
     pofile.save(pofile_path)
@@ -143,6 +170,94 @@ def save_content_as_pofile_and_mofile(path: str, content: bytes):
     return save_pofile_as_pofile_and_mofile(pofile, path)
 
 
+def compile_pofile(pofile_path: str) -> str:
+    """
+    Compile the .po file into the .mo file next to it. The .mo file is written
+    to a hidden temporary file that is then renamed into place, so readers
+    never see a partially written .mo file.
+
+    Returns mofile_abspath
+    """
+    mofile_path = re.sub(r"\.po$", ".mo", pofile_path)
+    temp_path = os.path.join(
+        os.path.dirname(mofile_path),
+        f".{os.path.basename(mofile_path)}.{os.getpid()}.tmp",
+    )
+    try:
+        polib.pofile(pofile_path).save_as_mofile(temp_path)
+        os.replace(temp_path, mofile_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return mofile_path
+
+
+def get_file_sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def is_mofile_current(pofile_path: str, hashes: dict) -> bool:
+    """
+    Return True if the .mo file of the .po file was compiled from the current
+    content of the .po file and has not changed since, per the recorded
+    hashes (see compile_pofiles).
+    """
+    recorded = hashes.get(pofile_path)
+    if not recorded:
+        return False
+    mofile_path = re.sub(r"\.po$", ".mo", pofile_path)
+    try:
+        mo_sha256 = get_file_sha256(mofile_path)
+    except FileNotFoundError:
+        return False
+    return (
+        recorded.get("po_sha256") == get_file_sha256(pofile_path)
+        and recorded.get("mo_sha256") == mo_sha256
+    )
+
+
+def compile_pofiles(
+    pofile_paths: list, hashes: dict, force=False, max_workers=None
+):
+    """
+    Compile the .po files whose .mo files are not current (see
+    is_mofile_current) across a pool of processes, and record the hashes of
+    each compiled .po file and of its .mo file in hashes (keyed by .po path).
+
+    Returns recompiled, skipped, failed (lists of .po paths)
+    """
+    recompiled, skipped, failed = [], [], []
+    to_compile = {}
+    for pofile_path in pofile_paths:
+        if not force and is_mofile_current(pofile_path, hashes):
+            skipped.append(pofile_path)
+        else:
+            to_compile[pofile_path] = get_file_sha256(pofile_path)
+    if not to_compile:
+        return recompiled, skipped, failed
+    with ProcessPoolExecutor(max_workers) as executor:
+        futures = {
+            executor.submit(compile_pofile, pofile_path): pofile_path
+            for pofile_path in to_compile
+        }
+        for future in as_completed(futures):
+            pofile_path = futures[future]
+            try:
+                mofile_path = future.result()
+            except Exception as e:
+                LOG.error(f"Cannot compile {pofile_path}: {e}")
+                hashes.pop(pofile_path, None)
+                failed.append(pofile_path)
+                continue
+            hashes[pofile_path] = {
+                "po_sha256": to_compile[pofile_path],
+                "mo_sha256": get_file_sha256(mofile_path),
+            }
+            recompiled.append(pofile_path)
+    return sorted(recompiled), skipped, sorted(failed)
+
+
 def get_pofile_content(pofile: polib.POFile) -> str:  # pragma: no cover
     """
     Return the content of the pofile object - a string that contains what would
@@ -0,0 +1,484 @@
+"""
+Benchmarks of the hot paths of rendering (publish), importing
+(load_html_files), and internationalization, used by the benchmark command.
+
+The synthetic data generator populates the database (and a Deeds & UX locale
+directory) with realistic counts of tools, legal codes, and .po files so that
+the benchmarks do not depend on the data repository.
+"""
+# Standard library
+import json
+import logging
+import os
+import re
+import timeit
+
+# Third-party
+import polib
+from django.conf import settings
+from django.conf.locale import LANG_INFO
+from django.db.models import Count
+from django.template import engines
+from django.test.utils import override_settings
+from django.utils import translation
+
+# First-party/Local
+from i18n import DEFAULT_JURISDICTION_LANGUAGES
+from i18n.utils import load_deeds_ux_translations
+from legal_tools import lxml_importers
+from legal_tools.management.commands.load_html_files import (
+    Command as LoadHtmlFilesCommand,
+)
+from legal_tools.models import LegalCode, Tool
+from legal_tools.utils import (
+    compute_canonical_url,
+    get_url_content,
+    parse_legal_code_filename,
+)
+from legal_tools.views import (
+    get_language_table,
+    get_languages_and_links_for_deeds_ux,
+    get_languages_and_links_for_legal_codes,
+    render_redirect,
+)
+
+LOG = logging.getLogger(__name__)
+# Languages of the synthetic legal codes (and Deeds & UX .po files)
+SYNTHETIC_LANGUAGE_CODES = [
+    "ar",
+    "cs",
+    "de",
+    "el",
+    "en",
+    "es",
+    "eu",
+    "fi",
+    "fr",
+    "hr",
+    "id",
+    "it",
+    "ja",
+    "ko",
+    "kv",
+    "lt",
+    "mi",
+    "nl",
+    "no",
+    "pl",
+    "pt",
+    "ro",
+    "ru",
+    "sl",
+    "sv",
+    "tr",
+    "uk",
+    "zh-hans",
+    "zh-hant",
+]
+SYNTHETIC_UNITS = ["by", "by-nc", "by-nc-nd", "by-nc-sa", "by-nd", "by-sa"]
+SYNTHETIC_PORTED_VERSIONS = ["2.0", "2.5", "3.0"]
+SYNTHETIC_UNPORTED_VERSIONS = ["1.0", "2.0", "2.5", "3.0"]
+SYNTHETIC_PERCENTS_TRANSLATED = [100, 95, 85, 70, 60, 45, 20]
+JURISDICTION_RE = re.compile(r"^(?:[a-z]{2}|igo|scotland)$")
+# Legacy HTML files of each of the importers (see load_html_files)
+IMPORTER_FILENAMES = {
+    "import_by_40_license_html": "by_4.0.html",
+    "import_by_30_unported_license_html": "by_3.0.html",
+    "import_zero_license_html": "zero_1.0.html",
+    "simple_import_license_html": "by_3.0_de.html",
+}
+PARSE_FILENAMES = [
+    "by_4.0.html",
+    "by-nc-sa_4.0_zh-Hans.html",
+    "by-sa_3.0_de.html",
+    "by-nc-nd_2.5_scotland.html",
+    "samplingplus_1.0_br.html",
+    "zero_1.0_fr.html",
+    "certification_1.0.html",
+]
+
+
+def get_synthetic_language_codes(count):
+    return [
+        language_code
+        for language_code in SYNTHETIC_LANGUAGE_CODES
+        if language_code in LANG_INFO
+    ][:count]
+
+
+def get_synthetic_jurisdictions(count):
+    jurisdictions = [
+        jurisdiction
+        for jurisdiction, language_code in sorted(
+            DEFAULT_JURISDICTION_LANGUAGES.items()
+        )
+        if JURISDICTION_RE.match(jurisdiction) and language_code in LANG_INFO
+    ]
+    return jurisdictions[:count]
+
+
+def create_synthetic_tool(category, unit, version, jurisdiction_code=""):
+    return Tool.objects.create(
+        canonical_url=compute_canonical_url(
+            category, unit, version, jurisdiction_code
+        ),
+        category=category,
+        unit=unit,
+        version=version,
+        jurisdiction_code=jurisdiction_code,
+        creator_url="https://creativecommons.org",
+        deed_only=False,
+        permits_derivative_works="nd" not in unit.split("-"),
+        permits_reproduction=True,
+        permits_distribution=True,
+        permits_sharing=True,
+        requires_share_alike="sa" in unit.split("-"),
+        requires_notice=category == "licenses",
+        requires_attribution=category == "licenses",
+        requires_source_code=False,
+        prohibits_commercial_use="nc" in unit.split("-"),
+        prohibits_high_income_nation_use=False,
+    )
+
+
+def create_synthetic_legal_code(tool, language_code, filename=None):
+    if filename is None:
+        filename = "_".join(
+            part
+            for part in (tool.unit, tool.version, tool.jurisdiction_code)
+            if part
+        )
+        if language_code != settings.LANGUAGE_CODE:
+            filename = f"{filename}_{language_code}"
+        filename = f"{filename}.html"
+    return LegalCode.objects.create(
+        tool=tool,
+        language_code=language_code,
+        title=f"{tool.identifier()} ({language_code})",
+        html=f"<p>{tool.identifier()}</p>" * 50,
+        html_file=os.path.join(settings.LEGACY_DIR, "legalcode", filename),
+    )
+
+
+def write_synthetic_pofiles(locale_dir, language_codes, messages):
+    """
+    Write a Deeds & UX .po file with the given number of messages for each
+    language (with decreasing percentages translated).
+    """
+    for index, language_code in enumerate(language_codes):
+        percent = SYNTHETIC_PERCENTS_TRANSLATED[
+            index % len(SYNTHETIC_PERCENTS_TRANSLATED)
+        ]
+        if language_code == settings.LANGUAGE_CODE:
+            percent = 100
+        pofile = polib.POFile()
+        pofile.metadata = {
+            "Content-Transfer-Encoding": "8bit",
+            "Content-Type": "text/plain; charset=utf-8",
+            "Language": language_code,
+            "MIME-Version": "1.0",
+            "PO-Revision-Date": "2021-06-01 12:00:00+00:00",
+            "POT-Creation-Date": "2020-06-01 12:00:00+00:00",
+        }
+        translated = messages * percent // 100
+        for number in range(messages):
+            msgid = f"Synthetic message {number}: {'lorem ipsum ' * 8}"
+            msgstr = (
+                f"[{language_code}] {msgid}" if number < translated else ""
+            )
+            pofile.append(polib.POEntry(msgid=msgid, msgstr=msgstr))
+        directory = os.path.join(
+            locale_dir, translation.to_locale(language_code), "LC_MESSAGES"
+        )
+        os.makedirs(directory, exist_ok=True)
+        pofile.save(os.path.join(directory, "django.po"))
+
+
+def synthetic_settings(data_dir):
+    """
+    Return the settings override of the synthetic data repository (use
+    load_deeds_ux_translations() to load its translations).
+    """
+    return override_settings(
+        DATA_REPOSITORY_DIR=data_dir,
+        DEEDS_UX_LOCALE_PATH=os.path.join(data_dir, "locale"),
+    )
+
+
+def generate_synthetic_data(data_dir, languages=29, jurisdictions=40):
+    """
+    Populate the database with tools and legal codes (and the data_dir
+    synthetic data repository with Deeds & UX .po files, see
+    synthetic_settings()) in numbers similar to the data repository:
+
+    - Licenses 4.0 and CC0 1.0 in each of the languages
+    - unported Licenses 1.0 to 3.0 in English
+    - ported Licenses 2.0 to 3.0 in the default language of each of the
+      jurisdictions
+    - a Deeds & UX .po file for each of the languages
+
+    Return the number of legal codes created.
+    """
+    language_codes = get_synthetic_language_codes(languages)
+    if settings.LANGUAGE_CODE not in language_codes:
+        language_codes.insert(0, settings.LANGUAGE_CODE)
+    count = 0
+    for unit in SYNTHETIC_UNITS:
+        tool = create_synthetic_tool("licenses", unit, "4.0")
+        for language_code in language_codes:
+            create_synthetic_legal_code(tool, language_code)
+            count += 1
+        for version in SYNTHETIC_UNPORTED_VERSIONS:
+            tool = create_synthetic_tool("licenses", unit, version)
+            create_synthetic_legal_code(tool, settings.LANGUAGE_CODE)
+            count += 1
+        for jurisdiction in get_synthetic_jurisdictions(jurisdictions):
+            language_code = DEFAULT_JURISDICTION_LANGUAGES[jurisdiction]
+            for version in SYNTHETIC_PORTED_VERSIONS:
+                tool = create_synthetic_tool(
+                    "licenses", unit, version, jurisdiction
+                )
+                create_synthetic_legal_code(
+                    tool,
+                    language_code,
+                    filename=f"{unit}_{version}_{jurisdiction}.html",
+                )
+                count += 1
+    tool = create_synthetic_tool("publicdomain", "zero", "1.0")
+    for language_code in language_codes:
+        create_synthetic_legal_code(tool, language_code)
+        count += 1
+    write_synthetic_pofiles(
+        os.path.join(data_dir, "locale"), language_codes, messages=200
+    )
+    return count
+
+
+def uncached(func):
+    """
+    Wrap a benchmark so that the language tables are rebuilt for each call
+    (the per-page cost before they were cached).
+    """
+
+    def wrapper():
+        get_language_table.cache_clear()
+        func()
+
+    return wrapper
+
+
+def using_engine(engine, func):
+    """
+    Wrap a benchmark so that the public pages are rendered by the given
+    template engine.
+    """
+
+    def wrapper():
+        previous_engine = settings.PUBLIC_TEMPLATE_ENGINE
+        settings.PUBLIC_TEMPLATE_ENGINE = engine
+        try:
+            func()
+        finally:
+            settings.PUBLIC_TEMPLATE_ENGINE = previous_engine
+
+    return wrapper
+
+
+def get_i18n_benchmarks():
+    benchmarks = []
+
+    # Deed and list pages language selector
+    def deeds_ux_languages_and_links():
+        get_languages_and_links_for_deeds_ux(
+            request_path="/licenses/by/4.0/deed.en",
+            selected_language_code=settings.LANGUAGE_CODE,
+        )
+
+    benchmarks.append(
+        (
+            "deeds_ux languages and links (uncached)",
+            uncached(deeds_ux_languages_and_links),
+        )
+    )
+    benchmarks.append(
+        ("deeds_ux languages and links", deeds_ux_languages_and_links)
+    )
+    benchmarks.append(
+        ("load_deeds_ux_translations", load_deeds_ux_translations)
+    )
+
+    def parse_legal_code_filenames():
+        for filename in PARSE_FILENAMES:
+            parse_legal_code_filename(filename)
+
+    benchmarks.append(
+        (
+            f"parse_legal_code_filename x{len(PARSE_FILENAMES)}",
+            parse_legal_code_filenames,
+        )
+    )
+    return benchmarks
+
+
+def get_render_benchmarks():
+    benchmarks = []
+
+    # The tool with the most legal codes
+    tool = (
+        Tool.objects.annotate(legal_code_count=Count("legal_codes"))
+        .order_by("-legal_code_count")
+        .first()
+    )
+    if tool is None:
+        LOG.warning("No legal codes, skipping render benchmarks")
+        return benchmarks
+    legal_codes = list(tool.legal_codes.all())
+    legal_code = tool.legal_codes.filter(
+        language_code=settings.LANGUAGE_CODE
+    ).first()
+    if legal_code is None:
+        legal_code = legal_codes[0]
+
+    # Legal code pages language selector
+    def legal_codes_languages_and_links():
+        get_languages_and_links_for_legal_codes(
+            path_start=f"/{tool.save_path}",
+            legal_codes=legal_codes,
+            selected_language_code=settings.LANGUAGE_CODE,
+        )
+
+    label = f"{tool.resource_slug} x{len(legal_codes)}"
+    benchmarks.append(
+        (
+            f"legal code languages and links (uncached, {label})",
+            uncached(legal_codes_languages_and_links),
+        )
+    )
+    benchmarks.append(
+        (
+            f"legal code languages and links ({label})",
+            legal_codes_languages_and_links,
+        )
+    )
+
+    # Pages (view_deed, view_legal_code, and view_list), rendered by each of
+    # the template engines
+    pages = [
+        ("view_deed", legal_code.deed_url),
+        ("view_legal_code", legal_code.legal_code_url),
+        ("view_list", f"/{tool.category}/list.{settings.LANGUAGE_CODE}"),
+    ]
+    for engine in sorted(engines):
+        for view, url in pages:
+            benchmarks.append(
+                (
+                    f"{view} ({engine}, {url})",
+                    using_engine(engine, lambda url=url: get_url_content(url)),
+                )
+            )
+
+    def render_redirects():
+        __, __, redirects_data = legal_code.get_publish_files("deed")
+        for redirect_data in redirects_data:
+            render_redirect(
+                title=redirect_data["title"],
+                destination=redirect_data["destination"],
+                language_code=redirect_data["language_code"],
+            )
+
+    __, __, redirects_data = legal_code.get_publish_files("deed")
+    benchmarks.append(
+        (f"render_redirect x{len(redirects_data)}", render_redirects)
+    )
+
+    def get_publish_files():
+        for legal_code in legal_codes:
+            legal_code.get_publish_files("deed")
+            legal_code.get_publish_files("legalcode")
+
+    benchmarks.append((f"get_publish_files ({label})", get_publish_files))
+    return benchmarks
+
+
+def get_import_benchmarks():
+    """
+    Benchmarks of the HTML importers of load_html_files, for each of the
+    legacy HTML files (in the data repository) with a legal code in the
+    database (and of the lxml engine of the importers that have one). The
+    importers save the legal codes: run them in a transaction that is rolled
+    back.
+    """
+    benchmarks = []
+    command = LoadHtmlFilesCommand()
+    legacy_dir = os.path.join(settings.LEGACY_DIR, "legalcode")
+    for importer, filename in IMPORTER_FILENAMES.items():
+        path = os.path.join(legacy_dir, filename)
+        metadata = parse_legal_code_filename(filename)
+        legal_code = LegalCode.objects.filter(
+            tool__canonical_url=metadata["canonical_url"],
+            language_code=metadata["language_code"],
+        ).first()
+        if not os.path.isfile(path) or legal_code is None:
+            LOG.warning(f"Missing {filename} or its legal code, skipping")
+            continue
+        with open(path, "r", encoding="utf-8") as html_file:
+            content = html_file.read()
+        legal_code.html_file = path
+        kwargs = {"content": content, "legal_code": legal_code}
+        if importer == "simple_import_license_html":
+            kwargs["version"] = legal_code.tool.version
+        engines = ["bs4"]
+        if hasattr(lxml_importers, importer):
+            engines.append("lxml")
+        for engine in engines:
+            func = command.get_importer(importer, engine)
+            label = importer if engine == "bs4" else f"{importer} lxml"
+            benchmarks.append(
+                (
+                    f"{label} ({filename})",
+                    lambda func=func, kwargs=kwargs: func(**kwargs),
+                )
+            )
+    return benchmarks
+
+
+def get_benchmarks():
+    return (
+        get_i18n_benchmarks()
+        + get_render_benchmarks()
+        + get_import_benchmarks()
+    )
+
+
+def run_benchmark(func, number=None, repeat=5):
+    """
+    Return the best per-call time (seconds) of the repeats.
+    """
+    timer = timeit.Timer(func)
+    if number is None:
+        number, __ = timer.autorange()
+    return min(timer.repeat(number=number, repeat=repeat)) / number
+
+
+def load_baseline(path):
+    with open(path, "r", encoding="utf-8") as baseline_file:
+        return json.load(baseline_file)["benchmarks"]
+
+
+def save_baseline(path, results):
+    with open(path, "w", encoding="utf-8") as baseline_file:
+        json.dump({"benchmarks": results}, baseline_file, indent=2)
+        baseline_file.write("\n")
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """
+    Return the regressions: the (name, time, baseline time) of the results
+    that are more than threshold (ex. 0.25 for 25%) slower than the baseline.
+    """
+    regressions = []
+    for name, seconds in results.items():
+        baseline_seconds = baseline.get(name)
+        if baseline_seconds and seconds > baseline_seconds * (1 + threshold):
+            regressions.append((name, seconds, baseline_seconds))
+    return regressions
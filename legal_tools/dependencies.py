@@ -0,0 +1,236 @@
+"""
+Dependency graph of the pages written by publish: the files each output page
+depends on, so that a change to those files only needs the affected pages to
+be rebuilt (see publish --changed-since).
+
+Each page has:
+- legal_codes: the ids of the LegalCode objects it was generated from
+- templates: the templates it was rendered with (relative to the app)
+- translations: the .po files of its language and legal code (relative to the
+  data repository)
+- static: the static assets it references (relative to the app)
+
+The templates are recorded while the pages are rendered: by the template
+loaders (see TemplateLoader and legal_tools.jinja2), the fragment cache (the
+templates of a cached fragment are cached with it), and the render daemon
+(which returns the templates of each page).
+"""
+# Standard library
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+# Third-party
+import git
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loaders import cached
+
+# First-party/Local
+from i18n.utils import get_pofile_path
+
+LOG = logging.getLogger(__name__)
+LOCAL = threading.local()
+STATIC_REFERENCE_RE = re.compile(r"""(?:href|src)=["']([^"'?#]+)""")
+
+
+@contextmanager
+def record_templates():
+    """
+    Record the templates (absolute paths) loaded by this thread into the
+    yielded set. Recordings may be nested: the templates are also recorded by
+    the outer recordings.
+    """
+    recordings = getattr(LOCAL, "recordings", None)
+    if recordings is None:
+        recordings = LOCAL.recordings = []
+    templates = set()
+    recordings.append(templates)
+    try:
+        yield templates
+    finally:
+        recordings.pop()
+        if recordings:
+            recordings[-1].update(templates)
+
+
+def record_template(filename):
+    """
+    Record a template (absolute path) in the current recording (if any).
+    """
+    recordings = getattr(LOCAL, "recordings", None)
+    if recordings and filename:
+        recordings[-1].add(filename)
+
+
+class TemplateLoader(cached.Loader):
+    """
+    Cached template loader that records the templates it returns (includes
+    and parent templates are also loaded through it).
+    """
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        record_template(template.origin.name)
+        return template
+
+
+def get_relpath(path, root):
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(root))
+
+
+@lru_cache(maxsize=None)
+def find_static_asset(url):
+    """
+    Return the path (relative to the app) of the static asset of the URL, or
+    None if it is not a static asset.
+    """
+    if not url.startswith(settings.STATIC_URL):
+        return None
+    path = finders.find(url.removeprefix(settings.STATIC_URL))
+    if not path or isinstance(path, list):
+        return None
+    return get_relpath(path, settings.PROJECT_ROOT)
+
+
+def get_static_assets(content):
+    """
+    Return the static assets (relative to the app) referenced by the content
+    of a page.
+    """
+    assets = set()
+    for url in STATIC_REFERENCE_RE.findall(content.decode("utf-8", "replace")):
+        asset = find_static_asset(url)
+        if asset:
+            assets.add(asset)
+    return assets
+
+
+def get_translations(language_code, legal_code=None):
+    """
+    Return the .po files (relative to the data repository) of the Deeds & UX
+    translation of the language and of the translation of the legal code (if
+    it has one).
+    """
+    paths = [get_pofile_path("locale", language_code, "django")]
+    if legal_code is not None:
+        paths.append(legal_code.translation_filename())
+    return {
+        get_relpath(path, settings.DATA_REPOSITORY_DIR)
+        for path in paths
+        if os.path.isfile(path)
+    }
+
+
+def get_changed_files(repo_dir, rev):
+    """
+    Return the absolute paths of the files of the git repository that changed
+    since the revision (including uncommitted and untracked files). If the
+    revision is not one of the repository (ex. it is a commit of the other
+    repository), the changes since HEAD are returned.
+    """
+    with git.Repo(repo_dir, search_parent_directories=True) as repo:
+        try:
+            repo.git.rev_parse("--verify", "--quiet", f"{rev}^{{commit}}")
+        except git.exc.GitCommandError:
+            LOG.warning(
+                f"{rev} is not a revision of {repo.working_tree_dir}: using"
+                " its changes since HEAD"
+            )
+            rev = "HEAD"
+        names = repo.git.diff("--name-only", rev, "--").splitlines()
+        names += repo.untracked_files
+        return {os.path.join(repo.working_tree_dir, name) for name in names}
+
+
+class DependencyGraph:
+    """
+    The dependencies of each output page (keyed by path relative to the
+    output directory).
+    """
+
+    def __init__(self, pages=None):
+        self.pages = {} if pages is None else pages
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load the graph, or return None if there is none.
+        """
+        try:
+            with open(path, "r", encoding="utf-8") as graph_file:
+                return cls(json.load(graph_file)["pages"])
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as graph_file:
+            json.dump(
+                {"pages": self.pages},
+                graph_file,
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+            graph_file.write("\n")
+
+    def update(self, other):
+        self.pages.update(other.pages)
+
+    @contextmanager
+    def page(self, relpath, language_code, legal_code=None):
+        """
+        Record the dependencies of a page rendered within the context. The
+        yielded dictionary must be given the content of the page (its static
+        assets are found in it).
+        """
+        with record_templates() as templates:
+            record = {}
+            yield record
+        if "content" not in record:
+            raise ValueError(f"The content of {relpath} was not recorded")
+        content = record["content"]
+        dependencies = {
+            "legal_codes": [] if legal_code is None else [legal_code.id],
+            "templates": sorted(
+                get_relpath(template, settings.PROJECT_ROOT)
+                for template in templates
+            ),
+            "translations": sorted(
+                get_translations(language_code, legal_code)
+            ),
+            "static": sorted(get_static_assets(content)),
+        }
+        with self.lock:
+            self.pages[os.path.normpath(relpath)] = dependencies
+
+    def get_affected_pages(self, changed_files):
+        """
+        Return the pages that depend on the changed files (absolute paths).
+        A changed .mo file is handled as a change to its .po file.
+        """
+        changed = set()
+        for path in changed_files:
+            if path.endswith(".mo"):
+                path = f"{path[:-3]}.po"
+            changed.add(
+                ("app", get_relpath(path, settings.PROJECT_ROOT)),
+            )
+            changed.add(
+                ("data", get_relpath(path, settings.DATA_REPOSITORY_DIR)),
+            )
+        affected = {}
+        for relpath, dependencies in self.pages.items():
+            files = [
+                ("app", name)
+                for name in dependencies["templates"] + dependencies["static"]
+            ]
+            files += [("data", name) for name in dependencies["translations"]]
+            if changed.intersection(files):
+                affected[relpath] = dependencies
+        return affected
@@ -0,0 +1,125 @@
+"""
+Jinja2 environment for the public pages (deeds, legal codes, lists, and
+redirects). The templates in templates/jinja2 are equivalent to the Django
+templates and render the same pages (see settings.PUBLIC_TEMPLATE_ENGINE).
+"""
+# Standard library
+from itertools import groupby
+
+# Third-party
+from django.template.defaultfilters import date
+from django.template.defaulttags import GroupedResult
+from django.templatetags.static import static
+from django.utils import translation
+from django.utils.formats import localize
+from django.utils.text import slugify
+from django.utils.timezone import template_localtime
+from jinja2 import Environment, pass_context, pass_environment
+from markupsafe import Markup
+
+# First-party/Local
+from i18n.templatetags.bidi import bidi_end, bidi_start
+from legal_tools.dependencies import record_template
+from legal_tools.templatetags.license_tags import (
+    current_letter,
+    get_cached_fragment,
+    is_one_of,
+    next_letter,
+    reset_letters,
+    units,
+)
+
+
+def gettext(message):
+    """
+    Translate the message like the Django trans and blocktrans tags do (they
+    double the percent signs of the message IDs).
+    """
+    return translation.gettext(message.replace("%", "%%")).replace("%%", "%")
+
+
+def finalize(value):
+    """
+    Render dates and numbers like the Django templates do.
+    """
+    return localize(template_localtime(value))
+
+
+def date_filter(value, arg=None):
+    return date(template_localtime(value), arg)
+
+
+@pass_environment
+def regroup(environment, items, attribute):
+    """
+    Group consecutive items by the attribute, like the Django regroup tag
+    (unlike the groupby filter, the order of the items is kept).
+    """
+    return [
+        GroupedResult(grouper=grouper, list=list(group))
+        for grouper, group in groupby(
+            items, key=lambda item: environment.getitem(item, attribute)
+        )
+    ]
+
+
+@pass_context
+def fragment_cache(context, fragment_name, *vary_on, caller):
+    """
+    Jinja2 version of the fragmentcache template tag:
+
+        {% call fragment_cache("sidebar", tool.unit) %}...{% endcall %}
+    """
+    return Markup(
+        get_cached_fragment(context.name, fragment_name, vary_on, caller)
+    )
+
+
+class RecordingEnvironment(Environment):
+    """
+    Environment that records the templates it returns (includes and parent
+    templates are also loaded through it, see legal_tools.dependencies).
+    """
+
+    def get_template(self, name, parent=None, globals=None):
+        template = super().get_template(name, parent, globals)
+        record_template(template.filename)
+        return template
+
+    def select_template(self, names, parent=None, globals=None):
+        template = super().select_template(names, parent, globals)
+        record_template(template.filename)
+        return template
+
+
+def environment(**options):
+    options.setdefault("keep_trailing_newline", True)
+    env = RecordingEnvironment(
+        extensions=["jinja2.ext.i18n"], finalize=finalize, **options
+    )
+    env.install_gettext_callables(
+        gettext, translation.ngettext, newstyle=False
+    )
+    env.globals.update(
+        {
+            "bidi_end": bidi_end,
+            "bidi_start": bidi_start,
+            "current_letter": current_letter,
+            "fragment_cache": fragment_cache,
+            "get_current_language": translation.get_language,
+            "get_language_info": translation.get_language_info,
+            "next_letter": next_letter,
+            "reset_letters": reset_letters,
+            "static": static,
+        }
+    )
+    env.filters.update(
+        {
+            "date": date_filter,
+            "is_one_of": is_one_of,
+            "regroup": regroup,
+            "slugify": slugify,
+            "units": units,
+        }
+    )
+    return env
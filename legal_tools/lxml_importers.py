@@ -0,0 +1,578 @@
+"""
+The importers of the load_html_files command (the import_*_html methods that
+extract the messages of the legal codes from the legacy HTML) implemented with
+lxml (legal_tools.lxml_utils) instead of BeautifulSoup4.
+
+Each function follows the method of the same name step by step and returns
+the same messages. They are used by the load_html_files --engine=lxml option
+and compared with the BeautifulSoup4 importers by its --compare-engines
+option.
+"""
+# Standard library
+import os
+
+# Third-party
+from django.core.management import CommandError
+
+# First-party/Local
+from legal_tools.lxml_utils import (
+    Text,
+    child_nodes,
+    direct_children_with_tag,
+    find_by_id,
+    find_first,
+    find_next_sibling,
+    get_string,
+    get_text,
+    inner_html,
+    name_and_text,
+    nested_text,
+    node_name,
+    outer_html,
+    parse_html,
+    text_up_to,
+    to_str,
+)
+from legal_tools.utils import clean_string, validate_dictionary_is_all_text
+
+
+def string(node):
+    """
+    Return the only string inside the node as a plain str, or None.
+    """
+    text = get_string(node)
+    if text is None:
+        return None
+    return str(text)
+
+
+def import_zero_license_html(*, content, legal_code):
+    tool = legal_code.tool
+    assert tool.version == "1.0", f"{tool.version} is not '1.0'"
+    assert tool.unit == "zero", f"{tool.unit} is not 'zero'"
+    messages = {}
+    raw_html = content
+    root = parse_html(raw_html)
+    deed_main_content = find_by_id(root, "deed-main-content")
+    messages["license_medium"] = inner_html(
+        find_first(find_by_id(root, "deed-license"), "h2")
+    )
+    legal_code.title = messages["license_medium"]
+    legal_code.save()
+
+    # Big disclaimer (all caps)
+    messages["disclaimer"] = clean_string(
+        nested_text(find_first(deed_main_content, "blockquote"))
+    )
+
+    # Statement of Purpose section
+    messages["statement_of_purpose"] = nested_text(
+        find_first(deed_main_content, "h3")
+    )
+
+    # SOP section is formatted as paragraphs
+    paragraphs = deed_main_content.findall(".//p")
+
+    # First 3 paragraphs in the SOP section are just text
+    messages["sop_p1"] = nested_text(paragraphs[0])
+    messages["sop_p2"] = nested_text(paragraphs[1])
+    messages["sop_p3"] = nested_text(paragraphs[2])
+
+    # Next paragraph is a bold term, and its definition
+    nt = name_and_text(paragraphs[3])
+    messages["s1_title"] = nt["name"]
+    messages["s1_par"] = nt["text"]
+
+    # Followed by an ordered list with 7 items
+    ol = find_next_sibling(paragraphs[3], "ol")
+    for i, part in enumerate(ol.findall(".//li")):
+        messages[f"s1_item{i}"] = nested_text(part)
+
+    # Then two more numbered paragraphs that are definitions
+    nt = name_and_text(paragraphs[4])
+    messages["s2_title"] = nt["name"]
+    messages["s2_text"] = nt["text"]
+
+    nt = name_and_text(paragraphs[5])
+    messages["s3_title"] = nt["name"]
+    messages["s3_text"] = nt["text"]
+
+    # Finally the Limitations header, no intro text, and an ol with 4 items.
+    s4 = paragraphs[6]
+    messages["s4_title"] = nested_text(s4)
+
+    # In English, s4 is followed by an ol with 4 items.
+    # In .el, s4 is followed by a <p class="tab"> with 3 <br/> dividing the
+    # 4 parts.
+    ol = find_next_sibling(s4, "ol")
+    if ol is not None:
+        for i, part in enumerate(ol.findall(".//li")):
+            messages[f"s4_part_{i}"] = nested_text(part)
+    else:
+        p4 = find_next_sibling(s4, "p", class_="tab")
+        text = nested_text(p4)
+        parts = text.split("<br />")
+        for i, part in enumerate(parts):
+            messages[f"s4_part_{i}"] = str(part)
+
+    validate_dictionary_is_all_text(messages)
+
+    return messages
+
+
+def import_by_40_license_html(*, content, legal_code):
+    """
+    Returns a dictionary mapping our internal keys to strings.
+    """
+    tool = legal_code.tool
+    unit = tool.unit
+    language_code = legal_code.language_code
+    html_file = os.path.basename(legal_code.html_file)
+    assert tool.version == "4.0", f"{tool.version} is not '4.0'"
+    assert tool.unit.startswith("by")
+
+    messages = {}
+    raw_html = content
+    # Some trivial making consistent - some translators changed 'strong' to
+    # 'b' for some unknown reason.
+    raw_html = raw_html.replace("<b>", "<strong>").replace("</b>", "</strong>")
+    raw_html = raw_html.replace("<B>", "<strong>").replace("</B>", "</strong>")
+
+    root = parse_html(raw_html)
+
+    # Get the license titles and intro text.
+
+    deed_main_content = find_by_id(root, "deed-main-content")
+
+    messages["license_medium"] = inner_html(
+        find_first(find_by_id(root, "deed-license"), "h2")
+    )
+    legal_code.title = messages["license_medium"]
+    legal_code.save()
+    h3 = find_first(deed_main_content, "h3")
+    messages["license_long"] = inner_html(h3)
+    messages["license_intro"] = inner_html(find_next_sibling(h3, "p"))
+
+    # Section 1 – Definitions.
+
+    expected_definitions = [
+        "adapted_material",
+        "copyright_and_similar_rights",
+        "effective_technological_measures",
+        "exceptions_and_limitations",
+        "licensed_material",
+        "licensed_rights",
+        "licensor",
+        "share",
+        "sui_generis_database_rights",
+        "you",
+    ]
+
+    # now insert the optional ones
+    def insert_after(after_this, what_to_insert):
+        i = expected_definitions.index(after_this)
+        expected_definitions.insert(i + 1, what_to_insert)
+
+    if unit == "by-sa":
+        insert_after("adapted_material", "adapters_license")
+        insert_after("adapters_license", "by_sa_compatible_license")
+        insert_after("exceptions_and_limitations", "license_elements_sa")
+        # See https://github.com/creativecommons/creativecommons.org/issues/1153  # noqa: E501
+        # BY-SA 4.0 for "pt" has an extra definition. Work around for now.
+        if language_code == "pt":
+            insert_after("you", "you2")
+    elif unit == "by":
+        insert_after("adapted_material", "adapters_license")
+    elif unit == "by-nc":
+        insert_after("adapted_material", "adapters_license")
+        insert_after("licensor", "noncommercial")
+    elif unit == "by-nd":
+        pass
+    elif unit == "by-nc-nd":
+        insert_after("licensor", "noncommercial")
+    elif unit == "by-nc-sa":
+        insert_after("adapted_material", "adapters_license")
+        insert_after("exceptions_and_limitations", "license_elements_nc_sa")
+        insert_after("adapters_license", "by_nc_sa_compatible_license")
+        insert_after("licensor", "noncommercial")
+
+    # definitions are in an "ol" that is the next sibling of the id=s1
+    # element.
+    s1 = find_by_id(root, "s1")
+    messages["s1_definitions_title"] = inner_html(find_first(s1, "strong"))
+    for i, definition in enumerate(
+        s1.xpath("following-sibling::ol")[0].findall(".//li")
+    ):
+        thing = name_and_text(definition)
+        defn_key = expected_definitions[i]
+        messages[f"s1_definitions_{defn_key}"] = (
+            f'<span style="text-decoration: underline;">'
+            f"{thing['name']}</span> {thing['text']}"
+        )
+
+    # Section 2 – Scope.
+    messages["s2_scope"] = inner_html(
+        find_first(find_by_id(root, "s2"), "strong")
+    )
+
+    # s2a: License grant.
+    s2a = find_by_id(root, "s2a")
+    if find_first(s2a, "strong") is not None:
+        messages["s2a_license_grant_title"] = inner_html(
+            find_first(s2a, "strong")
+        )
+    elif find_first(s2a, "b") is not None:
+        messages["s2a_license_grant_title"] = inner_html(find_first(s2a, "b"))
+    else:
+        initial_lines = "\n".join(outer_html(s2a).split("\n")[0:5])
+        e = (
+            f"{html_file} Section 2a title is missing or HTML formatting"
+            f" does not match:\n{initial_lines}\n..."
+        )
+        raise CommandError(e)
+
+    # s2a1: rights
+    messages["s2a_license_grant_intro"] = to_str(
+        child_nodes(find_by_id(root, "s2a1"))[0]
+    ).strip()
+
+    messages["s2a_license_grant_share"] = to_str(
+        child_nodes(find_by_id(root, "s2a1A"))[0]
+    ).strip()
+    messages["s2a_license_grant_adapted"] = to_str(
+        child_nodes(find_by_id(root, "s2a1B"))[0]
+    ).strip()
+
+    # s2a2: Exceptions and Limitations.
+    nt = name_and_text(find_by_id(root, "s2a2"))
+    messages[
+        "s2a2_license_grant_exceptions"
+    ] = f"<strong>{nt['name']}</strong>{nt['text']}"
+
+    # s2a3: Term.
+    nt = name_and_text(find_by_id(root, "s2a3"))
+    messages[
+        "s2a3_license_grant_term"
+    ] = f"<strong>{nt['name']}</strong>{nt['text']}"
+
+    # s2a4: Media and formats; technical modifications allowed.
+    nt = name_and_text(find_by_id(root, "s2a4"))
+    messages[
+        "s2a4_license_grant_media"
+    ] = f"<strong>{nt['name']}</strong>{nt['text']}"
+
+    # s2a5: scope/grant/downstream
+    s2a5 = find_by_id(root, "s2a5")
+    nt = name_and_text(s2a5)
+    messages["s2a5_license_grant_downstream_title"] = nt["name"]
+
+    expected_downstreams = [
+        "offer",
+        "no_restrictions",
+    ]
+    if unit in ["by-sa", "by-nc-sa"]:
+        expected_downstreams.insert(1, "adapted_material")
+
+    # Process top-level "li" elements under the ol
+    for i, li in enumerate(
+        find_first(find_first(s2a5, "div"), "ol").findall("li")
+    ):
+        key = expected_downstreams[i]
+        thing = name_and_text(li)
+        messages[f"s2a5_license_grant_downstream_{key}_name"] = thing["name"]
+        messages[f"s2a5_license_grant_downstream_{key}_text"] = thing["text"]
+
+    nt = name_and_text(find_by_id(root, "s2a6"))
+    messages["s2a6_license_grant_no_endorsement_name"] = nt["name"]
+    messages["s2a6_license_grant_no_endorsement_text"] = nt["text"]
+
+    # s2b: Other rights.
+    s2b = find_by_id(root, "s2b")
+    s2b_p = find_first(s2b, "p")
+    if s2b_p is not None and find_first(s2b_p, "strong") is not None:
+        messages["s2b_other_rights_title"] = nested_text(
+            find_first(s2b_p, "strong")
+        )
+    elif s2b_p is not None:
+        messages["s2b_other_rights_title"] = nested_text(s2b_p)
+    elif find_first(s2b, "strong") is not None:
+        messages["s2b_other_rights_title"] = nested_text(
+            find_first(s2b, "strong")
+        )
+    else:
+        initial_lines = "\n".join(outer_html(s2b).split("\n")[0:5])
+        e = (
+            f"{html_file} Section 2b title is missing or HTML formatting"
+            f" does not match:\n{initial_lines}\n..."
+        )
+        raise CommandError(e)
+    list_items = find_first(s2b, "ol").findall("li")
+    assert list_items[0].tag == "li"
+    messages["s2b1_other_rights_moral"] = nested_text(list_items[0])
+    messages["s2b2_other_rights_patent"] = nested_text(list_items[1])
+    messages["s2b3_other_rights_waive"] = nested_text(list_items[2])
+
+    # Section 3: conditions
+    s3 = find_by_id(root, "s3")
+    messages["s3_conditions_title"] = nested_text(s3)
+    messages["s3_conditions_intro"] = nested_text(find_next_sibling(s3, "p"))
+
+    s3a = find_by_id(root, "s3a")
+    inside = str(inner_html(s3a))
+    if inside.startswith(
+        " "
+    ):  # ar translation takes liberties with whitespace
+        s3a = parse_html(inside.strip())
+    s3a_p = find_first(s3a, "p")
+    if s3a_p is not None and find_first(s3a_p, "strong") is not None:
+        messages["s3_conditions_attribution"] = nested_text(
+            find_first(s3a_p, "strong")
+        )
+    elif find_first(s3a, "strong") is not None:
+        messages["s3_conditions_attribution"] = nested_text(
+            find_first(s3a, "strong")
+        )
+    else:
+        initial_lines = "\n".join(outer_html(s3a).split("\n")[0:5])
+        e = (
+            f"{html_file} Section 3a title is missing or HTML formatting"
+            f" does not match:\n{initial_lines}\n..."
+        )
+        raise CommandError(e)
+
+    messages["s3_conditions_if_you_share"] = text_up_to(
+        find_by_id(root, "s3a1"), "ol"
+    )
+
+    messages["s3_conditions_retain_the_following"] = text_up_to(
+        find_by_id(root, "s3a1A"), "ol"
+    )
+    for key, id_ in [
+        ("s3a1Ai_conditions_identification", "s3a1Ai"),
+        ("s3a1Aii_conditions_copyright", "s3a1Aii"),
+        ("s3a1Aiii_conditions_license", "s3a1Aiii"),
+        ("s3a1Aiv_conditions_disclaimer", "s3a1Aiv"),
+        ("s3a1Av_conditions_link", "s3a1Av"),
+        ("s3a1B_conditions_modified", "s3a1B"),
+        ("s3a1C_conditions_licensed", "s3a1C"),
+        ("s3a2_conditions_satisfy", "s3a2"),
+        ("s3a3_conditions_remove", "s3a3"),
+    ]:
+        messages[key] = inner_html(find_by_id(root, id_))
+    s3a4 = find_by_id(root, "s3a4")
+    if s3a4 is not None:
+        # Only present if neither SA or ND.
+        # OR in the NL translation of by-nc-nd, go figure...
+        messages["s3a4_if_you_share_adapted_material"] = nested_text(s3a4)
+
+    # share-alike is only in some licenses
+    if unit.endswith("-sa"):
+        s3b = find_by_id(root, "s3b")
+        messages["sharealike_name"] = nested_text(find_first(s3b, "strong"))
+        messages["sharealike_intro"] = nested_text(find_first(s3b, "p"))
+
+        messages["s3b1"] = nested_text(find_by_id(root, "s3b1"))
+        messages["s3b2"] = nested_text(find_by_id(root, "s3b2"))
+        messages["s3b3"] = nested_text(find_by_id(root, "s3b3"))
+
+    # Section 4: Sui generis database rights
+    s4 = find_by_id(root, "s4")
+    messages["s4_sui_generics_database_rights_titles"] = nested_text(s4)
+    messages["s4_sui_generics_database_rights_intro"] = string(
+        find_next_sibling(s4, "p")
+    )
+
+    s4a = nested_text(find_by_id(root, "s4a"))
+    if "nc" in unit:
+        messages["s4_sui_generics_database_rights_extract_reuse_nc"] = s4a
+    else:
+        messages["s4_sui_generics_database_rights_extract_reuse"] = s4a
+
+    s4b = nested_text(find_by_id(root, "s4b"))
+    if unit.endswith("-sa"):
+        messages["s4_sui_generics_database_rights_adapted_material_sa"] = s4b
+    else:
+        messages["s4_sui_generics_database_rights_adapted_material"] = s4b
+    messages["s4_sui_generics_database_rights_comply_s3a"] = nested_text(
+        find_by_id(root, "s4c")
+    )
+    # The next text comes after the 'ol' after s4, but isn't inside a tag
+    # itself!
+    s4_seen = False
+    take_rest = False
+    parts = []
+    for item in child_nodes(s4.getparent()):
+        if take_rest:
+            if node_name(item) == "p":
+                # Stop at the next paragraph
+                break
+            parts.append(to_str(item))
+        elif not s4_seen:
+            if not isinstance(item, Text) and item.get("id") == "s4":
+                s4_seen = True
+                continue
+        elif not take_rest and node_name(item) == "ol":
+            # already seen s4, this is the ol, so the next child is our text
+            take_rest = True
+    messages["s4_sui_generics_database_rights_postscript"] = " ".join(parts)
+
+    # Section 5: Disclaimer
+    messages["s5_disclaimer_title"] = string(find_by_id(root, "s5"))
+    messages["s5_a"] = string(find_by_id(root, "s5a"))  # bold
+    messages["s5_b"] = string(find_by_id(root, "s5b"))  # bold
+    messages["s5_c"] = string(find_by_id(root, "s5c"))  # not bold
+
+    # Section 6: Term and Termination
+    messages["s6_termination_title"] = nested_text(find_by_id(root, "s6"))
+    messages["s6_termination_applies"] = nested_text(find_by_id(root, "s6a"))
+    s6b = find_by_id(root, "s6b")
+    s6b_p = find_first(s6b, "p")
+    if s6b_p is not None:
+        # most languages put the introductory text in a paragraph, making it
+        # easy
+        messages["s6_termination_reinstates_where"] = get_text(s6b_p)
+    else:
+        # if they don't, we have to pick out the text from the beginning of
+        # s6b's content until the beginning of the "ol" inside it.
+        s = ""
+        for child in child_nodes(s6b):
+            if node_name(child) == "ol":
+                break
+            s += to_str(child)
+        messages["s6_termination_reinstates_where"] = s
+    messages["s6_termination_reinstates_automatically"] = get_text(
+        find_by_id(root, "s6b1")
+    )
+    messages["s6_termination_reinstates_express"] = get_text(
+        find_by_id(root, "s6b2")
+    )
+
+    children_of_s6b = child_nodes(s6b)
+    messages["s6_termination_reinstates_postscript"] = (
+        "".join(to_str(x) for x in children_of_s6b[4:7])
+    ).strip()
+    messages["s6_separate_terms"] = inner_html(find_by_id(root, "s6c"))
+    messages["s6_survival"] = inner_html(find_by_id(root, "s6d"))
+
+    # Section 7: Other terms and conditions
+    messages["s7_other_terms_title"] = string(find_by_id(root, "s7"))
+    messages["s7_a"] = string(find_by_id(root, "s7a"))
+    messages["s7_b"] = string(find_by_id(root, "s7b"))
+
+    # Section 8: Interpretation
+    messages["s8_interpretation_title"] = string(find_by_id(root, "s8"))
+    for key in ["s8a", "s8b", "s8c", "s8d"]:
+        messages[key] = inner_html(find_by_id(root, key))
+
+    validate_dictionary_is_all_text(messages)
+
+    return messages
+
+
+def import_by_30_unported_license_html(*, content, legal_code):
+    """
+    Returns a dictionary mapping our internal keys to strings.
+    """
+    messages = {}
+    raw_html = content
+    # Some trivial making consistent - some translators changed 'strong' to
+    # 'b' for some unknown reason.
+    raw_html = raw_html.replace("<b>", "<strong>").replace("</b>", "</strong>")
+    raw_html = raw_html.replace("<B>", "<strong>").replace("</B>", "</strong>")
+
+    root = parse_html(raw_html)
+    messages["license_medium"] = inner_html(
+        find_first(find_by_id(root, "deed-license"), "h2")
+    )
+    legal_code.title = messages["license_medium"]
+    legal_code.save()
+
+    deed_main_content = find_by_id(root, "deed-main-content")
+
+    messages["not_a_law_firm"] = nested_text(
+        find_first(deed_main_content, "blockquote")
+    )
+    # <h3><em>License</em></h3>
+    messages["license"] = nested_text(find_first(deed_main_content, "h3"))
+
+    # Top level paragraphs and ordered lists
+    paragraphs = iter(direct_children_with_tag(deed_main_content, "p"))
+    ordered_lists = iter(direct_children_with_tag(deed_main_content, "ol"))
+
+    # Two paragraphs of introduction
+    messages["par1"] = nested_text(next(paragraphs))
+    messages["par2"] = nested_text(next(paragraphs))
+
+    # <p><strong>1. Definitions</strong></p>
+    messages["definitions"] = nested_text(next(paragraphs))
+
+    # An ordered list of definitions
+    ol = next(ordered_lists)
+    for i, li in enumerate(direct_children_with_tag(ol, "li")):
+        nt = name_and_text(li)
+        messages[f"def{i}name"] = nt["name"]
+        messages[f"def{i}text"] = nt["text"]
+
+    # <p><strong>2. Fair Dealing Rights.</strong> Nothing ... </p>
+    nt = name_and_text(next(paragraphs))
+    messages["fair_dealing_rights"] = nt["name"]
+    messages["fair_dealing_rights_text"] = nt["text"]
+
+    # <p><strong>3. License Grant.</strong> Subject ... </p>
+    nt = name_and_text(next(paragraphs))
+    messages["grant"] = nt["name"]
+    messages["grant_text"] = nt["text"]
+
+    # another ol
+    ol = next(ordered_lists)
+    for i, li in enumerate(direct_children_with_tag(ol, "li")):
+        messages[f"grant{i}"] = nested_text(li)
+
+    messages["par5"] = nested_text(next(paragraphs))
+
+    # <p><strong>4. Restrictions.</strong> The ... </p>
+    nt = name_and_text(next(paragraphs))
+    messages["restrictions"] = nt["name"]
+    messages["restrictions_text"] = nt["text"]
+
+    ol = next(ordered_lists)
+    for i, li in enumerate(direct_children_with_tag(ol, "li")):
+        # Most of these li's just have text.
+        # one has a <p></p> followed by another ordered list
+        li_p = find_first(li, "p")
+        if li_p is not None:
+            messages["restrictions avoid doubt"] = nested_text(li_p)
+            ol2 = find_first(li, "ol")
+            for j, li2 in enumerate(direct_children_with_tag(ol2, "li")):
+                nt = name_and_text(li2)
+                messages[f"restrictions name {i};{j}"] = nt["name"]
+                messages[f"restrictions text {i};{j}"] = nt["text"]
+        else:
+            messages[f"restrictions{i}"] = nested_text(li)
+
+    # <p><strong>5. Representations, Warranties and Disclaimer</strong></p>
+    messages["reps_and_disclaimer"] = nested_text(next(paragraphs))
+    messages["unless_mutual"] = nested_text(next(paragraphs))
+
+    # <p><strong>6. Limitation on Liability.</strong> EXCEPT ...</p>
+    nt = name_and_text(next(paragraphs))
+    messages["Limitation"] = nt["name"]
+    messages["Limitation_text"] = nt["text"]
+
+    # <p><strong>7. Termination</strong></p>
+    messages["termination"] = nested_text(next(paragraphs))
+
+    ol = next(ordered_lists)
+    for i, li in enumerate(direct_children_with_tag(ol, "li")):
+        messages[f"termination{i}"] = nested_text(li)
+
+    # <p><strong>8. Miscellaneous</strong></p>
+    messages["misc"] = nested_text(next(paragraphs))
+
+    ol = next(ordered_lists)
+    for i, li in enumerate(direct_children_with_tag(ol, "li")):
+        messages[f"misc{i}"] = nested_text(li)
+
+    validate_dictionary_is_all_text(messages)
+
+    return messages
@@ -0,0 +1,357 @@
+"""
+Little utility methods for use with lxml, equivalent to the ones in
+legal_tools.bs_utils for BeautifulSoup4.
+
+The functions return exactly what their BeautifulSoup counterparts return for
+the same HTML (parsed by BeautifulSoup with its lxml parser), so that the
+importers of the load_html_files command extract the same messages with
+either engine. To that end, the children of an element are its elements and
+its text nodes (Text, Comment, and ProcessingInstruction strings), and
+elements are serialized the way BeautifulSoup does it (with sorted attributes,
+collapsed whitespace-only strings, "<br/>" void elements, etc.).
+"""
+# Standard library
+from itertools import takewhile
+
+# Third-party
+from bs4.builder import HTMLTreeBuilder
+from bs4.dammit import EntitySubstitution
+from bs4.element import CharsetMetaAttributeValue, ContentMetaAttributeValue
+from lxml import etree
+
+CDATA_CONTAINING_TAGS = {"script", "style"}
+CDATA_LIST_ATTRIBUTES = HTMLTreeBuilder.DEFAULT_CDATA_LIST_ATTRIBUTES
+PRESERVE_WHITESPACE_TAGS = HTMLTreeBuilder.DEFAULT_PRESERVE_WHITESPACE_TAGS
+# The strings inside these tags are not part of the text (get_text())
+STRING_CONTAINER_TAGS = set(HTMLTreeBuilder.DEFAULT_STRING_CONTAINERS)
+VOID_ELEMENT_TAGS = HTMLTreeBuilder.DEFAULT_EMPTY_ELEMENT_TAGS
+
+
+class Text(str):
+    """
+    A text node (the equivalent of a BeautifulSoup NavigableString). str() of
+    it is its text.
+    """
+
+    def __new__(cls, value, parent):
+        text = super().__new__(cls, value)
+        text.parent = parent
+        return text
+
+    def html(self):
+        if (
+            self.parent is not None
+            and self.parent.tag in CDATA_CONTAINING_TAGS
+        ):
+            return str(self)
+        return EntitySubstitution.substitute_xml(self)
+
+
+class Comment(Text):
+    def html(self):
+        return f"<!--{self}-->"
+
+
+class ProcessingInstruction(Text):
+    def html(self):
+        return f"<?{self}>"
+
+
+class _DocumentTarget:
+    """
+    Parser target building the tree from the parser events, like
+    BeautifulSoup does. Content after the end of the document (ex. text after
+    </html>) makes libxml2 start another html element: BeautifulSoup keeps it
+    after the first one, so its children are moved to the end of the root.
+    """
+
+    def __init__(self):
+        self.builder = etree.TreeBuilder()
+        self.roots = []
+        self.depth = 0
+
+    def start(self, tag, attrib):
+        element = self.builder.start(tag, attrib)
+        if not self.depth:
+            self.roots.append(element)
+        self.depth += 1
+
+    def end(self, tag):
+        self.builder.end(tag)
+        self.depth -= 1
+
+    def data(self, data):
+        self.builder.data(data)
+
+    def comment(self, text):
+        if self.depth:
+            self.builder.comment(text)
+
+    def pi(self, target, data):
+        if self.depth:
+            self.builder.pi(target, data)
+
+    def close(self):
+        self.builder.close()
+        if not self.roots:
+            return None
+        root = self.roots[0]
+        for other in self.roots[1:]:
+            root.extend(other)
+        return root
+
+
+def parse_html(raw_html):
+    """
+    Parse the HTML (a string) and return the root (html) element.
+    """
+    raw_html = raw_html.removeprefix("\N{BYTE ORDER MARK}").encode("utf-8")
+    # Build the tree from the parser events, like BeautifulSoup does (the
+    # tree built by libxml2 itself differs: ex. <input checked> is given
+    # checked="checked"). If the events do not make a tree (unclosed
+    # elements at the end of a fragment, invalid names, etc.), fall back to
+    # the tree built by libxml2.
+    try:
+        root = etree.fromstring(
+            raw_html,
+            etree.HTMLParser(
+                encoding="utf-8", recover=True, target=_DocumentTarget()
+            ),
+        )
+    except (etree.XMLSyntaxError, ValueError):
+        root = None
+    if root is None or not isinstance(root.tag, str):
+        root = etree.fromstring(
+            raw_html, etree.HTMLParser(encoding="utf-8", recover=True)
+        )
+    if root is None:
+        # Empty document
+        root = etree.Element("html")
+    return root
+
+
+def find_by_id(element, id_):
+    """
+    Return the first element with the given id, or None.
+    """
+    found = element.xpath("(//*[@id=$id])[1]", id=id_)
+    return found[0] if found else None
+
+
+def find_first(element, name):
+    """
+    Return the first descendant element with the given tag name, or None.
+    (The equivalent of BeautifulSoup's tag.strong, tag.p, etc.)
+    """
+    return element.find(f".//{name}")
+
+
+def find_next_sibling(element, name, class_=None):
+    """
+    Return the first following sibling element with the given tag name (and
+    class, if given), or None.
+    """
+    if class_:
+        found = element.xpath(
+            f"following-sibling::{name}[contains(concat(' ',"
+            f" normalize-space(@class), ' '), $class)][1]",
+            **{"class": f" {class_} "},
+        )
+    else:
+        found = element.xpath(f"following-sibling::{name}[1]")
+    return found[0] if found else None
+
+
+def node_name(node):
+    """
+    Return the tag name of an element, or None for a text node.
+    """
+    if isinstance(node, Text):
+        return None
+    return node.tag
+
+
+def _text(value, parent, preserve_whitespace):
+    if not preserve_whitespace and not value.strip(" \t\n\r\f"):
+        # BeautifulSoup collapses strings of whitespace
+        value = "\n" if "\n" in value else " "
+    return Text(value, parent)
+
+
+def _is_preserving_whitespace(element):
+    if element.tag in PRESERVE_WHITESPACE_TAGS:
+        return True
+    return any(
+        ancestor.tag in PRESERVE_WHITESPACE_TAGS
+        for ancestor in element.iterancestors()
+    )
+
+
+def child_nodes(element):
+    """
+    Return the children of the element: its elements and text nodes (the
+    equivalent of BeautifulSoup's tag.contents).
+    """
+    nodes = []
+    preserve_whitespace = None
+    for value, child in [(element.text, None)] + [
+        (child, child) for child in element
+    ]:
+        if child is not None:
+            if child.tag is etree.Comment:
+                nodes.append(Comment(child.text or "", element))
+            elif child.tag is etree.ProcessingInstruction:
+                value = f"{child.target} {child.text or ''}"
+                nodes.append(ProcessingInstruction(value, element))
+            else:
+                nodes.append(child)
+            value = child.tail
+        if value:
+            if preserve_whitespace is None:
+                preserve_whitespace = _is_preserving_whitespace(element)
+            nodes.append(_text(value, element, preserve_whitespace))
+    return nodes
+
+
+def get_string(node):
+    """
+    Return the only text node inside the node (recursing into single
+    children), or None (the equivalent of BeautifulSoup's tag.string).
+    """
+    if isinstance(node, Text):
+        return node
+    nodes = child_nodes(node)
+    if len(nodes) != 1:
+        return None
+    return get_string(nodes[0])
+
+
+def get_text(element):
+    """
+    Return all the text inside the element, without the comments and the
+    strings of scripts and stylesheets (the equivalent of BeautifulSoup's
+    tag.get_text()).
+    """
+    parts = []
+    for node in child_nodes(element):
+        if type(node) is Text:
+            parts.append(str(node))
+        elif (
+            not isinstance(node, Text)
+            and node.tag not in STRING_CONTAINER_TAGS
+        ):
+            parts.append(get_text(node))
+    return "".join(parts)
+
+
+def _meta_attribute_value(element, key, value):
+    # BeautifulSoup replaces the declared encoding with the output encoding
+    if key == "charset":
+        return CharsetMetaAttributeValue(value).substitute_encoding("utf-8")
+    if (
+        key == "content"
+        and element.get("charset") is None
+        and element.get("http-equiv", "").lower() == "content-type"
+    ):
+        return ContentMetaAttributeValue(value).substitute_encoding("utf-8")
+    return value
+
+
+def outer_html(node):
+    """
+    Return the HTML of the node, including the element itself (the
+    equivalent of str() of a BeautifulSoup tag).
+    """
+    if isinstance(node, Text):
+        return node.html()
+    name = node.tag
+    attributes = []
+    for key, value in sorted(node.attrib.items()):
+        if key in CDATA_LIST_ATTRIBUTES.get(
+            "*", ()
+        ) or key in CDATA_LIST_ATTRIBUTES.get(name, ()):
+            value = " ".join(value.split())
+        elif name == "meta":
+            value = _meta_attribute_value(node, key, value)
+        value = EntitySubstitution.quoted_attribute_value(
+            EntitySubstitution.substitute_xml(value)
+        )
+        attributes.append(f" {key}={value}")
+    attributes = "".join(attributes)
+    nodes = child_nodes(node)
+    if not nodes and name in VOID_ELEMENT_TAGS:
+        return f"<{name}{attributes}/>"
+    contents = "".join(outer_html(child) for child in nodes)
+    return f"<{name}{attributes}>{contents}</{name}>"
+
+
+def to_str(node):
+    """
+    Return the text of a text node, or the HTML of an element (the equivalent
+    of str() of a BeautifulSoup node).
+    """
+    if isinstance(node, Text):
+        return str(node)
+    return outer_html(node)
+
+
+def inner_html(element):
+    """
+    Return all the text/html INSIDE the given element, but
+    not the element itself.
+    """
+    return "".join(to_str(node) for node in child_nodes(element))
+
+
+def nested_text(node):
+    """
+    Given a node. If it's a text node, return it. If it's got exactly one
+    child, recurse on that child. If you get to something more complicated,
+    just return the HTML remaining. (See bs_utils.nested_text.)
+    """
+    if isinstance(node, Text):
+        return str(node)
+    nodes = child_nodes(node)
+    if len(nodes) == 1:
+        return nested_text(nodes[0])
+    return inner_html(node)
+
+
+def text_up_to(element, tagname):
+    """
+    Given an element, return the text of the immediate children up to,
+    but not including the first child whose tagname is 'tagname'.
+    """
+    children = takewhile(
+        lambda node: node_name(node) != tagname, child_nodes(element)
+    )
+    return "".join(to_str(child) for child in children)
+
+
+def name_and_text(element):
+    """
+    This is for parsing dictionary-like elements in the tool. (See
+    bs_utils.name_and_text.)
+
+    E.g. "<strong>Truck</strong> is a <strong>heavy</strong> vehicle."
+
+    Returns a dictionary:
+        {"name": "Truck", "text": "is a <strong>heavy</strong> vehicle."}
+    """
+    top_level_children = child_nodes(element)
+    joined_strings = "".join(to_str(i) for i in top_level_children[1:])
+    stripped = joined_strings.strip()
+    de_newlined = stripped.replace("\n", " ")
+
+    return {
+        "name": str(get_string(top_level_children[0])),
+        "text": de_newlined,
+    }
+
+
+def direct_children_with_tag(element, name):
+    """
+    Return list of the elements that are direct children of the
+    given element and have the requested tag name.
+    """
+    return [child for child in element if child.tag == name]
@@ -0,0 +1,141 @@
+# Standard library
+import logging
+import tempfile
+from argparse import ArgumentParser
+
+# Third-party
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+# First-party/Local
+from i18n.utils import load_deeds_ux_translations
+from legal_tools.benchmarks import (
+    compare_to_baseline,
+    generate_synthetic_data,
+    get_benchmarks,
+    load_baseline,
+    run_benchmark,
+    save_baseline,
+    synthetic_settings,
+)
+from legal_tools.models import Tool
+
+LOG = logging.getLogger(__name__)
+LOG_LEVELS = {
+    0: logging.ERROR,
+    1: logging.WARNING,
+    2: logging.INFO,
+    3: logging.DEBUG,
+}
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks of the hot paths of rendering, importing, and
+    internationalization (see legal_tools.benchmarks). Each benchmark is
+    reported as the best per-call time of the repeats.
+
+    Benchmarks that need legal codes use the data in the database, or
+    synthetic data (--synthetic). The benchmarks are run in a transaction that
+    is rolled back, so the database is left unchanged.
+
+    The results can be saved as a baseline (--save-baseline) and compared to a
+    baseline (--baseline): the command fails if a benchmark is slower than its
+    baseline by more than the threshold. Baselines are only comparable on the
+    same machine (and data).
+    """
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "-n",
+            "--number",
+            type=int,
+            help="Number of calls in each repeat (default: enough calls to"
+            " take at least 0.2 seconds)",
+        )
+        parser.add_argument(
+            "-r",
+            "--repeat",
+            type=int,
+            default=5,
+            help="Number of repeats (default: 5)",
+        )
+        parser.add_argument(
+            "-k",
+            "--keyword",
+            help="Only run the benchmarks whose name contains the keyword",
+        )
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Replace the tools and legal codes (and the Deeds & UX"
+            " translations) with synthetic data of realistic size",
+        )
+        parser.add_argument(
+            "--baseline",
+            help="JSON file of the baseline results to compare to",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            help="JSON file to save the results to",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Fraction by which a benchmark may be slower than its"
+            " baseline (default: 0.25)",
+        )
+
+    def run_benchmarks(self, options):
+        results = {}
+        for name, func in get_benchmarks():
+            if options["keyword"] and options["keyword"] not in name:
+                continue
+            seconds = run_benchmark(func, options["number"], options["repeat"])
+            results[name] = seconds
+            line = f"{name:<72} {seconds * 1e6:12.2f} µs"
+            if name in self.baseline:
+                line += f" ({seconds / self.baseline[name]:5.2f}x baseline)"
+            self.stdout.write(line)
+        return results
+
+    def run_synthetic_benchmarks(self, options):
+        Tool.objects.all().delete()
+        with tempfile.TemporaryDirectory() as data_dir:
+            legal_codes = generate_synthetic_data(data_dir)
+            LOG.info(f"Generated {legal_codes} synthetic legal codes")
+            try:
+                with synthetic_settings(data_dir):
+                    load_deeds_ux_translations()
+                    return self.run_benchmarks(options)
+            finally:
+                load_deeds_ux_translations()
+
+    def handle(self, **options):
+        LOG.setLevel(LOG_LEVELS[int(options["verbosity"])])
+        self.baseline = {}
+        if options["baseline"]:
+            self.baseline = load_baseline(options["baseline"])
+        with transaction.atomic():
+            if options["synthetic"]:
+                results = self.run_synthetic_benchmarks(options)
+            else:
+                results = self.run_benchmarks(options)
+            transaction.set_rollback(True)
+        if options["save_baseline"]:
+            save_baseline(options["save_baseline"], results)
+            LOG.info(f"Saved baseline: {options['save_baseline']}")
+        regressions = compare_to_baseline(
+            results, self.baseline, options["threshold"]
+        )
+        for name, seconds, baseline_seconds in regressions:
+            self.stderr.write(
+                f"REGRESSION: {name}: {seconds * 1e6:.2f} µs (baseline:"
+                f" {baseline_seconds * 1e6:.2f} µs)"
+            )
+        if regressions:
+            raise CommandError(
+                f"{len(regressions)} benchmarks are more than"
+                f" {options['threshold']:.0%} slower than the baseline."
+            )
@@ -8,6 +8,7 @@ from argparse import ArgumentParser
 # Third-party
 from bs4 import BeautifulSoup, Tag
 from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
 from django.core.management import BaseCommand, CommandError
 from polib import POEntry, POFile
 
@@ -16,6 +17,7 @@ from i18n.utils import (
     map_django_to_transifex_language_code,
     save_pofile_as_pofile_and_mofile,
 )
+from legal_tools import lxml_importers
 from legal_tools.bs_utils import (
     direct_children_with_tag,
     inner_html,
@@ -26,6 +28,7 @@ from legal_tools.bs_utils import (
 from legal_tools.models import LegalCode, Tool
 from legal_tools.utils import (
     clean_string,
+    get_extraction_cache_key,
     parse_legal_code_filename,
     validate_dictionary_is_all_text,
 )
@@ -38,6 +41,12 @@ LOG_LEVELS = {
     3: logging.DEBUG,
 }
 NOW = datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S+0000")
+ENGINES = ["bs4", "lxml"]
+EXTRACTION_CACHE_MAX_ENTRIES = 10000
+# Increment when the results of the importers (the import_*_html methods and
+# legal_tools.bs_utils, legal_tools.lxml_importers and legal_tools.lxml_utils)
+# change, to invalidate the extraction cache
+IMPORTER_VERSION = 1
 
 
 class Command(BaseCommand):
@@ -45,6 +54,13 @@ class Command(BaseCommand):
     Read the HTML files from a directory, figure out which tools they are,
     and create and populate the corresponding LegalCode and Tool objects.
     Then parse the HTML and create or update the .po and .mo files.
+
+    The results of parsing each HTML file (its messages, title, and HTML) are
+    kept in the extraction cache (settings.EXTRACTION_CACHE_DIR), so that
+    running the import again only parses the new and modified files.
+
+    The messages are extracted with BeautifulSoup4 (the import_*_html
+    methods) or, with --engine=lxml, with lxml (legal_tools.lxml_importers).
     """
 
     def add_arguments(self, parser: ArgumentParser):
@@ -90,6 +106,27 @@ class Command(BaseCommand):
             help="Do not wrap lines in output .po files. Helpful if you need"
             " to copy messages. DON'T COMMIT THE UNWRAPPED FILES.",
         )
+        parser.add_argument(
+            "--nocache",
+            action="store_true",
+            help="Parse every HTML file, even if the results of parsing it are"
+            " in the extraction cache (the cache is still updated).",
+        )
+        parser.add_argument(
+            "--engine",
+            choices=ENGINES,
+            default="bs4",
+            help="HTML parsing engine used to extract the messages:"
+            " BeautifulSoup4 ('bs4', the default) or lxml ('lxml', faster)."
+            " The legal codes that are only imported as HTML are always"
+            " parsed with BeautifulSoup4.",
+        )
+        parser.add_argument(
+            "--compare-engines",
+            action="store_true",
+            help="Also extract the messages of each HTML file with the other"
+            " engine and fail if they differ (implies --nocache).",
+        )
 
     def handle(self, input_directory, **options):
         LOG.setLevel(LOG_LEVELS[int(options["verbosity"])])
@@ -97,6 +134,21 @@ class Command(BaseCommand):
             raise CommandError(f"invalid input_directory: {input_directory}")
         self.unwrapped = options["unwrapped"]
         self.pomofiles = options["pomofiles"]
+        self.engine = options["engine"]
+        self.compare_engines = options["compare_engines"]
+        self.nocache = options["nocache"] or self.compare_engines
+        # The keys include the sha256 of the files and the importer version,
+        # so entries never expire
+        self.extraction_cache = FileBasedCache(
+            settings.EXTRACTION_CACHE_DIR,
+            {
+                "TIMEOUT": None,
+                "OPTIONS": {"MAX_ENTRIES": EXTRACTION_CACHE_MAX_ENTRIES},
+            },
+        )
+        self.files_parsed = 0
+        self.files_cached = 0
+        self.engine_differences = []
         hostname = socket.gethostname()
         # category_to_include
         if options["category"]:
@@ -303,22 +355,23 @@ class Command(BaseCommand):
                 if tool.category == "licenses":
                     if version == "4.0":
                         support_po_files = True
-                        messages_text = self.import_by_40_license_html(
+                        messages_text = self.import_cached(
+                            "import_by_40_license_html",
                             content=content,
                             legal_code=legal_code,
                         )
                     elif version == "3.0" and not tool.jurisdiction_code:
                         # 3.0 Unported license: we parse out the messages like
                         # 4.0
-                        messages_text = (
-                            self.import_by_30_unported_license_html(
-                                content=content,
-                                legal_code=legal_code,
-                            )
+                        messages_text = self.import_cached(
+                            "import_by_30_unported_license_html",
+                            content=content,
+                            legal_code=legal_code,
                         )
                     else:
                         # all others: we just save the HTML for now
-                        self.simple_import_license_html(
+                        self.import_cached(
+                            "simple_import_license_html",
                             content=content,
                             legal_code=legal_code,
                             version=version,
@@ -326,7 +379,8 @@ class Command(BaseCommand):
                         continue
                 elif unit == "zero":
                     support_po_files = True
-                    messages_text = self.import_zero_license_html(
+                    messages_text = self.import_cached(
+                        "import_zero_license_html",
                         content=content,
                         legal_code=legal_code,
                     )
@@ -345,6 +399,116 @@ class Command(BaseCommand):
                         english_by_unit_version,
                         messages_text,
                     )
+        LOG.info(
+            f"{self.files_parsed} HTML files parsed, {self.files_cached} from"
+            " the extraction cache"
+        )
+        if self.engine_differences:
+            raise CommandError(
+                "The engines extracted different messages from"
+                f" {len(self.engine_differences)} HTML files"
+            )
+        if self.compare_engines:
+            self.stdout.write(
+                "The engines extracted the same messages from every HTML file"
+            )
+
+    def get_importer(self, name, engine):
+        """
+        Return the importer (the import_*_html method, or its
+        legal_tools.lxml_importers counterpart) of the engine.
+        """
+        if engine == "lxml":
+            return getattr(lxml_importers, name)
+        return getattr(self, name)
+
+    def get_engine(self, name):
+        """
+        Return the engine used by the importer: the selected engine, unless
+        the importer is only implemented with BeautifulSoup4.
+        """
+        if hasattr(lxml_importers, name):
+            return self.engine
+        return "bs4"
+
+    def import_cached(self, name, *, content, legal_code, **kwargs):
+        """
+        Import the content of the legal code's HTML file with the importer
+        (one of the import_*_html methods, by name), unless the results of the
+        importer for the same content are in the extraction cache. The results
+        are the messages returned by the importer and the title (and, for
+        simple imports, the HTML) of the legal code.
+        """
+        engine = self.get_engine(name)
+        key = get_extraction_cache_key(
+            f"{engine}.{name}",
+            IMPORTER_VERSION,
+            legal_code.html_file,
+            content,
+        )
+        results = None
+        if not self.nocache:
+            results = self.extraction_cache.get(key)
+        if results is None:
+            messages = self.get_importer(name, engine)(
+                content=content, legal_code=legal_code, **kwargs
+            )
+            if messages is not None:
+                # Plain strings (NavigableStrings reference their soup)
+                messages = validate_dictionary_is_all_text(messages)
+                if self.compare_engines and hasattr(lxml_importers, name):
+                    self.compare_messages(
+                        name,
+                        engine,
+                        messages,
+                        content=content,
+                        legal_code=legal_code,
+                    )
+            results = {"messages": messages, "title": legal_code.title}
+            # Only simple_import_license_html extracts the HTML of the legal
+            # code
+            if name == "simple_import_license_html":
+                results["html"] = legal_code.html
+            self.extraction_cache.set(key, results)
+            self.files_parsed += 1
+            return messages
+        legal_code.title = results["title"]
+        if "html" in results:
+            legal_code.html = results["html"]
+        legal_code.save()
+        self.files_cached += 1
+        return results["messages"]
+
+    def compare_messages(self, name, engine, messages, *, content, legal_code):
+        """
+        Extract the messages of the content with the other engine and record
+        the legal code's HTML file if they differ from the messages.
+        """
+        other_engine = "bs4" if engine == "lxml" else "lxml"
+        try:
+            other_messages = validate_dictionary_is_all_text(
+                self.get_importer(name, other_engine)(
+                    content=content, legal_code=legal_code
+                )
+            )
+        except Exception as e:
+            LOG.error(
+                f"{legal_code.html_file}: the {other_engine} engine failed:"
+                f" {e!r}"
+            )
+            self.engine_differences.append(legal_code.html_file)
+            return
+        keys = sorted(
+            key
+            for key in set(messages) | set(other_messages)
+            if messages.get(key) != other_messages.get(key)
+        )
+        if keys:
+            LOG.error(
+                f"{legal_code.html_file}: the engines extracted different"
+                f" messages: {', '.join(keys)}"
+            )
+            self.engine_differences.append(legal_code.html_file)
 
     def write_po_files(
         self,
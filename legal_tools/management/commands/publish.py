@@ -1,30 +1,69 @@
 # Standard library
+import hashlib
+import json
 import logging
+import mimetypes
 import os
-import re
 import socket
+import time
 from argparse import ArgumentParser
-from shutil import copyfile, rmtree
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatchcase
+from itertools import chain
+from shutil import copy2, rmtree
+from xml.sax.saxutils import escape
 
 # Third-party
 import git
 from django.conf import settings
-from django.core.management import BaseCommand, CommandError
+from django.core.management import BaseCommand, CommandError, call_command
 from django.http.response import Http404
 from django.urls import reverse
 
 # First-party/Local
 from i18n import DEFAULT_CSV_FILE
-from i18n.utils import write_transstats_csv
+from i18n.utils import compile_pofile, write_transstats_csv
+from legal_tools.dependencies import DependencyGraph, get_changed_files
 from legal_tools.git_utils import commit_and_push_changes, setup_local_branch
 from legal_tools.models import LegalCode, TranslationBranch
+from legal_tools.profiling import MIB, MemoryLimitExceeded, PublishProfiler
+from legal_tools.render_daemon import (
+    RenderDaemonClient,
+    get_template_dirs,
+    reset_templates,
+    reset_translations,
+)
+from legal_tools.templatetags.license_tags import (
+    get_fragment_cache_stats,
+    reset_fragment_cache_stats,
+)
 from legal_tools.utils import (
+    NGINX_REDIRECT_VARIABLE,
+    OutputWriter,
+    RedirectPairsSpool,
+    brotli,
+    compress_bytes,
+    exchange_paths,
+    get_nginx_redirects_map,
+    get_url_content,
     init_utils_logger,
+    init_utils_renderer,
+    init_utils_writer,
     relative_symlink,
     save_bytes_to_file,
+    save_chunks_to_file,
+    save_lines_to_file,
     save_redirect,
     save_url_as_static_file,
 )
+from legal_tools.views import (
+    get_list_tools_and_units,
+    init_views_list_cache,
+    iter_metadata_json,
+    iter_metadata_yaml,
+    iter_tools_metadata,
+)
+from legal_tools.watch import get_watcher, wait_for_changes
 
 LOG = logging.getLogger(__name__)
 LOG_LEVELS = {
@@ -38,6 +77,78 @@ LOG_LEVELS = {
 # RE: CNAME
 # https://docs.github.com/en/pages/configuring-a-custom-domain-for-your-github-pages-site
 DOCS_IGNORE = [".nojekyll", "CNAME"]
+# Text files that are also written as pre-compressed siblings (foo.html.gz,
+# etc.) for the nginx gzip_static (and brotli_static) directives
+COMPRESS_EXTENSIONS = (".html", ".json", ".rdf", ".txt", ".xml", ".yaml")
+COMPRESS_FILENAMES = ("rdf",)  # Legal tool RDFs do not have an extension
+COMPRESS_MIN_SIZE = 256
+# Options of the targeted publish filters
+TARGET_FILTERS = ("unit", "version", "jurisdiction", "language")
+MANIFEST_FILENAME = "manifest.json"
+# The legal codes are fetched from the database in chunks (instead of caching
+# every legal code of a group) and the redirect pairs are spilled to disk
+# beyond REDIRECT_PAIRS_BUFFERED pairs, so the memory of publish does not grow
+# with the number of legal codes
+LEGAL_CODES_CHUNK_SIZE = 100
+REDIRECT_PAIRS_BUFFERED = 10000
+# Use the Python defaults (instead of the host's mime.types) so that the
+# manifest is the same wherever it is built
+MIME_TYPES = mimetypes.MimeTypes()
+MIME_TYPES.add_type("text/yaml", ".yaml")
+SITEMAP_BASE_URL = "https://creativecommons.org"
+SITEMAP_FILENAME = "sitemap.xml"
+NGINX_INCLUDE_HEADER = [
+    "# DO NOT EDIT MANUALLY",
+    "# This file was generated by the publish command.",
+    "# https://github.com/creativecommons/cc-legal-tools-app",
+]
+NGINX_INCLUDE_FOOTER = [
+    "# vim: set ft=nginx",
+    "",
+]
+
+
+def is_compressible(relpath):
+    filename = os.path.basename(relpath)
+    return (
+        filename.endswith(COMPRESS_EXTENSIONS)
+        or filename in COMPRESS_FILENAMES
+    )
+
+
+def get_content_type_and_encoding(relpath):
+    """
+    Return the content type and the content encoding (or None) of an output
+    file.
+    """
+    content_type, encoding = MIME_TYPES.guess_type(relpath, strict=False)
+    if encoding:
+        base_filename = os.path.basename(os.path.splitext(relpath)[0])
+    else:
+        base_filename = os.path.basename(relpath)
+    if base_filename in COMPRESS_FILENAMES:  # Legal tool RDFs
+        content_type = "application/rdf+xml"
+    return content_type or "application/octet-stream", encoding
+
+
+def load_manifest(output_dir):
+    """
+    Return the files listed in the manifest of a previous build, or an empty
+    dictionary if there isn't one.
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_FILENAME), "rb") as f:
+            return json.load(f)["files"]
+    except (FileNotFoundError, KeyError, ValueError):
+        return {}
+
+
+def compress_file(filename, suffix):
+    with open(filename, "rb") as f:
+        filebytes = f.read()
+    if len(filebytes) < COMPRESS_MIN_SIZE:
+        return None
+    return compress_bytes(filebytes, suffix)
 
 
 def list_open_translation_branches():
@@ -94,20 +205,181 @@ class Command(BaseCommand):
             action="store_true",
             help="Update the local branches, but don't push upstream.",
         )
+        parser.add_argument(
+            "--brotli",
+            action="store_true",
+            help="Also write Brotli (.br) pre-compressed files (requires the"
+            " brotli module and the nginx ngx_brotli module).",
+        )
+        parser.add_argument(
+            "--nodaemon",
+            action="store_true",
+            help="Render the pages in this process even if a render daemon"
+            " (see the render_daemon command) is running.",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="Record the wall time, CPU time, database queries, and bytes"
+            " written of each stage, page type (deed, legal_code, redirect,"
+            " list), and page. Log them (with the slowest pages) and write a"
+            " JSON timing report (publish_profile.json).",
+        )
+        parser.add_argument(
+            "--cprofile",
+            action="store_true",
+            help="Also run publish with cProfile and write its statistics"
+            " (publish_profile.prof, see the pstats module). Implies"
+            " --profile.",
+        )
+        parser.add_argument(
+            "--profile-dir",
+            default=".",
+            help="Directory of the --profile reports (default: the current"
+            " directory)",
+        )
+        parser.add_argument(
+            "--profile-top",
+            type=int,
+            default=10,
+            help="Number of slowest pages to log (default: 10)",
+        )
+        parser.add_argument(
+            "--query-budget",
+            type=int,
+            default=settings.PUBLISH_QUERY_BUDGET,
+            help="Maximum number of database queries of a page. Publish fails"
+            " (before the output is replaced) if a page exceeds it. Pages are"
+            " rendered in this process (not by a render daemon) so that their"
+            " queries are counted. (default: settings.PUBLISH_QUERY_BUDGET)",
+        )
+        parser.add_argument(
+            "--max-memory",
+            type=int,
+            default=settings.PUBLISH_MAX_MEMORY,
+            help="Maximum peak of the memory allocated by Python, in MiB."
+            " Memory is traced with tracemalloc (which slows publish down),"
+            " the peak of each stage is logged, and publish fails as soon as"
+            " the peak exceeds the limit. (default:"
+            " settings.PUBLISH_MAX_MEMORY)",
+        )
 
-    def purge_output_dir(self):
-        output_dir = self.output_dir
-        LOG.info(f"Purging output_dir: {output_dir}")
-        output_dir_items = [
-            os.path.join(output_dir, item)
-            for item in os.listdir(output_dir)
-            if item not in DOCS_IGNORE
-        ]
-        for item in output_dir_items:
-            if os.path.isdir(item):
-                rmtree(item)
-            else:
-                os.remove(item)
+        targetargs = parser.add_argument_group(
+            "targeted publish",
+            "Only render the deeds, legal codes, and redirects of the matching"
+            " legal codes (and the lists of their categories) into the"
+            " existing output directory, without purging it. Each option may"
+            " be repeated and its patterns may use shell-style wildcards (ex."
+            " --unit 'by*'). Requires --nogit.",
+        )
+        targetargs.add_argument(
+            "--unit", action="append", metavar="PATTERN", help="ex. by-sa"
+        )
+        targetargs.add_argument(
+            "--tool-version",
+            action="append",
+            dest="version",
+            metavar="PATTERN",
+            help="ex. 4.0 (--version is the version of Django)",
+        )
+        targetargs.add_argument(
+            "--jurisdiction",
+            action="append",
+            metavar="PATTERN",
+            help="ex. ca ('' for unported and international tools)",
+        )
+        targetargs.add_argument(
+            "--language", action="append", metavar="PATTERN", help="ex. de"
+        )
+        parser.add_argument(
+            "--changed-since",
+            metavar="REV",
+            help="Only render the pages affected by the changes to the app and"
+            " the data repository since the git revision (ex. HEAD for the"
+            " uncommitted changes), per the dependency graph of the previous"
+            " publish (settings.PUBLISH_DEPENDENCIES_FILE), into the existing"
+            " output directory. Changes to Python files publish everything."
+            " Requires --nogit.",
+        )
+        parser.add_argument(
+            "--watch",
+            action="store_true",
+            help="After publishing, watch the translations (LOCALE_PATHS),"
+            " templates, and static assets (STATICFILES_DIRS) until"
+            " interrupted. Changed .po files are compiled, changed static"
+            " assets are collected (collectstatic), and only the pages"
+            " affected by the changes (per the dependency graph) are"
+            " rendered again. Requires --nogit.",
+        )
+        parser.add_argument(
+            "--watch-poll",
+            action="store_true",
+            help="Poll for changes instead of using inotify (ex. for network"
+            " file systems). Implies --watch.",
+        )
+
+    def stage_output_dir(self):
+        """
+        Create an empty staging directory next to the output directory and
+        build into it, so that the live output directory is left intact (and
+        can continue to be served) until the build is complete. The files
+        that are unchanged since the live build (per its manifest) are
+        hard-linked from it instead of written.
+        """
+        staging_dir = self.staging_dir
+        if os.path.exists(staging_dir):
+            LOG.info(f"Removing stale staging_dir: {staging_dir}")
+            rmtree(staging_dir)
+        LOG.info(f"Creating staging_dir: {staging_dir}")
+        os.makedirs(staging_dir, mode=0o755)
+        for item in DOCS_IGNORE:
+            item_path = os.path.join(self.output_dir, item)
+            if os.path.isfile(item_path):
+                copy2(item_path, os.path.join(staging_dir, item))
+        self.writer.forget_directories()
+        self.writer.set_previous_build(
+            staging_dir,
+            self.live_output_dir,
+            load_manifest(self.live_output_dir),
+        )
+        self.output_dir = staging_dir
+
+    def swap_output_dir(self):
+        """
+        Swap the completed staging directory into place as the output
+        directory and remove the previous output.
+        """
+        live_dir = self.live_output_dir
+        staging_dir = self.staging_dir
+        LOG.info(f"Swapping staging_dir into output_dir: {live_dir}")
+        if os.path.isdir(live_dir):
+            exchange_paths(staging_dir, live_dir)
+            # staging_dir now contains the previous output
+            rmtree(staging_dir)
+        else:
+            os.rename(staging_dir, live_dir)
+        self.writer.forget_directories()
+        self.writer.clear_previous_build()
+        self.output_dir = live_dir
+
+    def add_source(self, relpath, legal_code):
+        """
+        Record the LegalCode an output file was generated from (for the
+        manifest).
+        """
+        self.sources[os.path.normpath(relpath)] = {
+            "canonical_url": legal_code.tool.canonical_url,
+            "language_code": legal_code.language_code,
+        }
+
+    def add_page(self, relpath, legal_code=None):
+        """
+        Record a page to be listed in the sitemap (and, optionally, the
+        LegalCode it was generated from).
+        """
+        self.pages.append(relpath)
+        if legal_code is not None:
+            self.add_source(relpath, legal_code)
 
     def check_static_files(self):
         if not os.path.isdir(settings.STATIC_ROOT):
@@ -139,95 +411,225 @@ class Command(BaseCommand):
         LOG.debug(f"{hostname}:{output_dir}")
         LOG.info("Writing lists")
 
-        for category in ["licenses", "publicdomain"]:
-            for language_code in settings.LANGUAGES_MOSTLY_TRANSLATED:
-                relpath = f"{category}/list.{language_code}.html"
-                save_url_as_static_file(
-                    output_dir,
-                    url=reverse(
+        # The language independent data of each list page is only built once
+        # and is shared by the renders of all of the languages
+        init_views_list_cache({})
+        try:
+            for category in ["licenses", "publicdomain"]:
+                pages = []
+                for language_code in settings.LANGUAGES_MOSTLY_TRANSLATED:
+                    relpath = f"{category}/list.{language_code}.html"
+                    if not self.is_list_targeted(
+                        category, language_code, relpath
+                    ):
+                        continue
+                    url = reverse(
                         "view_list_language_specified",
                         kwargs={
                             "category": category,
                             "language_code": language_code,
                         },
-                    ),
-                    relpath=relpath,
-                )
-            relpath = f"{category}/list.{settings.LANGUAGE_CODE}.html"
-            symlink = "list.html"
-            relative_symlink(output_dir, relpath, symlink)
+                    )
+                    pages.append((relpath, url, language_code))
+                if not pages:
+                    continue
+                # Build the shared data here so that the renders do not
+                # query the database from the worker threads
+                get_list_tools_and_units(category, os.path.dirname(url))
+                with ThreadPoolExecutor() as executor:
+                    contents = executor.map(
+                        lambda page: self.render_list(*page), pages
+                    )
+                    # Write on this thread (OutputWriter is not thread-safe)
+                    for (relpath, __, __), content in zip(pages, contents):
+                        LOG.debug(f"    {relpath}")
+                        save_bytes_to_file(
+                            content, os.path.join(output_dir, relpath)
+                        )
+                        self.add_page(relpath)
+                relpath = f"{category}/list.{settings.LANGUAGE_CODE}.html"
+                symlink = "list.html"
+                relative_symlink(output_dir, relpath, symlink)
+        finally:
+            init_views_list_cache()
+
+    def render_list(self, relpath, url, language_code):
+        with self.profiler.page(
+            "list", relpath
+        ) as record, self.dependencies.page(
+            relpath, language_code
+        ) as dependencies_record:
+            content = get_url_content(url)
+            record["bytes"] = len(content)
+            # Saved by the main thread
+            dependencies_record["content"] = content
+        return content
 
     def write_legal_tools(self):
         hostname = socket.gethostname()
         output_dir = self.output_dir
 
         legal_codes = LegalCode.objects.validgroups()
-        redirect_pairs = []
-        for group in legal_codes.keys():
-            LOG.debug(f"{hostname}:{output_dir}")
-            LOG.info(f"Writing {group}")
-            for legal_code in legal_codes[group]:
-                # deed
-                try:
-                    (
-                        relpath,
-                        symlinks,
-                        redirects_data,
-                    ) = legal_code.get_publish_files("deed")
-                    save_url_as_static_file(
-                        output_dir,
-                        url=legal_code.deed_url,
-                        relpath=relpath,
-                    )
-                    for symlink in symlinks:
-                        relative_symlink(output_dir, relpath, symlink)
-                    for redirect_data in redirects_data:
-                        save_redirect(output_dir, redirect_data)
-                    redirect_pairs += legal_code.get_redirect_pairs("deed")
-                except Http404 as e:
-                    if "invalid language" not in str(e):
-                        raise
-                # legalcode
-                (
-                    relpath,
-                    symlinks,
-                    redirects_data,
-                ) = legal_code.get_publish_files("legalcode")
-                if relpath:
-                    # Deed-only tools will not return a legal code relpath
-                    save_url_as_static_file(
-                        output_dir,
-                        url=legal_code.legal_code_url,
-                        relpath=relpath,
-                    )
-                for symlink in symlinks:
-                    relative_symlink(output_dir, relpath, symlink)
-                for redirect_data in redirects_data:
-                    save_redirect(output_dir, redirect_data)
-                redirect_pairs += legal_code.get_redirect_pairs("legalcode")
-
-        redirect_pairs.sort(key=lambda x: x[0], reverse=True)
-        for i, pair in enumerate(redirect_pairs):
-            redirect_pairs[i][0] = re.escape(pair[0])
-        widths = [max(map(len, map(str, col))) for col in zip(*redirect_pairs)]
-        redirects_include = [
-            "# DO NOT EDIT MANUALLY",
-            "# This file was generated by the publish command.",
-            "# https://github.com/creativecommons/cc-legal-tools-app",
-        ]
-        for regex, replacement in redirect_pairs:
-            regex = f"^/{regex.ljust(widths[0])}"
-            replacement = replacement.ljust(widths[1])
-            redirects_include.append(
-                f"rewrite {regex} {replacement} permanent;"
+        with RedirectPairsSpool(REDIRECT_PAIRS_BUFFERED) as redirect_pairs:
+            for group, queryset in legal_codes.items():
+                LOG.debug(f"{hostname}:{output_dir}")
+                LOG.info(f"Writing {group}")
+                for legal_code in queryset.select_related("tool").iterator(
+                    chunk_size=LEGAL_CODES_CHUNK_SIZE
+                ):
+                    if not self.is_targeted(legal_code):
+                        continue
+                    self.targeted_categories.add(legal_code.tool.category)
+                    self.write_legal_code(legal_code, redirect_pairs)
+            if self.targeted:
+                # The map covers the redirects of every legal code
+                LOG.info("Targeted publish: not writing nginx redirects")
+            else:
+                self.write_nginx_language_redirects(redirect_pairs)
+
+    def write_legal_code(self, legal_code, redirect_pairs):
+        output_dir = self.output_dir
+        # deed
+        try:
+            (
+                relpath,
+                symlinks,
+                redirects_data,
+            ) = legal_code.get_publish_files("deed")
+            with self.profiler.page("deed", relpath), self.dependencies.page(
+                relpath, legal_code.language_code, legal_code
+            ) as dependencies_record:
+                dependencies_record["content"] = save_url_as_static_file(
+                    output_dir,
+                    url=legal_code.deed_url,
+                    relpath=relpath,
+                )
+            self.add_page(relpath, legal_code)
+            for symlink in symlinks:
+                relative_symlink(output_dir, relpath, symlink)
+                self.add_source(
+                    os.path.join(os.path.dirname(relpath), symlink),
+                    legal_code,
+                )
+            for redirect_data in redirects_data:
+                self.write_redirect(redirect_data, legal_code)
+                self.add_source(redirect_data["redirect_file"], legal_code)
+            redirect_pairs.add(legal_code.get_redirect_pairs("deed"))
+        except Http404 as e:
+            if "invalid language" not in str(e):
+                raise
+        # legalcode
+        (
+            relpath,
+            symlinks,
+            redirects_data,
+        ) = legal_code.get_publish_files("legalcode")
+        if relpath:
+            # Deed-only tools will not return a legal code relpath
+            with self.profiler.page(
+                "legal_code", relpath
+            ), self.dependencies.page(
+                relpath, legal_code.language_code, legal_code
+            ) as dependencies_record:
+                dependencies_record["content"] = save_url_as_static_file(
+                    output_dir,
+                    url=legal_code.legal_code_url,
+                    relpath=relpath,
+                )
+            self.add_page(relpath, legal_code)
+        for symlink in symlinks:
+            relative_symlink(output_dir, relpath, symlink)
+            self.add_source(
+                os.path.join(os.path.dirname(relpath), symlink),
+                legal_code,
+            )
+        for redirect_data in redirects_data:
+            self.write_redirect(redirect_data, legal_code)
+            self.add_source(redirect_data["redirect_file"], legal_code)
+        redirect_pairs.add(legal_code.get_redirect_pairs("legalcode"))
+
+    def matches_targets(self, **values):
+        """
+        Return True if each of the values (ex. language="de") matches one of
+        the patterns of its targeted publish filter (if any).
+        """
+        for name, value in values.items():
+            patterns = self.targets.get(name)
+            if patterns and not any(
+                fnmatchcase(value, pattern) for pattern in patterns
+            ):
+                return False
+        return True
+
+    def is_targeted(self, legal_code):
+        """
+        Return True if the legal code matches the targeted publish filters or
+        has pages affected by the changes (always True when neither is used).
+        """
+        if self.changed_legal_codes is not None:
+            return legal_code.id in self.changed_legal_codes
+        if not self.targets:
+            return True
+        return self.matches_targets(
+            unit=legal_code.tool.unit,
+            version=legal_code.tool.version,
+            jurisdiction=legal_code.tool.jurisdiction_code,
+            language=legal_code.language_code,
+        )
+
+    def is_list_targeted(self, category, language_code, relpath):
+        """
+        Return True if the list page matches the targeted publish filters (its
+        category has targeted legal codes) or is affected by the changes
+        (always True when neither is used).
+        """
+        if self.changed_pages is not None:
+            return relpath in self.changed_pages
+        if not self.targets:
+            return True
+        return category in self.targeted_categories and self.matches_targets(
+            language=language_code
+        )
+
+    def write_redirect(self, redirect_data, legal_code):
+        relpath = redirect_data["redirect_file"]
+        with self.profiler.page("redirect", relpath), self.dependencies.page(
+            relpath, redirect_data["language_code"], legal_code
+        ) as dependencies_record:
+            dependencies_record["content"] = save_redirect(
+                self.output_dir, redirect_data
             )
-        redirects_include.append("# vim: set ft=nginx")
-        redirects_include.append("")
+
+    def write_nginx_language_redirects(self, redirect_pairs):
+        """
+        Write the nginx language redirects includes:
+        - nginx_language_redirects_map.conf (http context): map of the
+          redirect URIs to their destinations
+        - nginx_language_redirects (server context): redirect requests with a
+          destination in the map
+        """
+        LOG.info("Writing nginx_language_redirects")
+        # The map is written as it is generated (it has a line per redirect)
+        save_lines_to_file(
+            chain(
+                NGINX_INCLUDE_HEADER,
+                get_nginx_redirects_map(redirect_pairs),
+                NGINX_INCLUDE_FOOTER,
+            ),
+            os.path.join(self.config_dir, "nginx_language_redirects_map.conf"),
+        )
+        redirects_include = NGINX_INCLUDE_HEADER + [
+            "# Requires nginx_language_redirects_map.conf (http context)",
+            f"if ({NGINX_REDIRECT_VARIABLE}) {{",
+            f"    return 301 {NGINX_REDIRECT_VARIABLE};",
+            "}",
+        ]
+        redirects_include += NGINX_INCLUDE_FOOTER
         redirects_include = "\n".join(redirects_include).encode("utf-8")
-        redirects_filename = os.path.join(
-            self.config_dir, "nginx_language_redirects"
+        save_bytes_to_file(
+            redirects_include,
+            os.path.join(self.config_dir, "nginx_language_redirects"),
         )
-        save_bytes_to_file(redirects_include, redirects_filename)
 
     def write_translation_branch_statuses(self):
         hostname = socket.gethostname()
@@ -266,8 +668,7 @@ class Command(BaseCommand):
                 continue
             relative_name = os.path.join(*name.split("_"), "rdf")
             dest_file = os.path.join(output_dir, relative_name)
-            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-            copyfile(os.path.join(tools_rdf_dir, rdf), dest_file)
+            self.writer.copyfile(os.path.join(tools_rdf_dir, rdf), dest_file)
             LOG.debug(f"    {relative_name}")
 
     def copy_meta_rdfs(self):
@@ -281,19 +682,17 @@ class Command(BaseCommand):
             if os.path.isfile(os.path.join(meta_rdf_dir, meta_file))
         ]
         meta_files.sort()
-        dest_dir = os.path.join(output_dir, "rdf")
-        os.makedirs(dest_dir, exist_ok=True)
         LOG.debug(f"{hostname}:{output_dir}")
         LOG.info("Copying RDF information and metadata")
         for meta_file in meta_files:
             dest_relative = os.path.join("rdf", meta_file)
             dest_full = os.path.join(output_dir, dest_relative)
             LOG.debug(f"    {dest_relative}")
-            copyfile(os.path.join(meta_rdf_dir, meta_file), dest_full)
+            self.writer.copyfile(
+                os.path.join(meta_rdf_dir, meta_file), dest_full
+            )
             if meta_file == "index.rdf":
-                os.makedirs(
-                    os.path.join(output_dir, "licenses"), exist_ok=True
-                )
+                self.writer.makedirs(os.path.join(output_dir, "licenses"))
                 dir_fd = os.open(output_dir, os.O_RDONLY)
                 symlink = os.path.join("licenses", meta_file)
                 try:
@@ -345,56 +744,467 @@ class Command(BaseCommand):
                 "legalcode.txt",
             )
             dest_file = os.path.join(output_dir, relative_name)
-            os.makedirs(os.path.dirname(dest_file), exist_ok=True)
-            copyfile(os.path.join(plaintext_dir, text), dest_file)
+            self.writer.copyfile(os.path.join(plaintext_dir, text), dest_file)
             LOG.debug(f"    {relative_name}")
 
     def run_write_transstats_csv(self):
         LOG.info("Generating translations statistics CSV")
         write_transstats_csv(DEFAULT_CSV_FILE)
 
-    def write_metadata_yaml(self):
+    def write_metadata(self):
         hostname = socket.gethostname()
         output_dir = self.output_dir
 
         LOG.debug(f"{hostname}:{output_dir}")
-        LOG.info("Writing metadata.yaml")
+        LOG.info("Writing metadata.yaml and metadata.json")
 
-        save_url_as_static_file(
-            output_dir,
-            url=reverse("metadata"),
-            relpath="licenses/metadata.yaml",
+        # Each format is streamed to its file from its own pass over the
+        # tools, so neither document is held in memory
+        for relpath, iter_metadata in (
+            ("licenses/metadata.yaml", iter_metadata_yaml),
+            ("licenses/metadata.json", iter_metadata_json),
+        ):
+            save_chunks_to_file(
+                iter_metadata(iter_tools_metadata()),
+                os.path.join(output_dir, relpath),
+            )
+
+    def compress_output(self):
+        """
+        Write pre-compressed siblings (.gz and, optionally, .br) of the text
+        files in the output directory. Files that are unchanged since the
+        previous build (per its manifest) reuse its compressed siblings.
+        """
+        hostname = socket.gethostname()
+        output_dir = self.output_dir
+        live_output_dir = self.live_output_dir
+
+        LOG.debug(f"{hostname}:{output_dir}")
+        LOG.info("Writing pre-compressed files")
+        suffixes = [".gz"]
+        if self.options["brotli"]:
+            suffixes.append(".br")
+        previous_files = load_manifest(live_output_dir)
+        output_digests = self.writer.get_digests(output_dir)
+        to_compress = []
+        reused = 0
+        for relpath, digest in sorted(output_digests.items()):
+            if not is_compressible(relpath):
+                continue
+            previous_digest = previous_files.get(relpath, {}).get("sha256")
+            for suffix in suffixes:
+                previous_compressed = os.path.join(
+                    live_output_dir, f"{relpath}{suffix}"
+                )
+                if (
+                    previous_digest == digest
+                    and f"{relpath}{suffix}" in previous_files
+                    and os.path.isfile(previous_compressed)
+                ):
+                    self.writer.copyfile(
+                        previous_compressed,
+                        os.path.join(output_dir, f"{relpath}{suffix}"),
+                    )
+                    reused += 1
+                else:
+                    to_compress.append((relpath, suffix))
+
+        # Compression (zlib/brotli) releases the GIL, so threads are enough to
+        # use all of the CPUs. Files are written by this thread.
+        with ThreadPoolExecutor() as executor:
+            results = executor.map(
+                lambda item: compress_file(
+                    os.path.join(output_dir, item[0]), item[1]
+                ),
+                to_compress,
+            )
+            compressed = 0
+            for (relpath, suffix), compressed_bytes in zip(
+                to_compress, results
+            ):
+                if compressed_bytes is None:
+                    continue
+                self.writer.save_bytes_to_file(
+                    compressed_bytes,
+                    os.path.join(output_dir, f"{relpath}{suffix}"),
+                )
+                compressed += 1
+        LOG.info(f"    {compressed} compressed, {reused} reused")
+
+        # Symlinks (ex. deed.html => deed.en.html) get matching symlinks to
+        # the compressed files (deed.html.gz => deed.en.html.gz)
+        for dirpath, __, filenames in os.walk(output_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if not os.path.islink(path) or not is_compressible(filename):
+                    continue
+                target = os.readlink(path)
+                for suffix in suffixes:
+                    target_path = os.path.join(dirpath, f"{target}{suffix}")
+                    link_path = f"{path}{suffix}"
+                    if os.path.isfile(target_path) and not os.path.lexists(
+                        link_path
+                    ):
+                        os.symlink(f"{target}{suffix}", link_path)
+
+    def write_nginx_compression_include(self):
+        """
+        Write the nginx include that serves the pre-compressed files.
+        """
+        LOG.info("Writing nginx_compression")
+        compression_include = NGINX_INCLUDE_HEADER.copy()
+        compression_include += ["gzip_static on;", "gzip_vary on;"]
+        if self.options["brotli"]:
+            # Requires https://github.com/google/ngx_brotli
+            compression_include.append("brotli_static on;")
+        compression_include += NGINX_INCLUDE_FOOTER
+        compression_include = "\n".join(compression_include).encode("utf-8")
+        save_bytes_to_file(
+            compression_include,
+            os.path.join(self.config_dir, "nginx_compression"),
+        )
+
+    def write_sitemap(self):
+        """
+        Write a sitemap of the deed, legal code, and list pages.
+        """
+        LOG.info(f"Writing {SITEMAP_FILENAME}")
+        sitemap = [
+            '<?xml version="1.0" encoding="UTF-8"?>',
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">',
+        ]
+        for relpath in sorted(self.pages):
+            if relpath.endswith(".html"):
+                relpath = relpath[:-5]
+            url = escape(f"{SITEMAP_BASE_URL}/{relpath}")
+            sitemap.append(f"  <url><loc>{url}</loc></url>")
+        sitemap.append("</urlset>")
+        sitemap.append("")
+        save_bytes_to_file(
+            "\n".join(sitemap).encode("utf-8"),
+            os.path.join(self.output_dir, SITEMAP_FILENAME),
+        )
+
+    def write_manifest(self):
+        """
+        Write the build manifest of the files in the output directory. Each
+        regular file has its size, sha256 digest, content type (and encoding),
+        and the LegalCode it was generated from (if any). Each symlink has its
+        target.
+        """
+        output_dir = self.output_dir
+        LOG.info(f"Writing {MANIFEST_FILENAME}")
+        output_digests = self.writer.get_digests(output_dir)
+        previous_files = {}
+        if self.targeted:
+            # Only the sources of the targeted legal codes were recorded
+            previous_files = load_manifest(output_dir)
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(output_dir):
+            # Symlinks to directories are listed in dirnames
+            for filename in filenames + dirnames:
+                path = os.path.join(dirpath, filename)
+                relpath = os.path.relpath(path, output_dir)
+                is_symlink = os.path.islink(path)
+                if relpath == MANIFEST_FILENAME or (
+                    filename in dirnames and not is_symlink
+                ):
+                    continue
+                content_type, encoding = get_content_type_and_encoding(relpath)
+                if is_symlink:
+                    entry = {"symlink": os.readlink(path)}
+                else:
+                    digest = output_digests.get(relpath)
+                    size = os.lstat(path).st_size
+                    previous = previous_files.get(relpath, {})
+                    if digest is None and previous.get("size") == size:
+                        # Not written by this targeted publish
+                        digest = previous.get("sha256")
+                    if digest is None:
+                        with open(path, "rb") as f:
+                            digest = hashlib.sha256(f.read()).hexdigest()
+                    entry = {
+                        "content_type": content_type,
+                        "sha256": digest,
+                        "size": size,
+                    }
+                    if encoding:
+                        entry["content_encoding"] = encoding
+                # Compressed siblings have the source of the original file
+                if encoding:
+                    source = self.sources.get(os.path.splitext(relpath)[0])
+                else:
+                    source = self.sources.get(relpath)
+                if not source:
+                    source = previous_files.get(relpath, {}).get("legal_code")
+                if source:
+                    entry["legal_code"] = source
+                files[relpath] = entry
+        manifest = json.dumps({"files": files}, indent=2, sort_keys=True)
+        save_bytes_to_file(
+            f"{manifest}\n".encode("utf-8"),
+            os.path.join(output_dir, MANIFEST_FILENAME),
+        )
+
+    def check_query_budget(self):
+        """
+        Fail (before the output directory is replaced) if pages exceeded the
+        query budget.
+        """
+        pages = self.profiler.get_pages_over_query_budget()
+        if not pages:
+            return
+        for page in sorted(pages, key=lambda page: -page["queries"]):
+            LOG.error(
+                f"{page['name']} ({page['type']}): {page['queries']} queries"
+                f" ({page['query_time']:.3f}s)"
+            )
+        raise CommandError(
+            f"{len(pages)} pages exceeded the query budget of"
+            f" {self.profiler.query_budget} queries."
+        )
+
+    def write_dependency_graph(self):
+        """
+        Save the dependencies of the pages (see --changed-since). A targeted
+        publish updates the dependencies of the pages it wrote.
+        """
+        path = settings.PUBLISH_DEPENDENCIES_FILE
+        graph = self.dependencies
+        if self.targeted:
+            graph = DependencyGraph.load(path)
+            if graph is None:
+                LOG.info("No dependency graph to update (see --changed-since)")
+                return
+            graph.update(self.dependencies)
+        LOG.info(f"Writing dependency graph: {path}")
+        graph.save(path)
+
+    def find_changed_pages(self, rev):
+        """
+        Find the pages affected by the changes to the files of the app and of
+        the data repository since the git revision.
+        """
+        changed_files = set()
+        for repo_dir in [settings.PROJECT_ROOT, settings.DATA_REPOSITORY_DIR]:
+            try:
+                changed_files |= get_changed_files(repo_dir, rev)
+            except git.exc.GitError as e:
+                raise CommandError(
+                    f"Cannot list the changes since {rev} in {repo_dir}: {e}"
+                )
+        app_dir = os.path.join(settings.PROJECT_ROOT, "")
+        code = [
+            path
+            for path in changed_files
+            if path.startswith(app_dir)
+            and path.endswith(".py")
+            and f"{os.sep}tests{os.sep}" not in path
+        ]
+        if code:
+            # The graph only covers templates, translations, and static assets
+            LOG.warning(
+                f"{len(code)} Python files changed since {rev}: publishing"
+                " everything"
+            )
+            return
+        self.target_changed_files(changed_files, f"since {rev}")
+
+    def target_changed_files(self, changed_files, description):
+        """
+        Only publish the pages affected by the changed files (absolute paths),
+        per the dependency graph of the previous publish.
+        """
+        path = settings.PUBLISH_DEPENDENCIES_FILE
+        graph = DependencyGraph.load(path)
+        if graph is None:
+            raise CommandError(
+                f"There is no dependency graph ({path}). Run a full publish"
+                " first."
+            )
+        affected = graph.get_affected_pages(changed_files)
+        self.changed_pages = set(affected)
+        self.changed_legal_codes = {
+            legal_code_id
+            for dependencies in affected.values()
+            for legal_code_id in dependencies["legal_codes"]
+        }
+        self.targeted = True
+        LOG.info(
+            f"{len(changed_files)} files changed {description}:"
+            f" {len(affected)} pages affected"
+            f" ({len(self.changed_legal_codes)} legal codes)"
         )
 
+    def watch(self):
+        """
+        Publish the pages affected by the changes to the translations,
+        templates, and static assets until interrupted.
+        """
+        template_dirs = get_template_dirs()
+        dirs = [
+            str(path)
+            for path in list(settings.LOCALE_PATHS)
+            + template_dirs
+            + list(settings.STATICFILES_DIRS)
+            if os.path.isdir(path)
+        ]
+        watcher = get_watcher(dirs, polling=self.options["watch_poll"])
+        LOG.info(
+            f"Watching for changes ({type(watcher).__name__}):"
+            f" {', '.join(dirs)}"
+        )
+        template_prefixes = tuple(
+            os.path.join(path, "") for path in template_dirs
+        )
+        static_prefixes = tuple(
+            os.path.join(path, "") for path in settings.STATICFILES_DIRS
+        )
+        try:
+            while True:
+                # The .mo files are compiled from the changed .po files
+                changed_files = {
+                    path
+                    for path in wait_for_changes(watcher)
+                    if not path.endswith(".mo")
+                }
+                if not changed_files:
+                    continue
+                try:
+                    self.publish_changes(
+                        changed_files, template_prefixes, static_prefixes
+                    )
+                except Exception:
+                    # Ex. a half-saved .po file or a template syntax error:
+                    # the next change may fix it
+                    LOG.exception(
+                        "Publishing the changes failed. Still watching."
+                    )
+        except KeyboardInterrupt:
+            LOG.info("Stopped watching")
+        finally:
+            watcher.close()
+
+    def publish_changes(
+        self, changed_files, template_prefixes, static_prefixes
+    ):
+        """
+        Publish the pages affected by the changed files (see watch).
+        """
+        start = time.perf_counter()
+        self.pages = []
+        self.sources = {}
+        self.targeted_categories = set()
+        pofiles = [
+            path
+            for path in changed_files
+            if path.endswith(".po") and os.path.isfile(path)
+        ]
+        for pofile_path in pofiles:
+            LOG.info(f"Compiling {compile_pofile(pofile_path)}")
+        if any(path.endswith(".po") for path in changed_files):
+            reset_translations()
+        if any(path.startswith(template_prefixes) for path in changed_files):
+            reset_templates()
+        if any(path.startswith(static_prefixes) for path in changed_files):
+            # Update STATIC_ROOT (see check_static_files)
+            call_command("collectstatic", interactive=False, verbosity=0)
+        self.writer.reset()
+        self.target_changed_files(changed_files, "while watching")
+        if self.changed_pages:
+            self.distill_and_copy()
+        LOG.info(
+            f"Published {len(self.changed_pages)} pages in"
+            f" {time.perf_counter() - start:.2f}s"
+        )
+
+    def log_fragment_cache_stats(self):
+        if self.render_daemon is not None:
+            stats = self.render_daemon.get_fragment_cache_stats()
+        else:
+            stats = get_fragment_cache_stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = stats["hits"] / lookups * 100 if lookups else 0
+        LOG.info(
+            f"Fragment cache: {stats['hits']} hits, {stats['misses']} misses"
+            f" ({hit_rate:.1f}% hit rate)"
+        )
+
+    def use_render_daemon(self):
+        """
+        Render the pages with the render daemon (if one is running).
+        """
+        if self.render_daemon is None:
+            return
+        # The branch may have changed the data, translations, and templates
+        reloaded = self.render_daemon.reload()
+        LOG.info(
+            "Rendering with the render daemon at"
+            f" {self.render_daemon.socket_path} (reloaded:"
+            f" {', '.join(reloaded)})"
+        )
+        init_utils_renderer(self.render_daemon)
+
     def distill_and_copy(self):
-        self.purge_output_dir()
-        self.check_static_files()
-        self.write_robots_txt()
-        self.write_dev_index()
-        self.write_lists()
-        self.write_legal_tools()
-        self.copy_tools_rdfs()
-        self.copy_meta_rdfs()
-        self.copy_legal_code_plaintext()
-        # TODO: write lists
-        # self.run_write_transstats_csv()
-        # self.write_metadata_yaml()
+        reset_fragment_cache_stats()
+        self.use_render_daemon()
+        self.dependencies = DependencyGraph()
+        if self.targeted:
+            stages = [
+                self.check_static_files,
+                # Finds the categories of the lists to write
+                self.write_legal_tools,
+                self.write_lists,
+                self.compress_output,
+                self.write_manifest,
+                self.check_query_budget,
+                self.write_dependency_graph,
+            ]
+        else:
+            stages = [
+                self.stage_output_dir,
+                self.check_static_files,
+                self.write_robots_txt,
+                self.write_dev_index,
+                self.write_lists,
+                self.write_legal_tools,
+                self.copy_tools_rdfs,
+                self.copy_meta_rdfs,
+                self.copy_legal_code_plaintext,
+                # TODO: write lists
+                # self.run_write_transstats_csv,
+                self.write_metadata,
+                self.write_sitemap,
+                self.compress_output,
+                self.write_nginx_compression_include,
+                self.write_manifest,
+                self.check_query_budget,
+                self.swap_output_dir,
+                self.write_dependency_graph,
+            ]
+        for stage in stages:
+            with self.profiler.stage(stage.__name__):
+                stage()
+        LOG.info(f"Output: {self.writer}")
+        self.log_fragment_cache_stats()
 
     def publish_branch(self, branch: str):
         """Workflow for publishing a single branch"""
         LOG.debug(f"Publishing branch {branch}")
         with git.Repo(settings.DATA_REPOSITORY_DIR) as repo:
-            setup_local_branch(repo, branch)
+            with self.profiler.stage("setup_local_branch"):
+                setup_local_branch(repo, branch)
             self.distill_and_copy()
             if repo.is_dirty(untracked_files=True):
                 # Add any changes and new files
 
-                commit_and_push_changes(
-                    repo,
-                    "Updated built HTML files",
-                    self.relpath,
-                    push=self.push,
-                )
+                with self.profiler.stage("commit_and_push_changes"):
+                    commit_and_push_changes(
+                        repo,
+                        "Updated built HTML files",
+                        self.relpath,
+                        push=self.push,
+                    )
                 if repo.is_dirty(untracked_files=True):
                     raise git.exc.RepositoryDirtyError(
                         settings.DATA_REPOSITORY_DIR,
@@ -416,8 +1226,15 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         LOG.setLevel(LOG_LEVELS[int(options["verbosity"])])
         init_utils_logger(LOG)
+        self.writer = OutputWriter()
+        init_utils_writer(self.writer)
+        self.pages = []
+        self.sources = {}
         self.options = options
 
+        if options["brotli"] and brotli is None:
+            raise CommandError("--brotli requires the brotli module.")
+
         if options.get("branch_name", None) == "main":
             raise CommandError(
                 "Publishing to the main branch is prohibited. Changes to the"
@@ -425,6 +1242,13 @@ class Command(BaseCommand):
             )
 
         self.output_dir = os.path.abspath(settings.DISTILL_DIR)
+        self.live_output_dir = self.output_dir
+        # The staging directory is hidden so that it is never mistaken for
+        # (or committed as part of) the output directory
+        self.staging_dir = os.path.join(
+            os.path.dirname(self.output_dir),
+            f".{os.path.basename(self.output_dir)}.staging",
+        )
         self.config_dir = os.path.abspath(
             os.path.join(self.output_dir, "..", "config")
         )
@@ -438,16 +1262,73 @@ class Command(BaseCommand):
             )
 
         self.relpath = os.path.relpath(self.output_dir, git_dir)
+        if options["watch_poll"]:
+            options["watch"] = True
+        if options["watch"] and not options["nogit"]:
+            raise CommandError("--watch requires --nogit.")
+        self.targets = {
+            name: options[name]
+            for name in TARGET_FILTERS
+            if options[name] is not None
+        }
+        self.targeted_categories = set()
+        if (self.targets or options["changed_since"]) and not options["nogit"]:
+            raise CommandError(
+                "Targeted publish (--unit, --tool-version, --jurisdiction,"
+                " --language, and --changed-since) requires --nogit."
+            )
+        if self.targets and options["changed_since"]:
+            raise CommandError(
+                "--changed-since cannot be combined with --unit,"
+                " --tool-version, --jurisdiction, and --language."
+            )
+        self.changed_pages = None
+        self.changed_legal_codes = None
+        if options["changed_since"]:
+            self.find_changed_pages(options["changed_since"])
+        self.targeted = bool(self.targets) or self.changed_pages is not None
         self.push = not options["nopush"]
 
-        if options.get("list_branches"):
-            branches = list_open_translation_branches()
-            LOG.debug("Which branch are we publishing to?")
-            for branch in branches:
-                LOG.debug(branch)
-        elif options.get("nogit"):
-            self.distill_and_copy()
-        elif options.get("branch_name"):
-            self.publish_branch(options["branch_name"])
-        else:
-            self.publish_all()
+        self.render_daemon = None
+        # The queries of the render daemon are not counted
+        if not options["nodaemon"] and options["query_budget"] is None:
+            self.render_daemon = RenderDaemonClient.connect(
+                settings.RENDER_DAEMON_SOCKET
+            )
+
+        self.profiler = PublishProfiler(
+            self.writer,
+            enabled=options["profile"],
+            output_dir=options["profile_dir"],
+            top=options["profile_top"],
+            cprofile=options["cprofile"],
+            query_budget=options["query_budget"],
+            max_memory=(
+                None
+                if options["max_memory"] is None
+                else options["max_memory"] * MIB
+            ),
+            logger=LOG,
+        )
+
+        try:
+            with self.profiler:
+                if options.get("list_branches"):
+                    branches = list_open_translation_branches()
+                    LOG.debug("Which branch are we publishing to?")
+                    for branch in branches:
+                        LOG.debug(branch)
+                elif options.get("nogit"):
+                    self.distill_and_copy()
+                    if options["watch"]:
+                        self.watch()
+                elif options.get("branch_name"):
+                    self.publish_branch(options["branch_name"])
+                else:
+                    self.publish_all()
+        except MemoryLimitExceeded as e:
+            raise CommandError(e)
+        finally:
+            init_utils_renderer()
+            if self.render_daemon is not None:
+                self.render_daemon.close()
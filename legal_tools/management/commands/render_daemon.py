@@ -0,0 +1,77 @@
+# Standard library
+import logging
+import os
+import signal
+import socket
+from argparse import ArgumentParser
+
+# Third-party
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+# First-party/Local
+from legal_tools.render_daemon import RenderServer
+
+LOG = logging.getLogger(__name__)
+LOG_LEVELS = {
+    0: logging.ERROR,
+    1: logging.WARNING,
+    2: logging.INFO,
+    3: logging.DEBUG,
+}
+
+
+class Command(BaseCommand):
+    """
+    Run a render daemon: a long-running process that keeps Django, the
+    translations, and the templates loaded and renders pages for publish (and
+    other clients) over a Unix socket. When it is running, publish uses it
+    (unless --nodaemon is given).
+
+    The daemon must use the same settings (data repository, database, and
+    template engine) as publish. Changed translation and template files are
+    reloaded at the start of each publish.
+    """
+
+    def add_arguments(self, parser: ArgumentParser):
+        parser.add_argument(
+            "--socket",
+            default=settings.RENDER_DAEMON_SOCKET,
+            help="Unix socket to listen on (default: RENDER_DAEMON_SOCKET"
+            f" setting: {settings.RENDER_DAEMON_SOCKET})",
+        )
+
+    def remove_stale_socket(self, socket_path):
+        if not os.path.exists(socket_path):
+            return
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            # Left behind by a render daemon that did not exit cleanly
+            os.remove(socket_path)
+            return
+        finally:
+            sock.close()
+        raise CommandError(
+            f"A render daemon is already listening on {socket_path}"
+        )
+
+    def handle(self, **options):
+        LOG.setLevel(LOG_LEVELS[int(options["verbosity"])])
+        socket_path = os.path.abspath(options["socket"])
+        self.remove_stale_socket(socket_path)
+        server = RenderServer(socket_path)
+        LOG.info(f"Render daemon listening on {socket_path}")
+
+        def stop(signum, frame):
+            raise KeyboardInterrupt
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            LOG.info("Render daemon stopped")
+        finally:
+            server.server_close()
+            os.remove(socket_path)
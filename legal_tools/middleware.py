@@ -0,0 +1,136 @@
+"""
+Full-page cache of the public pages (deeds, legal codes, and lists) for when
+the app is served dynamically (see settings.PAGE_CACHE_ENABLED).
+
+The pages are cached by URL and build identifier. The build identifier
+changes when the data repository commit, the translation files, or the
+templates change, so the cache entries never need to expire. It is computed
+once per process (see init_middleware_build_id()).
+"""
+# Standard library
+import hashlib
+import logging
+import os
+
+# Third-party
+import git
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template import engines
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+# First-party/Local
+from legal_tools.views import view_deed, view_legal_code, view_list
+
+PAGE_CACHE_ALIAS = "pages"
+PAGE_CACHE_VIEWS = (view_deed, view_legal_code, view_list)
+
+LOG = logging.getLogger(__name__)
+BUILD_ID = None
+
+
+def init_middleware_build_id(build_id=None):
+    """
+    Set the build identifier (None: compute it on the next request, e.g.
+    after the data repository has been updated).
+    """
+    global BUILD_ID
+    BUILD_ID = build_id
+
+
+def get_data_repository_commit():
+    try:
+        with git.Repo(settings.DATA_REPOSITORY_DIR) as repo:
+            return repo.head.commit.hexsha
+    except (git.exc.InvalidGitRepositoryError, git.exc.NoSuchPathError):
+        return ""
+    except ValueError:  # pragma: no cover
+        # Repository without commits
+        return ""
+
+
+def get_files_digest(dirs, extensions):
+    """
+    Return a digest of the paths and contents of the files with one of the
+    extensions in the directories.
+    """
+    paths = []
+    for top in dirs:
+        for dirpath, __, filenames in os.walk(top, followlinks=True):
+            for filename in filenames:
+                if filename.endswith(extensions):
+                    paths.append(os.path.join(dirpath, filename))
+    digest = hashlib.md5()
+    for path in sorted(paths):
+        digest.update(path.encode("utf-8"))
+        with open(path, "rb") as file_object:
+            digest.update(file_object.read())
+    return digest.hexdigest()
+
+
+def get_build_id():
+    global BUILD_ID
+    if BUILD_ID is None:
+        template_dirs = []
+        for engine in engines.all():
+            template_dirs += [str(path) for path in engine.template_dirs]
+        BUILD_ID = "-".join(
+            [
+                get_data_repository_commit(),
+                get_files_digest(settings.LOCALE_PATHS, (".mo",)),
+                get_files_digest(template_dirs, (".html",)),
+                settings.PUBLIC_TEMPLATE_ENGINE,
+            ]
+        )
+        LOG.info(f"Page cache build identifier: {BUILD_ID}")
+    return BUILD_ID
+
+
+def get_page_cache_key(path):
+    build_id = hashlib.md5(get_build_id().encode("utf-8")).hexdigest()
+    path = hashlib.md5(path.encode("utf-8")).hexdigest()
+    return f"page.{build_id}.{path}"
+
+
+class PageCacheMiddleware:
+    """
+    Serve the public pages from the page cache, with strong ETags (the MD5
+    digest of the content) and conditional GET (If-None-Match).
+
+    Only successful (200) responses are cached. The views of the public pages
+    do not use the query string, cookies, or the user, so the URL path
+    identifies the page.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (
+            not settings.PAGE_CACHE_ENABLED
+            or view_func not in PAGE_CACHE_VIEWS
+            or request.method not in ("GET", "HEAD")
+        ):
+            return None
+        cache = caches[PAGE_CACHE_ALIAS]
+        # The views normalize request.path, so get the key first
+        key = get_page_cache_key(request.path)
+        page = cache.get(key)
+        if page is None:
+            response = view_func(request, *view_args, **view_kwargs)
+            if response.status_code != 200 or response.streaming:
+                return response
+            etag = quote_etag(hashlib.md5(response.content).hexdigest())
+            page = (response["Content-Type"], etag, response.content)
+            cache.set(key, page)
+        content_type, etag, content = page
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(content, content_type=content_type)
+        response["ETag"] = etag
+        return response
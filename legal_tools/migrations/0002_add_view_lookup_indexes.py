@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:13
+
+# Third-party
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("legal_tools", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="legalcode",
+            name="legal_code_url",
+            field=models.URLField(
+                blank=True,
+                default="",
+                unique=True,
+                verbose_name="Legal Code URL",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tool",
+            index=models.Index(
+                fields=["unit", "version", "jurisdiction_code"],
+                name="tool_unit_version_juris_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="legalcode",
+            constraint=models.UniqueConstraint(
+                fields=("tool", "language_code"),
+                name="unique_legal_code_tool_language_code",
+            ),
+        ),
+    ]
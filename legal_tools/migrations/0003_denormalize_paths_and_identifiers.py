@@ -0,0 +1,282 @@
+# Generated by Django 3.2.25 on 2026-10-19 00:17
+
+# Standard library
+import os
+
+# Third-party
+from django.db import migrations, models
+
+# The helpers of legal_tools.models (and i18n) that populate the fields, as
+# they were when this migration was written
+
+UNITS_LICENSES = [
+    "by",
+    "by-nc",
+    "by-nc-nd",
+    "by-nc-sa",
+    "by-nd",
+    "by-nd-nc",
+    "by-sa",
+    "devnations",
+    "nc",
+    "nc-sa",
+    "nc-sampling+",
+    "nd",
+    "nd-nc",
+    "sa",
+    "sampling",
+    "sampling+",
+]
+# Untranslated (message ids)
+JURISDICTION_NAMES = {
+    "": "Unported",
+    "<=l25": "Generic (unported)",
+    "=l30": "International (unported)",
+    "=l40": "International",
+    "=p10": "Universal",
+    "am": "Armenia",
+    "ar": "Argentina",
+    "at": "Austria",
+    "au": "Australia",
+    "az": "Azerbaijan",
+    "be": "Belgium",
+    "bg": "Bulgaria",
+    "br": "Brazil",
+    "ca": "Canada",
+    "ch": "Switzerland",
+    "cl": "Chile",
+    "cn": "China Mainland",
+    "co": "Colombia",
+    "cr": "Costa Rica",
+    "cz": "Czech Republic",
+    "de": "Germany",
+    "dk": "Denmark",
+    "ec": "Ecuador",
+    "ee": "Estonia",
+    "eg": "Egypt",
+    "es": "Spain",
+    "fi": "Finland",
+    "fr": "France",
+    "ge": "Georgia",
+    "gr": "Greece",
+    "gt": "Guatemala",
+    "hk": "Hong Kong",
+    "hr": "Croatia",
+    "hu": "Hungary",
+    "ie": "Ireland",
+    "igo": "Intergovernmental Organization",
+    "il": "Israel",
+    "in": "India",
+    "it": "Italy",
+    "jo": "Jordan",
+    "jp": "Japan",
+    "kr": "Korea",
+    "lu": "Luxembourg",
+    "mk": "Macedonia",
+    "mt": "Malta",
+    "mx": "Mexico",
+    "my": "Malaysia",
+    "ng": "Nigeria",
+    "nl": "Netherlands",
+    "no": "Norway",
+    "nz": "New Zealand",
+    "pe": "Peru",
+    "ph": "Philippines",
+    "pl": "Poland",
+    "pr": "Puerto Rico",
+    "pt": "Portugal",
+    "ro": "Romania",
+    "rs": "Serbia",
+    "scotland": "UK: Scotland",
+    "se": "Sweden",
+    "sg": "Singapore",
+    "si": "Slovenia",
+    "th": "Thailand",
+    "tw": "Taiwan",
+    "ua": "Ukraine",
+    "ug": "Uganda",
+    "uk": "UK: England & Wales",
+    "us": "United States",
+    "ve": "Venezuela",
+    "vn": "Vietnam",
+    "za": "South Africa",
+}
+
+
+def build_save_path(category, unit, version, jurisdiction_code):
+    unit = unit.lower()
+    if jurisdiction_code:
+        return os.path.join(category, unit, version, jurisdiction_code)
+    else:
+        return os.path.join(category, unit, version)
+
+
+def build_resource_slug(unit, version, jurisdiction_code):
+    if jurisdiction_code:
+        slug = f"{unit}_{version}_{jurisdiction_code}"
+    else:
+        slug = f"{unit}_{version}"
+    slug = slug.replace(".", "")
+    slug = slug.lower()
+    return slug
+
+
+def build_identifier(unit, version, jurisdiction_code):
+    identifier = f"{unit} {version}"
+
+    if unit == "mark":
+        identifier = f"PDM {version}"
+    elif unit == "zero":
+        identifier = f"CC0 {version}"
+    elif unit in UNITS_LICENSES:
+        identifier = f"CC {identifier}"
+
+    if jurisdiction_code:
+        identifier = f"{identifier} {jurisdiction_code}"
+    identifier = identifier.upper()
+    return identifier
+
+
+def build_jurisdiction_name(category, unit, version, jurisdiction_code):
+    if unit in ["zero", "mark"]:
+        jurisdiction_code = "=p10"
+    elif category == "licenses" and not jurisdiction_code:
+        if version == "4.0":
+            jurisdiction_code = "=l40"
+        elif version == "3.0":
+            jurisdiction_code = "=l30"
+        else:
+            jurisdiction_code = "<=l25"
+    return JURISDICTION_NAMES.get(jurisdiction_code, "UNDEFINED")
+
+
+def build_branch_name(unit, version, jurisdiction_code, language_code):
+    parts = []
+    if unit.startswith("by") and version == "4.0":
+        parts.append("cc4")
+    else:
+        parts.extend([unit, version])
+    parts.append(language_code)
+    if jurisdiction_code:
+        parts.append(jurisdiction_code)
+    return "-".join(parts).replace("_", "-").replace(".", "").lower()
+
+
+def populate_denormalized_fields(apps, schema_editor):
+    Tool = apps.get_model("legal_tools", "Tool")
+    LegalCode = apps.get_model("legal_tools", "LegalCode")
+    tools = list(Tool.objects.all())
+    for tool in tools:
+        fields = (tool.unit, tool.version, tool.jurisdiction_code)
+        tool.save_path = build_save_path(tool.category, *fields)
+        tool.resource_slug = build_resource_slug(*fields)
+        tool.identifier_text = build_identifier(*fields)
+        tool.jurisdiction_name = build_jurisdiction_name(
+            tool.category, *fields
+        )
+    Tool.objects.bulk_update(
+        tools,
+        ["save_path", "resource_slug", "identifier_text", "jurisdiction_name"],
+    )
+    legal_codes = list(LegalCode.objects.select_related("tool").defer("html"))
+    for legal_code in legal_codes:
+        tool = legal_code.tool
+        legal_code.save_path = tool.save_path
+        legal_code.translation_branch_name = build_branch_name(
+            tool.unit,
+            tool.version,
+            tool.jurisdiction_code,
+            legal_code.language_code,
+        )
+    LegalCode.objects.bulk_update(
+        legal_codes, ["save_path", "translation_branch_name"]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("legal_tools", "0002_add_view_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="legalcode",
+            name="save_path",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Relative path of the published files, e.g."
+                " 'licenses/by-nc/3.0/pl'",
+                max_length=100,
+            ),
+        ),
+        migrations.AddField(
+            model_name="legalcode",
+            name="translation_branch_name",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="GitHub branch for modifications of this"
+                " translation",
+                max_length=40,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tool",
+            name="identifier_text",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="E.g. 'CC BY-NC 3.0 PL'",
+                max_length=40,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tool",
+            name="jurisdiction_name",
+            field=models.CharField(
+                blank=True,
+                default="",
+                editable=False,
+                help_text="Untranslated jurisdiction name, e.g."
+                " 'International'",
+                max_length=40,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tool",
+            name="resource_slug",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Transifex translation resource slug, e.g."
+                " 'by-nc_30_pl'",
+                max_length=40,
+            ),
+        ),
+        migrations.AddField(
+            model_name="tool",
+            name="save_path",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                default="",
+                editable=False,
+                help_text="Relative path of the published files, e.g."
+                " 'licenses/by-nc/3.0/pl'",
+                max_length=100,
+            ),
+        ),
+        migrations.RunPython(
+            populate_denormalized_fields, migrations.RunPython.noop
+        ),
+    ]
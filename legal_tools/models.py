@@ -178,6 +178,19 @@ class LegalCodeQuerySet(models.QuerySet):
             ).exclude(language_code__in=EXCLUDED_LANGUAGE_IDENTIFIERS),
         }
 
+    def with_html(self):
+        """
+        Return a queryset of the LegalCode objects with the html field
+        loaded. It is deferred by default as it is only needed to render the
+        legal code of tools that have not been converted to templates.
+        """
+        return self.defer(None)
+
+
+class LegalCodeManager(models.Manager.from_queryset(LegalCodeQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().defer("html")
+
 
 class LegalCode(models.Model):
     tool = models.ForeignKey(
@@ -210,23 +223,60 @@ class LegalCode(models.Model):
         default="",
     )
     html = models.TextField("HTML", blank=True, default="")
-    legal_code_url = models.URLField("Legal Code URL", blank=True, default="")
+    legal_code_url = models.URLField(
+        "Legal Code URL",
+        blank=True,
+        default="",
+        unique=True,
+    )
     deed_url = models.URLField("Deed URL", unique=True)
     plain_text_url = models.URLField(
         "Plain text URL",
         blank=True,
         default="",
     )
+    # Denormalized from the tool (see save())
+    save_path = models.CharField(
+        max_length=100,
+        help_text="Relative path of the published files, e.g."
+        " 'licenses/by-nc/3.0/pl'",
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+    translation_branch_name = models.CharField(
+        max_length=40,
+        help_text="GitHub branch for modifications of this translation",
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
 
-    objects = LegalCodeQuerySet.as_manager()
+    objects = LegalCodeManager()
 
     class Meta:
         ordering = ["tool", "language_code"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["tool", "language_code"],
+                name="unique_legal_code_tool_language_code",
+            ),
+        ]
 
     def __str__(self):
         return f"LegalCode<{self.language_code}, {self.tool}>"
 
     def save(self, *args, **kwargs):
+        tool = self.tool
+        self.save_path = tool.save_path
+        self.translation_branch_name = build_branch_name(
+            tool.unit,
+            tool.version,
+            tool.jurisdiction_code,
+            self.language_code,
+        )
         self.deed_url = build_path(
             self.tool.canonical_url,
             "deed",
@@ -254,51 +304,9 @@ class LegalCode(models.Model):
         """
         If saving the deed or legal code as a static file, this returns the
         relative path where the saved file should be, not including the actual
-        filename.
-
-        ported Licenses 3.0 and earlier
-            Formula
-                CATEGORY/UNIT/VERSION/JURISDICTION
-            Examples
-                licenses/by/3.0/am
-                licenses/by-nc/3.0/pl
-                licenses/by-nc-nd/2.5/au
-                licenses/by-nc-sa/2.5/ch
-                licenses/by/2.1/es
-                licenses/by-nc/2.1/jp
-                licenses/by/2.0/kr
-                licenses/nd-nc/1.0/fi
-
-        unported Licenses 3.0, Licenses 4.0, and Public Domain:
-            Formula
-                CATEGORY/UNIT/VERSION
-            Examples
-                publicdomain/zero/1.0
-                licenses/by-nc-nd/4.0/
-                licenses/by-nc-sa/4.0/
-                licenses/by-nc/4.0/
-                licenses/by-nd/4.0/
-                licenses/by-sa/4.0/
-                licenses/by/4.0/
+        filename (see build_save_path()).
         """
-
-        tool = self.tool
-        unit = tool.unit.lower()
-        if tool.jurisdiction_code:
-            # ported Licenses 3.0 and earlier
-            return os.path.join(
-                tool.category,  # licenses or publicdomain
-                unit,  # ex. by, by-nc-nd
-                tool.version,  # ex. 1.0, 2.0
-                tool.jurisdiction_code,  # ex. ca, tw
-            )
-        else:
-            # unported Licenses 3.0, Licenses 4.0, and Public Domain:
-            return os.path.join(
-                tool.category,  # licenses or publicdomain
-                unit,  # ex. by, by-nc-nd, zero
-                tool.version,  # ex. 1.0, 4.0
-            )
+        return self.save_path
 
     def get_publish_files(self, document):
         """
@@ -403,22 +411,10 @@ class LegalCode(models.Model):
 
     def branch_name(self):
         """
-        If this translation is modified, what is the name of the GitHub branch
-        we'll use to manage the modifications?  Basically its
-        "{unit}-{version}-{language}-{jurisdiction code}", except that all the
-        "by* 4.0" licenses use "cc4" for the unit part. This has to be a valid
-        DNS domain, so we also change any _ to - and remove any periods.
+        Return the name of the GitHub branch we'll use to manage modifications
+        of this translation (see build_branch_name()).
         """
-        tool = self.tool
-        parts = []
-        if tool.unit.startswith("by") and tool.version == "4.0":
-            parts.append("cc4")
-        else:
-            parts.extend([tool.unit, tool.version])
-        parts.append(self.language_code)
-        if tool.jurisdiction_code:
-            parts.append(tool.jurisdiction_code)
-        return "-".join(parts).replace("_", "-").replace(".", "").lower()
+        return self.translation_branch_name
 
     def identifier(self):
         """
@@ -550,12 +546,83 @@ class Tool(models.Model):
     prohibits_commercial_use = models.BooleanField(default=None)
     prohibits_high_income_nation_use = models.BooleanField(default=None)
 
+    # Denormalized from the fields above (see save())
+    save_path = models.CharField(
+        max_length=100,
+        help_text="Relative path of the published files, e.g."
+        " 'licenses/by-nc/3.0/pl'",
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+    resource_slug = models.CharField(
+        max_length=40,
+        help_text="Transifex translation resource slug, e.g. 'by-nc_30_pl'",
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+    identifier_text = models.CharField(
+        max_length=40,
+        help_text="E.g. 'CC BY-NC 3.0 PL'",
+        blank=True,
+        default="",
+        db_index=True,
+        editable=False,
+    )
+    jurisdiction_name = models.CharField(
+        max_length=40,
+        help_text="Untranslated jurisdiction name, e.g. 'International'",
+        blank=True,
+        default="",
+        editable=False,
+    )
+
     class Meta:
         ordering = ["-version", "unit", "jurisdiction_code"]
+        indexes = [
+            models.Index(
+                fields=["unit", "version", "jurisdiction_code"],
+                name="tool_unit_version_juris_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"Tool<{self.unit},{self.version}," f"{self.jurisdiction_code}>"
 
+    def save(self, *args, **kwargs):
+        self.save_path = build_save_path(
+            self.category,
+            self.unit,
+            self.version,
+            self.jurisdiction_code,
+        )
+        self.resource_slug = build_resource_slug(
+            self.unit,
+            self.version,
+            self.jurisdiction_code,
+        )
+        self.identifier_text = build_identifier(
+            self.unit,
+            self.version,
+            self.jurisdiction_code,
+        )
+        self.jurisdiction_name = build_jurisdiction_name(
+            self.category,
+            self.unit,
+            self.version,
+            self.jurisdiction_code,
+        )
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            # Keep the columns the legal codes copy from this tool current
+            for legal_code in self.legal_codes.all():
+                legal_code.tool = self
+                legal_code.save()
+
     def get_metadata(self):
         """
         Return a dictionary with the metadata for this tool.
@@ -564,23 +631,24 @@ class Tool(models.Model):
             self.jurisdiction_code
         )
         data = {}
-        default_lc = self.legal_codes.filter(language_code=language_default)[0]
+        # Use all() and filter in Python so prefetched legal codes are used
+        legal_codes = sorted(
+            self.legal_codes.all(), key=lambda lc: lc.language_code
+        )
+        default_lc = [
+            lc for lc in legal_codes if lc.language_code == language_default
+        ][0]
         data["canonical_url"] = self.canonical_url
         data["deed_only"] = self.deed_only
         if self.deprecated_on:
             data["deprecated_on"] = self.deprecated_on
         if self.jurisdiction_code:
             data["jurisdiction_code"] = self.jurisdiction_code
-        data["jurisdiction_name"] = get_jurisdiction_name(
-            self.category,
-            self.unit,
-            self.version,
-            self.jurisdiction_code,
-        )
+        data["jurisdiction_name"] = translation.gettext(self.jurisdiction_name)
         data["identifier"] = self.identifier()
         if not self.deed_only:
             data["legal_code_languages"] = {}
-            for lc in self.legal_codes.order_by("language_code"):
+            for lc in legal_codes:
                 lang_code = lc.language_code
                 language_info = translation.get_language_info(lang_code)
                 data["legal_code_languages"][lang_code] = language_info["name"]
@@ -637,20 +705,6 @@ class Tool(models.Model):
         """Human-readable name for the translation resource for this tool"""
         return self.identifier()
 
-    @property
-    def resource_slug(self):
-        # Transifex translation resource slug for this tool.
-        # letters, numbers, underscores or hyphens.
-        # No periods.
-        # All lowercase.
-        if self.jurisdiction_code:
-            slug = f"{self.unit}_{self.version}_{self.jurisdiction_code}"
-        else:
-            slug = f"{self.unit}_{self.version}"
-        slug = slug.replace(".", "")
-        slug = slug.lower()
-        return slug
-
     def rdf(self):
         """Generate RDF for this tool?"""
         return "RDF Generation Not Implemented"  # FIXME if needed
@@ -659,20 +713,7 @@ class Tool(models.Model):
         """
         Returns e.g. 'CC BY-SA 4.0' - all upper case etc. No language.
         """
-        tool = self
-        identifier = f"{tool.unit} {tool.version}"
-
-        if tool.unit == "mark":
-            identifier = f"PDM {tool.version}"
-        elif tool.unit == "zero":
-            identifier = f"CC0 {tool.version}"
-        elif tool.unit in UNITS_LICENSES:
-            identifier = f"CC {identifier}"
-
-        if tool.jurisdiction_code:
-            identifier = f"{identifier} {tool.jurisdiction_code}"
-        identifier = identifier.upper()
-        return identifier
+        return self.identifier_text
 
     @property
     def level_of_freedom(self):
@@ -750,3 +791,114 @@ def build_path(canonical_url, document, language_code):
     else:
         path = posixpath.join(path, f"{document}.{language_code}")
     return path
+
+
+def build_save_path(category, unit, version, jurisdiction_code):
+    """
+    Return the relative path where the static files of a tool's deeds and
+    legal codes are saved, not including the actual filename.
+
+    ported Licenses 3.0 and earlier
+        Formula
+            CATEGORY/UNIT/VERSION/JURISDICTION
+        Examples
+            licenses/by/3.0/am
+            licenses/by-nc/3.0/pl
+            licenses/by-nc-nd/2.5/au
+            licenses/by-nc-sa/2.5/ch
+            licenses/by/2.1/es
+            licenses/by-nc/2.1/jp
+            licenses/by/2.0/kr
+            licenses/nd-nc/1.0/fi
+
+    unported Licenses 3.0, Licenses 4.0, and Public Domain:
+        Formula
+            CATEGORY/UNIT/VERSION
+        Examples
+            publicdomain/zero/1.0
+            licenses/by-nc-nd/4.0/
+            licenses/by-nc-sa/4.0/
+            licenses/by-nc/4.0/
+            licenses/by-nd/4.0/
+            licenses/by-sa/4.0/
+            licenses/by/4.0/
+    """
+    unit = unit.lower()
+    if jurisdiction_code:
+        # ported Licenses 3.0 and earlier
+        return os.path.join(
+            category,  # licenses or publicdomain
+            unit,  # ex. by, by-nc-nd
+            version,  # ex. 1.0, 2.0
+            jurisdiction_code,  # ex. ca, tw
+        )
+    else:
+        # unported Licenses 3.0, Licenses 4.0, and Public Domain:
+        return os.path.join(
+            category,  # licenses or publicdomain
+            unit,  # ex. by, by-nc-nd, zero
+            version,  # ex. 1.0, 4.0
+        )
+
+
+def build_resource_slug(unit, version, jurisdiction_code):
+    # Transifex translation resource slug for this tool.
+    # letters, numbers, underscores or hyphens.
+    # No periods.
+    # All lowercase.
+    if jurisdiction_code:
+        slug = f"{unit}_{version}_{jurisdiction_code}"
+    else:
+        slug = f"{unit}_{version}"
+    slug = slug.replace(".", "")
+    slug = slug.lower()
+    return slug
+
+
+def build_identifier(unit, version, jurisdiction_code):
+    """
+    Returns e.g. 'CC BY-SA 4.0' - all upper case etc. No language.
+    """
+    identifier = f"{unit} {version}"
+
+    if unit == "mark":
+        identifier = f"PDM {version}"
+    elif unit == "zero":
+        identifier = f"CC0 {version}"
+    elif unit in UNITS_LICENSES:
+        identifier = f"CC {identifier}"
+
+    if jurisdiction_code:
+        identifier = f"{identifier} {jurisdiction_code}"
+    identifier = identifier.upper()
+    return identifier
+
+
+def build_jurisdiction_name(category, unit, version, jurisdiction_code):
+    """
+    Returns the untranslated jurisdiction name (the message id), e.g.
+    'International'. Translate it with gettext() when it is displayed.
+    """
+    with translation.override(None):
+        return str(
+            get_jurisdiction_name(category, unit, version, jurisdiction_code)
+        )
+
+
+def build_branch_name(unit, version, jurisdiction_code, language_code):
+    """
+    If a translation is modified, what is the name of the GitHub branch
+    we'll use to manage the modifications?  Basically its
+    "{unit}-{version}-{language}-{jurisdiction code}", except that all the
+    "by* 4.0" licenses use "cc4" for the unit part. This has to be a valid
+    DNS domain, so we also change any _ to - and remove any periods.
+    """
+    parts = []
+    if unit.startswith("by") and version == "4.0":
+        parts.append("cc4")
+    else:
+        parts.extend([unit, version])
+    parts.append(language_code)
+    if jurisdiction_code:
+        parts.append(jurisdiction_code)
+    return "-".join(parts).replace("_", "-").replace(".", "").lower()
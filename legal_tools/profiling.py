@@ -0,0 +1,311 @@
+"""
+Instrumentation of publish (see publish --profile, --query-budget, and
+--max-memory): the wall time, CPU time, database queries (and their time),
+and output bytes of each stage, page type, and page, and the peak memory of
+each stage.
+
+- Wall time is measured with time.perf_counter(). The CPU time of a stage is
+  the CPU time of the process (including worker threads) and the CPU time of
+  a page is the CPU time of the thread that rendered it.
+- Queries are counted (and timed) by a database connection execute wrapper,
+  and attributed to the stage and page being rendered by the thread that
+  issued them. Pages rendered by a render daemon query its database
+  connections, which are not counted.
+- Output bytes are the bytes saved by the OutputWriter (written or unchanged).
+- Memory is traced with tracemalloc (only with a memory limit, as tracing
+  slows the run down): the peak of the memory allocated by Python, which
+  excludes the interpreter itself and the memory of extension modules that do
+  not use the Python allocators.
+"""
+# Standard library
+import cProfile
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Third-party
+from django.db import connection
+
+LOG = logging.getLogger(__name__)
+PROFILE_REPORT_FILENAME = "publish_profile.json"
+PROFILE_STATS_FILENAME = "publish_profile.prof"
+MIB = 1024 * 1024
+
+
+class MemoryLimitExceeded(Exception):
+    pass
+
+
+class PublishProfiler:
+    """
+    Record the timings of a publish run. When it is neither enabled nor given
+    a query budget (the maximum number of queries of a page) or a memory limit
+    (the maximum peak of the traced memory, in bytes), stage() and page() do
+    nothing.
+    """
+
+    def __init__(
+        self,
+        writer,
+        enabled=False,
+        output_dir=".",
+        top=10,
+        cprofile=False,
+        query_budget=None,
+        max_memory=None,
+        logger=LOG,
+    ):
+        self.writer = writer
+        self.log = logger
+        self.enabled = enabled or cprofile
+        self.query_budget = query_budget
+        self.max_memory = max_memory
+        self.active = (
+            self.enabled or query_budget is not None or max_memory is not None
+        )
+        self.output_dir = output_dir
+        self.top = top
+        self.cprofile = cprofile
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.page_types = {}
+        self.pages = []
+        self.start = None
+        self.total = None
+        self.profile = None
+        self.query_wrapper = None
+        self.peak_memory = None
+
+    def __enter__(self):
+        if not self.active:
+            return self
+        self.query_wrapper = connection.execute_wrapper(self.count_query)
+        self.query_wrapper.__enter__()
+        if self.max_memory is not None:
+            tracemalloc.start()
+            self.peak_memory = 0
+        if self.cprofile:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        self.start = self.get_counters()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.active:
+            return
+        if self.profile is not None:
+            self.profile.disable()
+        self.query_wrapper.__exit__(exc_type, exc_value, traceback)
+        self.total = self.get_deltas(self.start)
+        if self.max_memory is not None:
+            self.update_peak_memory()
+            tracemalloc.stop()
+            self.log.info(
+                f"Peak traced memory: {self.peak_memory / MIB:.1f} MiB (limit:"
+                f" {self.max_memory / MIB:.1f} MiB)"
+            )
+            for name, entry in self.stages.items():
+                self.log.info(
+                    f"    {name:<40} {entry['peak_memory'] / MIB:9.1f} MiB"
+                )
+        if self.enabled:
+            # Also when the run failed (ex. a page exceeded the query budget)
+            self.write_report()
+            self.log_report()
+
+    def count_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.local.query_time = (
+                self.get_query_time() + time.perf_counter() - start
+            )
+            self.local.queries = self.get_queries() + 1
+
+    def get_queries(self):
+        return getattr(self.local, "queries", 0)
+
+    def get_query_time(self):
+        return getattr(self.local, "query_time", 0.0)
+
+    @contextmanager
+    def count_thread_queries(self):
+        """
+        Count the queries of the current thread (ex. a worker thread) if they
+        are not already counted.
+        """
+        if self.count_query in connection.execute_wrappers:
+            yield
+            return
+        with connection.execute_wrapper(self.count_query):
+            yield
+
+    def get_counters(self, cpu=time.process_time):
+        return {
+            "wall": time.perf_counter(),
+            "cpu": cpu(),
+            "queries": self.get_queries(),
+            "query_time": self.get_query_time(),
+            "bytes": self.writer.bytes_written + self.writer.bytes_skipped,
+            "bytes_written": self.writer.bytes_written,
+        }
+
+    def get_deltas(self, start, cpu=time.process_time):
+        end = self.get_counters(cpu)
+        return {name: end[name] - start[name] for name in start}
+
+    @staticmethod
+    def add(totals, name, deltas):
+        entry = totals.setdefault(name, {"count": 0})
+        entry["count"] += 1
+        for key, value in deltas.items():
+            entry[key] = entry.get(key, 0) + value
+
+    def update_peak_memory(self):
+        """
+        Update (and return) the peak of the traced memory of the run.
+        """
+        self.peak_memory = max(
+            self.peak_memory, tracemalloc.get_traced_memory()[1]
+        )
+        return self.peak_memory
+
+    def check_memory(self):
+        """
+        Raise MemoryLimitExceeded if the peak of the traced memory exceeded
+        the memory limit.
+        """
+        if self.max_memory is None:
+            return
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        if peak_memory > self.max_memory:
+            raise MemoryLimitExceeded(
+                f"Peak traced memory ({peak_memory / MIB:.1f} MiB) exceeded"
+                f" the memory limit ({self.max_memory / MIB:.1f} MiB)"
+            )
+
+    @contextmanager
+    def _stage(self, name):
+        if self.max_memory is not None:
+            self.update_peak_memory()
+            tracemalloc.reset_peak()
+        start = self.get_counters()
+        yield
+        self.add(self.stages, name, self.get_deltas(start))
+        if self.max_memory is not None:
+            entry = self.stages[name]
+            entry["peak_memory"] = max(
+                entry.get("peak_memory", 0),
+                tracemalloc.get_traced_memory()[1],
+            )
+            self.check_memory()
+
+    def stage(self, name):
+        """
+        Record the counters of a stage of the run (ex. write_lists).
+        """
+        if not self.active:
+            return nullcontext()
+        return self._stage(name)
+
+    @contextmanager
+    def _page(self, page_type, name):
+        with self.count_thread_queries():
+            start = self.get_counters(time.thread_time)
+            record = {}
+            yield record
+            deltas = self.get_deltas(start, time.thread_time)
+        del deltas["bytes_written"]
+        if "bytes" in record:
+            # Rendered by a worker thread (the OutputWriter counters are
+            # shared by all of the threads)
+            deltas["bytes"] = record["bytes"]
+        with self.lock:
+            self.add(self.page_types, page_type, deltas)
+            self.pages.append(dict(deltas, type=page_type, name=name))
+        self.check_memory()
+
+    def page(self, page_type, name):
+        """
+        Record the counters of a page (the yielded dictionary may set the
+        bytes of the page).
+        """
+        if not self.active:
+            return nullcontext({})
+        return self._page(page_type, name)
+
+    def get_slowest_pages(self):
+        return heapq.nlargest(
+            self.top, self.pages, key=lambda page: page["wall"]
+        )
+
+    def get_pages_over_query_budget(self):
+        """
+        Return the pages with more queries than the query budget.
+        """
+        if self.query_budget is None:
+            return []
+        return [
+            page for page in self.pages if page["queries"] > self.query_budget
+        ]
+
+    def get_report(self):
+        return {
+            "total": self.total,
+            "stages": self.stages,
+            "page_types": self.page_types,
+            "slowest_pages": self.get_slowest_pages(),
+            "query_budget": self.query_budget,
+            "pages_over_query_budget": self.get_pages_over_query_budget(),
+            "max_memory": self.max_memory,
+            "peak_memory": self.peak_memory,
+            "pages": self.pages,
+        }
+
+    def write_report(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        report_path = os.path.join(self.output_dir, PROFILE_REPORT_FILENAME)
+        with open(report_path, "w", encoding="utf-8") as report_file:
+            json.dump(self.get_report(), report_file, indent=2)
+            report_file.write("\n")
+        self.log.info(f"Wrote timing report: {report_path}")
+        if self.profile is not None:
+            stats_path = os.path.join(self.output_dir, PROFILE_STATS_FILENAME)
+            self.profile.dump_stats(stats_path)
+            self.log.info(f"Wrote cProfile stats: {stats_path}")
+
+    def log_report(self):
+        header = (
+            f"{'':<40} {'count':>6} {'wall (s)':>9} {'cpu (s)':>9}"
+            f" {'queries':>8} {'query (s)':>9} {'bytes':>12}"
+        )
+        row = (
+            "{name:<40} {count:>6} {wall:>9.3f} {cpu:>9.3f} {queries:>8}"
+            " {query_time:>9.3f} {bytes:>12}"
+        )
+        self.log.info("Stages:")
+        self.log.info(header)
+        for name, entry in self.stages.items():
+            self.log.info(row.format(name=name, **entry))
+        self.log.info(row.format(name="total", count="", **self.total))
+        self.log.info("Page types:")
+        self.log.info(header)
+        for name, entry in sorted(self.page_types.items()):
+            self.log.info(row.format(name=name, **entry))
+        self.log.info(f"Slowest {self.top} pages:")
+        self.log.info(
+            f"{'':<60} {'type':<10} {'wall (s)':>9} {'cpu (s)':>9}"
+            f" {'queries':>8} {'query (s)':>9} {'bytes':>12}"
+        )
+        for page in self.get_slowest_pages():
+            self.log.info(
+                "{name:<60} {type:<10} {wall:>9.3f} {cpu:>9.3f} {queries:>8}"
+                " {query_time:>9.3f} {bytes:>12}".format(**page)
+            )
@@ -0,0 +1,394 @@
+"""
+Render daemon: a long-running process that keeps Django warm (settings, apps,
+translations, compiled templates, and the list page data) and renders pages
+for publish over a Unix socket.
+
+Each request is a line of JSON. Each response is a line of JSON, followed by
+the content of the rendered pages (if any):
+
+- {"job": "info"}
+  => {"status": 200, "info": {...}}
+- {"job": "reload"}
+  => {"status": 200, "reloaded": ["data", ...]}
+- {"job": "stats"}
+  => {"status": 200, "stats": {"hits": ..., "misses": ...}}
+  The fragment cache counters (since the last reload).
+- {"job": "render", "urls": [...], "legal_codes": [...]}
+  => {"status": 200, "pages": [{"url": ..., "status": ..., "length": ...,
+     "templates": [...]}]}
+  The pages of the legal codes (LegalCode ids) are their deed and legal code
+  pages. A page that could not be rendered has a status other than 200 and an
+  error instead of content. The templates of a page are the templates it was
+  rendered with (see legal_tools.dependencies).
+"""
+# Standard library
+import gettext as gettext_module
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from contextlib import contextmanager
+
+# Third-party
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections
+from django.http import Http404
+from django.template import engines
+from django.template.autoreload import reset_loaders
+from django.utils.translation import trans_real
+
+# First-party/Local
+from i18n.utils import load_deeds_ux_translations
+from legal_tools.dependencies import record_template, record_templates
+from legal_tools.models import LegalCode
+from legal_tools.templatetags.license_tags import (
+    FRAGMENT_CACHE_ALIAS,
+    get_fragment_cache_stats,
+    get_fragment_translation_files,
+    reset_fragment_cache_stats,
+)
+from legal_tools.utils import render_url
+from legal_tools.views import get_language_table, init_views_list_cache
+
+LOG = logging.getLogger(__name__)
+
+
+def get_render_info():
+    """
+    Return what a render daemon must share with its clients to render the
+    same pages.
+    """
+    return {
+        "data_repository_dir": settings.DATA_REPOSITORY_DIR,
+        "database": str(settings.DATABASES["default"]["NAME"]),
+        "template_engine": settings.PUBLIC_TEMPLATE_ENGINE,
+    }
+
+
+def get_files_snapshot(dirs, extensions=None):
+    """
+    Return the modification time (ns) of each file with one of the extensions
+    (or of each file, if extensions is None) in the directories.
+    """
+    snapshot = {}
+    for top in dirs:
+        for dirpath, __, filenames in os.walk(top, followlinks=True):
+            for filename in filenames:
+                if extensions and not filename.endswith(extensions):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    snapshot[path] = os.stat(path).st_mtime_ns
+                except FileNotFoundError:  # pragma: no cover
+                    continue
+    return snapshot
+
+
+def get_translations_snapshot():
+    return get_files_snapshot(settings.LOCALE_PATHS, (".mo", ".po"))
+
+
+def get_template_dirs():
+    """
+    Return the template directories of the template engines.
+    """
+    template_dirs = []
+    for engine in engines.all():
+        for path in engine.template_dirs:
+            if str(path) not in template_dirs:
+                template_dirs.append(str(path))
+    return template_dirs
+
+
+def get_templates_snapshot():
+    return get_files_snapshot(get_template_dirs(), (".html",))
+
+
+def reset_translations():
+    """
+    Forget the loaded translations (like Django does when a .mo file changes
+    in the development server) and reload the Deed & UX translations.
+    """
+    gettext_module._translations = {}
+    trans_real._translations = {}
+    trans_real._default = None
+    trans_real._active = Local()
+    load_deeds_ux_translations()
+    get_language_table.cache_clear()
+    get_fragment_translation_files.cache_clear()
+
+
+def reset_templates():
+    """
+    Forget the compiled templates and the rendered template fragments.
+    """
+    reset_loaders()
+    for engine in engines.all():
+        env = getattr(engine, "env", None)  # Jinja2
+        if env is not None and env.cache is not None:
+            env.cache.clear()
+    caches[FRAGMENT_CACHE_ALIAS].clear()
+
+
+class RenderState:
+    """
+    The warm state of the render daemon. Reloading it forgets the list page
+    data (the database may have changed) and, if their files have changed,
+    the translations and templates.
+
+    Render jobs run concurrently, but not while the state is reloaded: a
+    reload waits for the render jobs in progress (and new render jobs wait
+    for the reload), so that a page is never rendered with half of the old
+    and half of the new state.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.renders = 0
+        self.reloading = False
+        self.translations_snapshot = get_translations_snapshot()
+        self.templates_snapshot = get_templates_snapshot()
+        init_views_list_cache({})
+
+    @contextmanager
+    def rendering(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.reloading)
+            self.renders += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.renders -= 1
+                self.condition.notify_all()
+
+    @contextmanager
+    def reloading_state(self):
+        with self.condition:
+            self.condition.wait_for(lambda: not self.reloading)
+            self.reloading = True
+            self.condition.wait_for(lambda: not self.renders)
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.reloading = False
+                self.condition.notify_all()
+
+    def reload(self):
+        with self.reloading_state():
+            reloaded = ["data"]
+            init_views_list_cache({})
+            reset_fragment_cache_stats()
+            translations_snapshot = get_translations_snapshot()
+            if translations_snapshot != self.translations_snapshot:
+                reset_translations()
+                self.translations_snapshot = translations_snapshot
+                reloaded.append("translations")
+            templates_snapshot = get_templates_snapshot()
+            if templates_snapshot != self.templates_snapshot:
+                reset_templates()
+                self.templates_snapshot = templates_snapshot
+                reloaded.append("templates")
+        return reloaded
+
+
+def render_page(url):
+    """
+    Return the page (description and content) of the URL.
+    """
+    try:
+        with record_templates() as templates:
+            content = render_url(url)
+    except Http404 as e:
+        return {"url": url, "status": 404, "error": str(e)}, b""
+    except Exception as e:
+        LOG.exception(f"Failed to render {url}")
+        return {"url": url, "status": 500, "error": repr(e)}, b""
+    page = {
+        "url": url,
+        "status": 200,
+        "length": len(content),
+        "templates": sorted(templates),
+    }
+    return page, content
+
+
+def get_legal_code_urls(legal_code_ids):
+    urls = []
+    for legal_code in LegalCode.objects.filter(id__in=legal_code_ids):
+        urls.append(legal_code.deed_url)
+        if not legal_code.tool.deed_only:
+            urls.append(legal_code.legal_code_url)
+    return urls
+
+
+class RenderRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            for line in self.rfile:
+                response, content = self.handle_job(json.loads(line))
+                self.wfile.write(json.dumps(response).encode("utf-8"))
+                self.wfile.write(b"\n")
+                self.wfile.write(content)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            LOG.debug("Client disconnected")
+        finally:
+            close_old_connections()
+
+    def handle_job(self, job):
+        name = job.get("job")
+        LOG.debug(f"{name} job")
+        if name == "info":
+            return {"status": 200, "info": get_render_info()}, b""
+        if name == "reload":
+            reloaded = self.server.state.reload()
+            LOG.info(f"Reloaded: {', '.join(reloaded)}")
+            return {"status": 200, "reloaded": reloaded}, b""
+        if name == "stats":
+            return {"status": 200, "stats": get_fragment_cache_stats()}, b""
+        if name == "render":
+            urls = list(job.get("urls", []))
+            urls += get_legal_code_urls(job.get("legal_codes", []))
+            pages = []
+            contents = []
+            with self.server.state.rendering():
+                for url in urls:
+                    page, content = render_page(url)
+                    pages.append(page)
+                    contents.append(content)
+            return {"status": 200, "pages": pages}, b"".join(contents)
+        return {"status": 400, "error": f"unknown job: {name}"}, b""
+
+
+class RenderServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path):
+        self.state = RenderState()
+        super().__init__(socket_path, RenderRequestHandler)
+
+
+class RenderDaemonError(Exception):
+    pass
+
+
+class RenderDaemonClient:
+    """
+    Client of a render daemon. Each thread has its own connection.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, socket_path):
+        """
+        Return a client of the render daemon listening on the socket, or None
+        if there is no render daemon (or it does not render the same pages).
+        """
+        if not os.path.exists(socket_path):
+            return None
+        client = cls(socket_path)
+        try:
+            info = client.request({"job": "info"})[0]["info"]
+        except (OSError, RenderDaemonError) as e:
+            LOG.warning(f"Render daemon {socket_path} is not available: {e}")
+            client.close()
+            return None
+        if info != get_render_info():
+            LOG.warning(
+                f"Render daemon {socket_path} uses different settings:"
+                f" {info}"
+            )
+            client.close()
+            return None
+        return client
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            connection = (sock, sock.makefile("rb"))
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def request(self, job):
+        """
+        Return the response to the job and its content.
+        """
+        sock, rfile = self.get_connection()
+        sock.sendall(json.dumps(job).encode("utf-8") + b"\n")
+        line = rfile.readline()
+        if not line:
+            raise RenderDaemonError("connection closed by the render daemon")
+        response = json.loads(line)
+        if response["status"] != 200:
+            raise RenderDaemonError(response.get("error"))
+        length = sum(
+            page.get("length", 0) for page in response.get("pages", [])
+        )
+        content = rfile.read(length)
+        if len(content) != length:
+            raise RenderDaemonError("connection closed by the render daemon")
+        return response, content
+
+    def reload(self):
+        return self.request({"job": "reload"})[0]["reloaded"]
+
+    def get_fragment_cache_stats(self):
+        return self.request({"job": "stats"})[0]["stats"]
+
+    def render(self, urls=(), legal_codes=()):
+        """
+        Return a list of (page, content) of the rendered URLs and legal codes.
+        """
+        response, content = self.request(
+            {
+                "job": "render",
+                "urls": list(urls),
+                "legal_codes": list(legal_codes),
+            }
+        )
+        pages = []
+        start = 0
+        for page in response["pages"]:
+            end = start + page.get("length", 0)
+            pages.append((page, content[start:end]))
+            start = end
+        return pages
+
+    def get_url_content(self, url):
+        """
+        Same as legal_tools.utils.get_url_content(), rendered by the daemon.
+        """
+        page, content = self.render(urls=[url])[0]
+        if page["status"] == 404:
+            raise Http404(page["error"])
+        if page["status"] != 200:
+            raise ValueError(
+                f"ERROR: Status {page['status']} for url {url}:"
+                f" {page['error']}"
+            )
+        for template_filename in page.get("templates", []):
+            record_template(template_filename)
+        return content
+
+    def close(self):
+        with self.lock:
+            for sock, rfile in self.connections:
+                rfile.close()
+                sock.close()
+            self.connections = []
+        self.local = threading.local()
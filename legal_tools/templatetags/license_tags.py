@@ -1,9 +1,20 @@
 # Standard library
+import hashlib
 import string
-from threading import local
+from functools import lru_cache
+from threading import Lock, local
 
 # Third-party
 from django import template
+from django.core.cache import caches
+from django.utils import translation
+from django.utils.safestring import mark_safe
+
+# First-party/Local
+from i18n.utils import get_translation_files
+from legal_tools.dependencies import record_template, record_templates
+
+FRAGMENT_CACHE_ALIAS = "fragments"
 
 register = template.Library()
 
@@ -15,6 +26,10 @@ register = template.Library()
 # Store state here. Use a thread-local so at least this is thread-safe.
 next_letter_data = local()
 
+# Fragment cache hit/miss counters (shared by all threads)
+fragment_cache_stats = {"hits": 0, "misses": 0}
+fragment_cache_stats_lock = Lock()
+
 
 @register.filter
 def units(legal_codes):
@@ -69,3 +84,134 @@ def current_letter():
 def is_one_of(legal_code, arg):
     codes = arg.split(",")
     return legal_code.tool.unit in codes
+
+
+def get_fragment_cache_stats():
+    """
+    Return a copy of the fragment cache hit/miss counters.
+    """
+    with fragment_cache_stats_lock:
+        return dict(fragment_cache_stats)
+
+
+def reset_fragment_cache_stats():
+    """
+    Reset the fragment cache hit/miss counters.
+    """
+    with fragment_cache_stats_lock:
+        for name in fragment_cache_stats:
+            fragment_cache_stats[name] = 0
+
+
+def count_fragment_cache(name):
+    with fragment_cache_stats_lock:
+        fragment_cache_stats[name] += 1
+
+
+@lru_cache(maxsize=None)
+def get_fragment_translation_files(language_code, domain):
+    """
+    Return the translation files used for the language and translation domain
+    (with the "django" domain, which is always used). They are only looked
+    up once: reset_translations() (see legal_tools.render_daemon) clears this
+    cache when the translations are reloaded.
+    """
+    translation_files = get_translation_files(language_code, domain)
+    if domain != "django":
+        translation_files += get_translation_files(language_code, "django")
+    return translation_files
+
+
+def get_fragment_cache_key(template_name, fragment_name, vary_on):
+    """
+    Return the cache key of a fragment for the active translation: the
+    language, the translation domain (legal code pages use the tool's domain)
+    and the translation files that are used for it.
+    """
+    language_code = translation.get_language()
+    translation_obj = getattr(translation.trans_real._active, "value", None)
+    domain = getattr(translation_obj, "domain", "django")
+    translation_files = ()
+    if language_code:
+        translation_files = get_fragment_translation_files(
+            language_code, domain
+        )
+    key = repr(
+        (
+            template_name,
+            fragment_name,
+            language_code,
+            translation.get_language_bidi(),
+            translation_files,
+            [str(value) for value in vary_on],
+        )
+    )
+    digest = hashlib.md5(key.encode("utf-8")).hexdigest()
+    return f"fragment.{fragment_name}.{digest}"
+
+
+def get_cached_fragment(template_name, fragment_name, vary_on, render):
+    """
+    Return the cached fragment. On a miss, the fragment is rendered by calling
+    render() and cached. The templates used to render the fragment are cached
+    with it, so that they are recorded on a hit (see legal_tools.dependencies).
+    """
+    cache_key = get_fragment_cache_key(template_name, fragment_name, vary_on)
+    cache = caches[FRAGMENT_CACHE_ALIAS]
+    cached = cache.get(cache_key)
+    if cached is None:
+        count_fragment_cache("misses")
+        with record_templates() as templates:
+            value = str(render())
+        cache.set(cache_key, (value, sorted(templates)))
+    else:
+        count_fragment_cache("hits")
+        value, templates = cached
+        for template_filename in templates:
+            record_template(template_filename)
+    return value
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, fragment_name, vary_on):
+        self.nodelist = nodelist
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        value = get_cached_fragment(
+            self.origin.name,
+            self.fragment_name,
+            vary_on,
+            lambda: self.nodelist.render(context),
+        )
+        return mark_safe(value)
+
+
+@register.tag("fragmentcache")
+def do_fragmentcache(parser, token):
+    """
+    Cache the contents of a template fragment that only depends on the active
+    translation and the given variables (if any):
+
+        {% fragmentcache "sidebar" tool.unit tool.version %}
+            ...
+        {% endfragmentcache %}
+
+    Unlike the cache tag, the cached fragments are shared across pages and
+    languages (the key includes the language, the translation domain, and the
+    translation files) and never expire.
+    """
+    nodelist = parser.parse(("endfragmentcache",))
+    parser.delete_first_token()
+    tokens = token.split_contents()
+    if len(tokens) < 2:
+        raise template.TemplateSyntaxError(
+            f"{tokens[0]!r} tag requires at least 1 argument."
+        )
+    fragment_name = tokens[1]
+    if fragment_name[0] in "'\"" and fragment_name[-1] == fragment_name[0]:
+        fragment_name = fragment_name[1:-1]
+    vary_on = [parser.compile_filter(token) for token in tokens[2:]]
+    return FragmentCacheNode(nodelist, fragment_name, vary_on)
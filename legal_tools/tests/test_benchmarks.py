@@ -0,0 +1,98 @@
+# Standard library
+import os
+import tempfile
+
+# Third-party
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+# First-party/Local
+from i18n.utils import load_deeds_ux_translations
+from legal_tools import benchmarks
+from legal_tools.models import LegalCode, Tool
+
+SIMPLE_LICENSE_HTML = """<html><body>
+<div id="deed-license"><h2>Namensnennung 3.0 Deutschland</h2></div>
+<div id="deed-main-content"><p>Lizenzvertrag</p></div>
+</body></html>
+"""
+
+
+class SyntheticDataTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.addCleanup(load_deeds_ux_translations)
+
+    def test_generate_synthetic_data(self):
+        count = benchmarks.generate_synthetic_data(
+            self.tmpdir.name, languages=3, jurisdictions=2
+        )
+        # 6 units x (4 languages of 4.0 + 4 unported + 2 jurisdictions x 3
+        # ported) + 4 languages of CC0 1.0
+        self.assertEqual(88, count)
+        self.assertEqual(count, LegalCode.objects.count())
+        self.assertEqual(6 * (1 + 4 + 2 * 3) + 1, Tool.objects.count())
+        self.assertEqual(
+            ["ar", "cs", "de", "en"],
+            sorted(os.listdir(os.path.join(self.tmpdir.name, "locale"))),
+        )
+        with benchmarks.synthetic_settings(self.tmpdir.name):
+            load_deeds_ux_translations()
+            self.assertEqual(
+                {"ar": 95, "cs": 85, "de": 70, "en": 100},
+                {
+                    language_code: info["percent_translated"]
+                    for language_code, info in (
+                        settings.DEEDS_UX_PO_FILE_INFO.items()
+                    )
+                },
+            )
+
+    def test_get_benchmarks(self):
+        benchmarks.generate_synthetic_data(
+            self.tmpdir.name, languages=3, jurisdictions=2
+        )
+        names = []
+        with benchmarks.synthetic_settings(self.tmpdir.name):
+            load_deeds_ux_translations()
+            for name, func in benchmarks.get_benchmarks():
+                with self.subTest(name):
+                    func()
+                names.append(name)
+        self.assertIn("view_deed (django, /licenses/by/4.0/deed.en)", names)
+        self.assertIn("view_list (django, /licenses/list.en)", names)
+        self.assertIn("load_deeds_ux_translations", names)
+
+    def test_get_import_benchmarks(self):
+        legalcode_dir = os.path.join(self.tmpdir.name, "legalcode")
+        os.makedirs(legalcode_dir)
+        with open(os.path.join(legalcode_dir, "by_3.0_de.html"), "w") as f:
+            f.write(SIMPLE_LICENSE_HTML)
+        tool = benchmarks.create_synthetic_tool("licenses", "by", "3.0", "de")
+        legal_code = benchmarks.create_synthetic_legal_code(tool, "de")
+        with override_settings(LEGACY_DIR=self.tmpdir.name):
+            import_benchmarks = benchmarks.get_import_benchmarks()
+        self.assertEqual(
+            ["simple_import_license_html (by_3.0_de.html)"],
+            [name for name, func in import_benchmarks],
+        )
+        import_benchmarks[0][1]()
+        legal_code.refresh_from_db()
+        self.assertEqual("Namensnennung 3.0 Deutschland", legal_code.title)
+
+
+class BaselineTest(TestCase):
+    def test_save_and_load_baseline(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "baseline.json")
+            benchmarks.save_baseline(path, {"a": 0.5})
+            self.assertEqual({"a": 0.5}, benchmarks.load_baseline(path))
+
+    def test_compare_to_baseline(self):
+        results = {"faster": 0.9, "slower": 1.2, "regression": 1.3, "new": 1}
+        baseline = {"faster": 1, "slower": 1, "regression": 1}
+        self.assertEqual(
+            [("regression", 1.3, 1)],
+            benchmarks.compare_to_baseline(results, baseline, 0.25),
+        )
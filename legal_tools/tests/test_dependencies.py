@@ -0,0 +1,235 @@
+# Standard library
+import os
+import tempfile
+from unittest import skipUnless
+
+# Third-party
+import git
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+try:
+    # Third-party
+    import jinja2
+except ImportError:  # pragma: no cover
+    jinja2 = None
+
+# First-party/Local
+from legal_tools import dependencies
+from legal_tools.templatetags.license_tags import (
+    FRAGMENT_CACHE_ALIAS,
+    get_cached_fragment,
+)
+from legal_tools.tests.factories import LegalCodeFactory, ToolFactory
+
+
+def get_app_relpaths(paths):
+    return sorted(
+        os.path.relpath(path, settings.PROJECT_ROOT) for path in paths
+    )
+
+
+class RecordTemplatesTest(TestCase):
+    def test_record_templates(self):
+        dependencies.record_template("/not/recorded.html")
+        with dependencies.record_templates() as outer:
+            dependencies.record_template("/a.html")
+            with dependencies.record_templates() as inner:
+                dependencies.record_template("/b.html")
+        self.assertEqual({"/b.html"}, inner)
+        self.assertEqual({"/a.html", "/b.html"}, outer)
+
+    def test_template_loader(self):
+        with dependencies.record_templates() as templates:
+            render_to_string(
+                "redirect.html",
+                context={"title": "Title", "destination": "deed.en"},
+                using="django",
+            )
+        self.assertIn("templates/redirect.html", get_app_relpaths(templates))
+
+    @skipUnless(jinja2, "requires the jinja2 module")
+    def test_jinja2_environment(self):
+        with dependencies.record_templates() as templates:
+            render_to_string(
+                "redirect.html",
+                context={"title": "Title", "destination": "deed.en"},
+                using="jinja2",
+            )
+        self.assertIn(
+            "templates/jinja2/redirect.html", get_app_relpaths(templates)
+        )
+
+    def test_fragment_cache(self):
+        caches[FRAGMENT_CACHE_ALIAS].clear()
+
+        def render():
+            dependencies.record_template("/fragment.html")
+            return "fragment"
+
+        for __ in range(2):
+            with dependencies.record_templates() as templates:
+                self.assertEqual(
+                    "fragment",
+                    get_cached_fragment("page.html", "test", [], render),
+                )
+            self.assertEqual({"/fragment.html"}, templates)
+
+
+class DependencyGraphTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        tool = ToolFactory(
+            canonical_url="https://creativecommons.org/licenses/by/4.0/",
+            unit="by",
+            version="4.0",
+            jurisdiction_code="",
+        )
+        self.legal_code = LegalCodeFactory(tool=tool, language_code="nl")
+        self.data_dir = os.path.join(self.tmpdir.name, "data")
+        self.pofile = os.path.join(
+            self.data_dir, "legalcode", "nl", "LC_MESSAGES", "by_40.po"
+        )
+        os.makedirs(os.path.dirname(self.pofile))
+        with open(self.pofile, "w") as f:
+            f.write("")
+
+    def test_page(self):
+        graph = dependencies.DependencyGraph()
+        with override_settings(DATA_REPOSITORY_DIR=self.data_dir):
+            with graph.page(
+                "licenses/by/4.0/deed.nl.html",
+                "nl",
+                self.legal_code,
+            ) as record:
+                dependencies.record_template(
+                    os.path.join(settings.PROJECT_ROOT, "templates/deed.html")
+                )
+                record["content"] = (
+                    b'<link href="/static/robots.txt">'
+                    b'<a href="/licenses/">'
+                )
+            with graph.page("licenses/list.nl.html", "nl") as record:
+                record["content"] = b""
+        self.assertEqual(
+            {
+                "licenses/by/4.0/deed.nl.html": {
+                    "legal_codes": [self.legal_code.id],
+                    "templates": ["templates/deed.html"],
+                    "translations": ["legalcode/nl/LC_MESSAGES/by_40.po"],
+                    "static": ["cc_legal_tools/static/robots.txt"],
+                },
+                "licenses/list.nl.html": {
+                    "legal_codes": [],
+                    "templates": [],
+                    "translations": [],
+                    "static": [],
+                },
+            },
+            graph.pages,
+        )
+
+    def test_page_without_content(self):
+        graph = dependencies.DependencyGraph()
+        with self.assertRaises(ValueError):
+            with graph.page("licenses/list.nl.html", "nl"):
+                pass
+        self.assertEqual({}, graph.pages)
+
+    def test_save_and_load(self):
+        path = os.path.join(self.tmpdir.name, "dependencies.json")
+        self.assertIsNone(dependencies.DependencyGraph.load(path))
+        pages = {
+            "licenses/list.nl.html": {
+                "legal_codes": [],
+                "templates": ["templates/list.html"],
+                "translations": [],
+                "static": [],
+            }
+        }
+        dependencies.DependencyGraph(pages).save(path)
+        self.assertEqual(pages, dependencies.DependencyGraph.load(path).pages)
+
+    def test_get_affected_pages(self):
+        graph = dependencies.DependencyGraph(
+            {
+                "deed.nl.html": {
+                    "legal_codes": [1],
+                    "templates": ["templates/deed.html"],
+                    "translations": ["locale/nl/LC_MESSAGES/django.po"],
+                    "static": [],
+                },
+                "legalcode.nl.html": {
+                    "legal_codes": [1],
+                    "templates": ["templates/legalcode.html"],
+                    "translations": ["legalcode/nl/LC_MESSAGES/by_40.po"],
+                    "static": ["cc_legal_tools/static/robots.txt"],
+                },
+            }
+        )
+        with override_settings(DATA_REPOSITORY_DIR=self.data_dir):
+            for changed, affected in [
+                ("templates/deed.html", ["deed.nl.html"]),
+                ("cc_legal_tools/static/robots.txt", ["legalcode.nl.html"]),
+                ("templates/list.html", []),
+            ]:
+                with self.subTest(changed):
+                    path = os.path.join(settings.PROJECT_ROOT, changed)
+                    self.assertEqual(
+                        affected,
+                        sorted(graph.get_affected_pages([path])),
+                    )
+            self.assertEqual(
+                ["legalcode.nl.html"],
+                sorted(
+                    graph.get_affected_pages(
+                        [self.pofile.replace(".po", ".mo")]
+                    )
+                ),
+            )
+
+
+class GetChangedFilesTest(TestCase):
+    def test_get_changed_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with git.Repo.init(tmpdir) as repo:
+                with repo.config_writer() as config:
+                    config.set_value("user", "name", "Test")
+                    config.set_value("user", "email", "test@example.com")
+                for name in ["a.txt", "b.txt"]:
+                    with open(os.path.join(tmpdir, name), "w") as f:
+                        f.write(name)
+                repo.index.add(["a.txt", "b.txt"])
+                repo.index.commit("first")
+                with open(os.path.join(tmpdir, "a.txt"), "w") as f:
+                    f.write("changed")
+                repo.index.add(["a.txt"])
+                repo.index.commit("second")
+                with open(os.path.join(tmpdir, "b.txt"), "w") as f:
+                    f.write("changed")
+                with open(os.path.join(tmpdir, "c.txt"), "w") as f:
+                    f.write("untracked")
+                tmpdir = repo.working_tree_dir
+            self.assertEqual(
+                {os.path.join(tmpdir, name) for name in ["b.txt", "c.txt"]},
+                dependencies.get_changed_files(tmpdir, "HEAD"),
+            )
+            self.assertEqual(
+                {
+                    os.path.join(tmpdir, name)
+                    for name in ["a.txt", "b.txt", "c.txt"]
+                },
+                dependencies.get_changed_files(tmpdir, "HEAD~1"),
+            )
+            # Not a revision of the repository: the changes since HEAD
+            with self.assertLogs(dependencies.LOG, "WARNING"):
+                self.assertEqual(
+                    {
+                        os.path.join(tmpdir, name)
+                        for name in ["b.txt", "c.txt"]
+                    },
+                    dependencies.get_changed_files(tmpdir, "0" * 40),
+                )
@@ -0,0 +1,411 @@
+# Third-party
+from django.test import TestCase
+
+# First-party/Local
+from legal_tools import lxml_importers
+from legal_tools.management.commands.load_html_files import (
+    Command as LoadHtmlFilesCommand,
+)
+from legal_tools.tests.factories import LegalCodeFactory, ToolFactory
+
+# Trimmed down legacy HTML files, with the structure the importers expect
+BY_40_HTML = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="UTF-8">
+<title>Creative Commons Legal Code</title></head>
+<body>
+<div id="deed-license">
+  <h2>Attribution 4.0 International</h2>
+</div>
+<div id="deed-main-content">
+<blockquote>Creative Commons Corporation (&ldquo;Creative Commons&rdquo;) is
+not a law firm.</blockquote>
+<h3>Creative Commons Attribution 4.0 International Public License</h3>
+<p>By exercising the Licensed Rights (defined below), You accept and agree to
+be bound by the terms and conditions of this Creative Commons Attribution 4.0
+International Public License (&quot;Public License&quot;).</p>
+
+<p id="s1"><strong>Section 1 &ndash; Definitions.</strong></p>
+<ol type="a">
+  <li id="s1a"><strong>Adapted Material</strong> means material subject to
+  Copyright and Similar Rights that is derived from the Licensed Material.</li>
+  <li id="s1b"><strong>Adapter's License</strong> means the license You
+  apply.</li>
+  <li id="s1c"><strong>Copyright and Similar Rights</strong> means copyright
+  and/or similar rights closely related to copyright, including <a
+  href="https://example.com/?a=1&b=2">performance</a>.</li>
+  <li id="s1d"><strong>Effective Technological Measures</strong> means
+  those measures.</li>
+  <li id="s1e"><strong>Exceptions and Limitations</strong> means fair use,
+  fair dealing, and/or any other exception.</li>
+  <li id="s1f"><strong>Licensed Material</strong> means the artistic or
+  literary work.</li>
+  <li id="s1g"><strong>Licensed Rights</strong> means the rights granted to
+  You.</li>
+  <li id="s1h"><strong>Licensor</strong> means the individual(s) or
+  entity(ies) granting rights.</li>
+  <li id="s1i"><strong>Share</strong> means to provide material to the
+  public.</li>
+  <li id="s1j"><strong>Sui Generis Database Rights</strong> means rights other
+  than copyright.</li>
+  <li id="s1k"><strong>You</strong> means the individual or entity exercising
+  the Licensed Rights.  <strong>Your</strong> has a corresponding
+  meaning.</li>
+</ol>
+
+<p id="s2"><strong>Section 2 &ndash; Scope.</strong></p>
+<ol type="a">
+  <li id="s2a"><p><b>License grant</b>.</p>
+  <ol>
+    <li id="s2a1">Subject to the terms and conditions of this Public License,
+    the Licensor hereby grants You a license to:
+      <ol>
+        <li id="s2a1A">reproduce and Share the Licensed Material; and</li>
+        <li id="s2a1B">produce, reproduce, and Share Adapted Material.</li>
+      </ol>
+    </li>
+    <li id="s2a2"><strong>Exceptions and Limitations</strong>. For the
+    avoidance of doubt, this Public License does not apply.</li>
+    <li id="s2a3"><strong>Term</strong>. The term of this Public License is
+    specified in Section <a href="#s6a">6(a)</a>.</li>
+    <li id="s2a4"><strong>Media and formats; technical modifications
+    allowed</strong>. The Licensor authorizes You to exercise the Licensed
+    Rights in all media.<br><br>For purposes of this Public License, simply
+    making modifications is not an Adapted Material.</li>
+    <li id="s2a5"><strong>Downstream recipients</strong>.
+      <div class="para">
+      <ol>
+        <li id="s2a5A"><strong>Offer from the Licensor &ndash; Licensed
+        Material</strong>. Every recipient automatically receives an
+        offer.</li>
+        <li id="s2a5B"><strong>No downstream restrictions</strong>. You may
+        not offer or impose any additional terms.</li>
+      </ol>
+      </div>
+    </li>
+    <li id="s2a6"><strong>No endorsement</strong>. Nothing in this Public
+    License constitutes permission to assert or imply endorsement.</li>
+  </ol>
+  </li>
+  <li id="s2b"><p><strong>Other rights</strong>.</p>
+  <ol>
+    <li id="s2b1">Moral rights, such as the right of integrity, are not
+    licensed.</li>
+    <li id="s2b2">Patent and trademark rights are not licensed.</li>
+    <li id="s2b3">To the extent possible, the Licensor waives any right to
+    collect royalties.</li>
+  </ol>
+  </li>
+</ol>
+
+<p id="s3"><strong>Section 3 &ndash; License Conditions.</strong></p>
+<p>Your exercise of the Licensed Rights is expressly made subject to the
+following conditions.</p>
+<ol type="a">
+  <li id="s3a"><p><strong>Attribution</strong>.</p>
+  <ol>
+    <li id="s3a1"><p>If You Share the Licensed Material (including in
+    modified form), You must:</p>
+    <ol>
+      <li id="s3a1A">retain the following if it is supplied by the Licensor
+      with the Licensed Material:
+      <ol>
+        <li id="s3a1Ai">identification of the creator(s);</li>
+        <li id="s3a1Aii">a copyright notice;</li>
+        <li id="s3a1Aiii">a notice that refers to this Public License;</li>
+        <li id="s3a1Aiv">a notice that refers to the disclaimer of
+        warranties;</li>
+        <li id="s3a1Av">a URI or hyperlink to the Licensed Material;</li>
+      </ol>
+      </li>
+      <li id="s3a1B">indicate if You modified the Licensed Material;
+      and</li>
+      <li id="s3a1C">indicate the Licensed Material is licensed under this
+      Public License, and include the text of, or the URI of, this Public
+      License.</li>
+    </ol>
+    </li>
+    <li id="s3a2">You may satisfy the conditions in Section <a
+    href="#s3a1">3(a)(1)</a> in any reasonable manner.</li>
+    <li id="s3a3">If requested by the Licensor, You must remove any of the
+    information.</li>
+    <li id="s3a4">If You Share Adapted Material You produce, the
+    Adapter's License You apply must not prevent recipients from complying
+    with this Public License.</li>
+  </ol>
+  </li>
+</ol>
+
+<p id="s4"><strong>Section 4 &ndash; Sui Generis Database Rights.</strong></p>
+<p>Where the Licensed Rights include Sui Generis Database Rights that apply to
+Your use of the Licensed Material:</p>
+<ol type="a">
+  <li id="s4a">for the avoidance of doubt, Section <a href="#s2a1">2(a)(1)</a>
+  grants You the right to extract, reuse, reproduce, and Share all or a
+  substantial portion of the contents of the database;</li>
+  <li id="s4b">if You include all or a substantial portion of the database
+  contents in a database in which You have Sui Generis Database Rights, then
+  the database is Adapted Material; and</li>
+  <li id="s4c">You must comply with the conditions in Section <a
+  href="#s3a">3(a)</a>.</li>
+</ol>
+For the avoidance of doubt, this Section <a href="#s4">4</a> supplements and
+does not replace Your obligations under this Public License.
+
+<p id="s5"><strong>Section 5 &ndash; Disclaimer of Warranties and Limitation
+of Liability.</strong></p>
+<ol style="font-weight: bold;" type="a">
+  <li id="s5a"><strong>Unless otherwise separately undertaken by the
+  Licensor, the Licensor offers the Licensed Material as-is.</strong></li>
+  <li id="s5b"><strong>To the extent possible, in no event will the Licensor
+  be liable to You.</strong></li>
+  <li id="s5c">The disclaimer of warranties and limitation of liability
+  provided above shall be interpreted in a manner that most closely
+  approximates an absolute disclaimer.</li>
+</ol>
+
+<p id="s6"><strong>Section 6 &ndash; Term and Termination.</strong></p>
+<ol type="a">
+  <li id="s6a">This Public License applies for the term of the Copyright and
+  Similar Rights licensed here.</li>
+  <li id="s6b"><p>Where Your right to use the Licensed Material has
+  terminated under Section <a href="#s6a">6(a)</a>, it reinstates:</p>
+  <ol>
+    <li id="s6b1">automatically as of the date the violation is cured;
+    or</li>
+    <li id="s6b2">upon express reinstatement by the Licensor.</li>
+  </ol>
+  For the avoidance of doubt, this Section <a href="#s6b">6(b)</a> does not
+  affect any right the Licensor may have.</li>
+  <li id="s6c">For the avoidance of doubt, the Licensor may also offer the
+  Licensed Material under separate terms.</li>
+  <li id="s6d">Sections <a href="#s1">1</a>, <a href="#s5">5</a>, <a
+  href="#s6">6</a>, <a href="#s7">7</a>, and <a href="#s8">8</a> survive
+  termination of this Public License.</li>
+</ol>
+
+<p id="s7"><strong>Section 7 &ndash; Other Terms and Conditions.</strong></p>
+<ol type="a">
+  <li id="s7a">The Licensor shall not be bound by any additional or different
+  terms.</li>
+  <li id="s7b">Any arrangements not stated herein are separate from and
+  independent of the terms and conditions of this Public License.</li>
+</ol>
+
+<p id="s8"><strong>Section 8 &ndash; Interpretation.</strong></p>
+<ol type="a">
+  <li id="s8a">For the avoidance of doubt, this Public License does not
+  reduce any uses that could lawfully be made without permission.</li>
+  <li id="s8b">To the extent possible, if any provision is deemed
+  unenforceable, it shall be reformed.</li>
+  <li id="s8c">No term or condition will be waived.</li>
+  <li id="s8d">Nothing in this Public License constitutes a limitation upon
+  the privileges and immunities that apply.</li>
+</ol>
+<!-- end of the legal code -->
+</div>
+</body></html>
+"""
+
+BY_30_HTML = """<html><head><title>Creative Commons Legal Code</title></head>
+<body>
+<div id="deed-license"><h2>Attribution 3.0 Unported</h2></div>
+<div id="deed-main-content">
+<blockquote>CREATIVE COMMONS CORPORATION IS NOT A LAW FIRM AND DOES NOT
+PROVIDE LEGAL SERVICES.</blockquote>
+<h3><em>License</em></h3>
+<p>THE WORK (AS DEFINED BELOW) IS PROVIDED UNDER THE TERMS OF THIS CREATIVE
+COMMONS PUBLIC LICENSE (&quot;CCPL&quot; OR &quot;LICENSE&quot;).</p>
+<p>BY EXERCISING ANY RIGHTS TO THE WORK PROVIDED HERE, YOU ACCEPT AND AGREE TO
+BE BOUND BY THE TERMS OF THIS LICENSE.</p>
+<p><strong>1. Definitions</strong></p>
+<ol type="a">
+  <li><strong>"Adaptation"</strong> means a work based upon the Work.</li>
+  <li><strong>"Collection"</strong> means a collection of literary or
+  artistic works, such as encyclopedias &amp; anthologies.</li>
+  <li><strong>"Work"</strong> means the literary and/or artistic work.</li>
+</ol>
+<p><strong>2. Fair Dealing Rights.</strong> Nothing in this License is
+intended to reduce, limit, or restrict any uses free from copyright.</p>
+<p><strong>3. License Grant.</strong> Subject to the terms and conditions of
+this License, Licensor hereby grants You a worldwide license:</p>
+<ol type="a">
+  <li>to Reproduce the Work;</li>
+  <li>to create and Reproduce Adaptations;</li>
+  <li>to Distribute and Publicly Perform the Work.</li>
+</ol>
+<p>The above rights may be exercised in all media and formats.</p>
+<p><strong>4. Restrictions.</strong> The license granted in Section 3 above
+is expressly made subject to and limited by the following restrictions:</p>
+<ol type="a">
+  <li>You may Distribute or Publicly Perform the Work only under the terms of
+  this License.</li>
+  <li>If You Distribute, or Publicly Perform the Work, You must keep intact
+  all copyright notices.</li>
+  <li>
+    <p>For the avoidance of doubt:</p>
+    <ol type="i">
+      <li><strong>Non-waivable Compulsory License Schemes</strong>. In those
+      jurisdictions in which the right to collect royalties cannot be waived,
+      the Licensor reserves the exclusive right to collect such
+      royalties;</li>
+      <li><strong>Waivable Compulsory License Schemes</strong>. In those
+      jurisdictions in which the right to collect royalties can be waived,
+      the Licensor waives the exclusive right to collect such
+      royalties.</li>
+    </ol>
+  </li>
+  <li>Except as otherwise agreed in writing by the Licensor, You must not
+  distort the Work.<br />
+  <!-- moral rights --></li>
+</ol>
+<p><strong>5. Representations, Warranties and Disclaimer</strong></p>
+<p>UNLESS OTHERWISE MUTUALLY AGREED TO BY THE PARTIES IN WRITING, LICENSOR
+OFFERS THE WORK AS-IS.</p>
+<p><strong>6. Limitation on Liability.</strong> EXCEPT TO THE EXTENT
+REQUIRED BY APPLICABLE LAW, IN NO EVENT WILL LICENSOR BE LIABLE TO YOU.</p>
+<p><strong>7. Termination</strong></p>
+<ol type="a">
+  <li>This License and the rights granted hereunder will terminate
+  automatically upon any breach by You.</li>
+  <li>Subject to the above terms and conditions, the license granted here is
+  perpetual.</li>
+</ol>
+<p><strong>8. Miscellaneous</strong></p>
+<ol type="a">
+  <li>Each time You Distribute the Work, the Licensor offers to the recipient
+  a license.</li>
+  <li>If any provision of this License is invalid, it shall not affect the
+  validity of the remainder.</li>
+</ol>
+</div>
+</body></html>
+"""
+
+ZERO_HTML = """<html><head><title>Creative Commons Legal Code</title></head>
+<body>
+<div id="deed-license"><h2>CC0 1.0 Universal</h2></div>
+<div id="deed-main-content">
+<blockquote>CREATIVE COMMONS CORPORATION IS NOT A LAW FIRM
+AND DOES NOT PROVIDE LEGAL SERVICES.</blockquote>
+<h3><em>Statement of Purpose</em></h3>
+<p>The laws of most jurisdictions throughout the world automatically confer
+exclusive Copyright and Related Rights.</p>
+<p>Certain owners wish to permanently relinquish those rights to a Work for
+the purpose of contributing to a commons.</p>
+<p>For these and/or other purposes and motivations, the person associating
+CC0 with a Work (the &quot;Affirmer&quot;) elects to apply CC0.</p>
+<p><strong>1. Copyright and Related Rights.</strong> A Work made available
+under CC0 may be protected by copyright and related or neighboring rights.
+Copyright and Related Rights include, but are not limited to, the
+following:</p>
+<ol type="i">
+  <li>the right to reproduce, adapt, distribute, perform, display,
+  communicate, and translate a Work;</li>
+  <li>moral rights retained by the original author(s) and/or
+  performer(s);</li>
+  <li>other similar, equivalent or corresponding rights throughout the
+  world.</li>
+</ol>
+<p><strong>2. Waiver.</strong> To the greatest extent permitted by, but not
+in contravention of, applicable law, Affirmer hereby overtly, fully,
+permanently, irrevocably and unconditionally waives the Copyright and Related
+Rights.</p>
+<p><strong>3. Public License Fallback.</strong> Should any part of the Waiver
+for any reason be judged legally invalid, the Waiver shall be preserved to
+the maximum extent permitted.</p>
+<p><strong>4. Limitations and Disclaimers.</strong></p>
+<ol type="a">
+  <li>No trademark or patent rights held by Affirmer are waived.</li>
+  <li>Affirmer offers the Work as-is.</li>
+  <li>Affirmer disclaims responsibility for clearing rights of other
+  persons.</li>
+  <li>Affirmer understands and acknowledges that Creative Commons is not a
+  party to this document.</li>
+</ol>
+</div>
+</body></html>
+"""
+
+
+class LxmlImportersTest(TestCase):
+    """
+    The lxml importers extract the same messages as the BeautifulSoup4
+    importers of the load_html_files command.
+    """
+
+    def setUp(self):
+        self.command = LoadHtmlFilesCommand()
+
+    def assert_same_messages(self, importer, content, legal_code):
+        expected = getattr(self.command, importer)(
+            content=content, legal_code=legal_code
+        )
+        messages = getattr(lxml_importers, importer)(
+            content=content, legal_code=legal_code
+        )
+        self.assertEqual(expected, messages)
+        for key, value in messages.items():
+            self.assertIs(str, type(value), key)
+        return messages
+
+    def test_import_by_40_license_html(self):
+        tool = ToolFactory(unit="by", version="4.0")
+        legal_code = LegalCodeFactory(
+            tool=tool, language_code="en", html_file="/tmp/by_4.0.html"
+        )
+        messages = self.assert_same_messages(
+            "import_by_40_license_html", BY_40_HTML, legal_code
+        )
+        self.assertEqual(
+            "Attribution 4.0 International", messages["license_medium"]
+        )
+        self.assertEqual("License grant", messages["s2a_license_grant_title"])
+        self.assertIn(
+            '<a href="#s4">4</a>',
+            messages["s4_sui_generics_database_rights_postscript"],
+        )
+        legal_code.refresh_from_db()
+        self.assertEqual("Attribution 4.0 International", legal_code.title)
+
+        # The "ar" translation starts the s3a content with whitespace
+        content = BY_40_HTML.replace(
+            '<li id="s3a"><p>', '<li id="s3a"> <p>'
+        ).replace("Attribution 4.0 International", "نَسب المُصنَّف 4.0 دولي")
+        self.assert_same_messages(
+            "import_by_40_license_html", content, legal_code
+        )
+
+    def test_import_by_30_unported_license_html(self):
+        tool = ToolFactory(unit="by", version="3.0", jurisdiction_code="")
+        legal_code = LegalCodeFactory(tool=tool, language_code="en")
+        messages = self.assert_same_messages(
+            "import_by_30_unported_license_html", BY_30_HTML, legal_code
+        )
+        self.assertEqual("3. License Grant.", messages["grant"])
+        self.assertEqual(
+            "Waivable Compulsory License Schemes",
+            messages["restrictions name 2;1"],
+        )
+
+    def test_import_zero_license_html(self):
+        tool = ToolFactory(unit="zero", version="1.0", category="publicdomain")
+        legal_code = LegalCodeFactory(tool=tool, language_code="en")
+        messages = self.assert_same_messages(
+            "import_zero_license_html", ZERO_HTML, legal_code
+        )
+        self.assertEqual("CC0 1.0 Universal", messages["license_medium"])
+        self.assertIn("s4_part_3", messages)
+
+        # The "el" translation divides the parts of s4 with <br/> in a
+        # <p class="tab">
+        start = ZERO_HTML.index('<ol type="a">')
+        end = ZERO_HTML.index("</ol>", start) + len("</ol>")
+        content = (
+            ZERO_HTML[:start]
+            + '<p class="tab">a.<br />b.<br />c.<br />d.</p>'
+            + ZERO_HTML[end:]
+        )
+        messages = self.assert_same_messages(
+            "import_zero_license_html", content, legal_code
+        )
+        self.assertEqual("a.<br/>b.<br/>c.<br/>d.", messages["s4_part_0"])
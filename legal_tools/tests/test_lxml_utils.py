@@ -0,0 +1,168 @@
+# Third-party
+from bs4 import BeautifulSoup
+from django.test import TestCase
+
+# First-party/Local
+from legal_tools import bs_utils
+from legal_tools.lxml_utils import (
+    child_nodes,
+    direct_children_with_tag,
+    find_by_id,
+    find_first,
+    find_next_sibling,
+    get_string,
+    get_text,
+    inner_html,
+    name_and_text,
+    nested_text,
+    outer_html,
+    parse_html,
+    text_up_to,
+    to_str,
+)
+
+# HTML with the things that BeautifulSoup serializes in its own way
+TRICKY_HTML = """
+<html><head><title>Tricky</title>
+<style>p > a { color: red; }</style></head>
+<body>
+<div id="top" class="  one   two ">
+  <p id="p1">Fish &amp; chips &lt;for&gt; &quot;two&quot;&nbsp;ok</p>
+  <p id="p2"><strong>Name</strong>:   is <em>the</em> text.<br>
+    <!-- a comment -->Next line<br />End</p>
+  <p id="p3" title='say "hi"' data-x="a&amp;b" lang="ca">Això és <a
+    href="https://example.com/?a=1&b=2" rel="nofollow  noopener">un
+    enllaç</a></p>
+  <pre id="pre">  keep   </pre>
+  <ol><li id="li1"><span><strong>Only</strong></span></li><li>   </li></ol>
+  <p id="p4"><script>if (a < b) { c(); }</script>Visible</p>
+  <p id="p5"><img src="x.png" alt=""><input checked=""></p>
+  <p id="empty"></p>
+</div>
+<p class="tab">After</p>
+</body></html>
+"""
+
+
+class TestLxmlUtils(TestCase):
+    def test_inner_html(self):
+        text = """<div id="foo"><strong><p>Foo</p></strong></div>"""
+        root = parse_html(text)
+        self.assertEqual(
+            "<strong><p>Foo</p></strong>", inner_html(find_by_id(root, "foo"))
+        )
+
+    def test_nested_text(self):
+        text = """<div id="foo"><strong><p>Foo</p></strong></div>"""
+        root = parse_html(text)
+        self.assertEqual("Foo", nested_text(find_by_id(root, "foo")))
+
+        text_node = get_string(find_by_id(root, "foo"))
+        self.assertEqual("Foo", nested_text(text_node))
+
+        # Multiple children
+        text = """<div id="test"><p>1</p><p>2</p></div>"""
+        root = parse_html(text)
+        self.assertEqual(
+            "<p>1</p><p>2</p>", nested_text(find_by_id(root, "test"))
+        )
+
+    def test_text_up_to(self):
+        text = (
+            '<div id="top"><p>Child 1</p><p>Child 2</p><span>Foo</span>'
+            "<p>Child 4</p> </div>"
+        )
+        root = parse_html(text)
+        self.assertEqual(
+            "<p>Child 1</p><p>Child 2</p>",
+            text_up_to(find_by_id(root, "top"), "span"),
+        )
+
+    def test_name_and_text(self):
+        text = (
+            '<div id="test"><strong>Truck</strong> is a <strong>heavy</strong>'
+            " vehicle.</div>"
+        )
+        root = parse_html(text)
+        self.assertEqual(
+            {"name": "Truck", "text": "is a <strong>heavy</strong> vehicle."},
+            name_and_text(find_by_id(root, "test")),
+        )
+
+    def test_direct_children_with_tag(self):
+        text = """
+        <div id="top">
+           <div id="child1"></div>
+           <span id="child2">
+               <div id="grandchild2.1"></div>
+           </span>
+           <!-- <div id="commented"></div> -->
+           <div id="child3">
+                <span id="grandchild3.1"></span>
+            </div>
+        </div>
+        """
+        element = find_by_id(parse_html(text), "top")
+        result = direct_children_with_tag(element, "div")
+        self.assertEqual(["child1", "child3"], [e.get("id") for e in result])
+        result = direct_children_with_tag(element, "span")
+        self.assertEqual(["child2"], [e.get("id") for e in result])
+
+    def test_find(self):
+        root = parse_html(TRICKY_HTML)
+        self.assertEqual("li", find_by_id(root, "li1").tag)
+        self.assertIsNone(find_by_id(root, "missing"))
+        self.assertEqual("p1", find_first(root, "p").get("id"))
+        self.assertIsNone(find_first(find_by_id(root, "p1"), "p"))
+        p1 = find_by_id(root, "p1")
+        self.assertEqual("p2", find_next_sibling(p1, "p").get("id"))
+        self.assertEqual("pre", find_next_sibling(p1, "pre").get("id"))
+        self.assertIsNone(find_next_sibling(p1, "p", class_="tab"))
+        top = find_by_id(root, "top")
+        self.assertEqual("After", get_string(find_next_sibling(top, "p")))
+        self.assertEqual(
+            "After", get_string(find_next_sibling(top, "p", class_="tab"))
+        )
+
+    def test_parse_empty(self):
+        root = parse_html("")
+        self.assertEqual("html", root.tag)
+        self.assertIsNone(find_first(root, "p"))
+
+    def test_parse_content_after_document(self):
+        text = '<html><body><p id="a">1</p></body></html><p id="b">2</p>'
+        root = parse_html(text)
+        self.assertEqual("html", root.tag)
+        self.assertEqual(["a", "b"], [p.get("id") for p in root.iter("p")])
+        self.assertEqual("2", get_string(find_by_id(root, "b")))
+
+    def test_same_as_bs_utils(self):
+        """
+        For every element, the functions return what their BeautifulSoup
+        counterparts return.
+        """
+        soup = BeautifulSoup(TRICKY_HTML, "lxml")
+        root = parse_html(TRICKY_HTML)
+        tags = soup.find_all(True)
+        elements = [e for e in root.iter() if isinstance(e.tag, str)]
+        self.assertEqual([t.name for t in tags], [e.tag for e in elements])
+        for tag, element in zip(tags, elements):
+            with self.subTest(tag.name, id=tag.get("id")):
+                self.assertEqual(str(tag), outer_html(element))
+                self.assertEqual(bs_utils.inner_html(tag), inner_html(element))
+                self.assertEqual(
+                    bs_utils.nested_text(tag), nested_text(element)
+                )
+                self.assertEqual(
+                    bs_utils.text_up_to(tag, "br"), text_up_to(element, "br")
+                )
+                self.assertEqual(tag.get_text(), get_text(element))
+                self.assertEqual(tag.string, get_string(element))
+                self.assertEqual(
+                    [str(child) for child in tag.contents],
+                    [to_str(child) for child in child_nodes(element)],
+                )
+                if tag.contents:
+                    self.assertEqual(
+                        bs_utils.name_and_text(tag), name_and_text(element)
+                    )
@@ -0,0 +1,119 @@
+# Standard library
+import hashlib
+import os
+import tempfile
+
+# Third-party
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+# First-party/Local
+from legal_tools import middleware
+from legal_tools.tests.factories import LegalCodeFactory, ToolFactory
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheMiddlewareTest(TestCase):
+    def setUp(self):
+        tool = ToolFactory(
+            canonical_url="https://creativecommons.org/licenses/by/4.0/",
+            category="licenses",
+            unit="by",
+            version="4.0",
+            jurisdiction_code="",
+        )
+        self.legal_code = LegalCodeFactory(tool=tool, language_code="en")
+        caches[middleware.PAGE_CACHE_ALIAS].clear()
+        middleware.init_middleware_build_id("build-1")
+
+    def tearDown(self):
+        caches[middleware.PAGE_CACHE_ALIAS].clear()
+        middleware.init_middleware_build_id()
+
+    def test_cached(self):
+        for url in [self.legal_code.deed_url, self.legal_code.legal_code_url]:
+            with self.subTest(url):
+                rsp = self.client.get(url)
+                self.assertEqual(200, rsp.status_code)
+                etag = f'"{hashlib.md5(rsp.content).hexdigest()}"'
+                self.assertEqual(etag, rsp["ETag"])
+                with self.assertNumQueries(0):
+                    cached_rsp = self.client.get(url)
+                self.assertEqual(200, cached_rsp.status_code)
+                self.assertEqual(rsp.content, cached_rsp.content)
+                self.assertEqual(
+                    rsp["Content-Type"], cached_rsp["Content-Type"]
+                )
+                self.assertEqual(etag, cached_rsp["ETag"])
+
+    def test_if_none_match(self):
+        url = self.legal_code.deed_url
+        etag = self.client.get(url)["ETag"]
+        rsp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(304, rsp.status_code)
+        self.assertEqual(b"", rsp.content)
+        self.assertEqual(etag, rsp["ETag"])
+        rsp = self.client.get(url, HTTP_IF_NONE_MATCH='"other"')
+        self.assertEqual(200, rsp.status_code)
+
+    def test_build_id(self):
+        cache = caches[middleware.PAGE_CACHE_ALIAS]
+        url = self.legal_code.deed_url
+        self.client.get(url)
+        self.assertIsNotNone(cache.get(middleware.get_page_cache_key(url)))
+        middleware.init_middleware_build_id("build-2")
+        self.assertIsNone(cache.get(middleware.get_page_cache_key(url)))
+        self.client.get(url)
+        self.assertIsNotNone(cache.get(middleware.get_page_cache_key(url)))
+
+    def test_not_cached(self):
+        # Failed responses
+        url = "/licenses/by/4.0/deed.xyz"
+        self.assertEqual(404, self.client.get(url).status_code)
+        self.assertIsNone(
+            caches[middleware.PAGE_CACHE_ALIAS].get(
+                middleware.get_page_cache_key(url)
+            )
+        )
+        # Other methods
+        rsp = self.client.post(self.legal_code.deed_url)
+        self.assertNotIn("ETag", rsp)
+        # Other views
+        rsp = self.client.get("/licenses/metadata.yaml")
+        self.assertEqual(200, rsp.status_code)
+        self.assertNotIn("ETag", rsp)
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        rsp = self.client.get(self.legal_code.deed_url)
+        self.assertEqual(200, rsp.status_code)
+        self.assertNotIn("ETag", rsp)
+
+
+class BuildIdTest(TestCase):
+    def tearDown(self):
+        middleware.init_middleware_build_id()
+
+    def test_get_files_digest(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "django.mo")
+            with open(path, "wb") as file_object:
+                file_object.write(b"one")
+            with open(os.path.join(tmpdir, "django.po"), "wb") as file_object:
+                file_object.write(b"ignored")
+            digest = middleware.get_files_digest([tmpdir], (".mo",))
+            self.assertEqual(
+                digest, middleware.get_files_digest([tmpdir], (".mo",))
+            )
+            with open(path, "wb") as file_object:
+                file_object.write(b"two")
+            self.assertNotEqual(
+                digest, middleware.get_files_digest([tmpdir], (".mo",))
+            )
+
+    def test_get_build_id(self):
+        middleware.init_middleware_build_id()
+        build_id = middleware.get_build_id()
+        self.assertIs(build_id, middleware.get_build_id())
+        with override_settings(DATA_REPOSITORY_DIR="/nonexistent"):
+            self.assertEqual("", middleware.get_data_repository_commit())
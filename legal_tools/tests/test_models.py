@@ -1,4 +1,5 @@
 # Standard library
+import tracemalloc
 from unittest import mock
 
 # Third-party
@@ -118,6 +119,54 @@ class LegalCodeQuerySetTest(TestCase):
             ),
         )
 
+    def test_html_deferred(self):
+        tool = ToolFactory(unit="by", version="4.0")
+        LegalCodeFactory(tool=tool, language_code="en", html="<p>en</p>")
+        legal_code = LegalCode.objects.get()
+        self.assertEqual({"html"}, legal_code.get_deferred_fields())
+        legal_code = tool.legal_codes.get()
+        self.assertEqual({"html"}, legal_code.get_deferred_fields())
+        # Deferred fields are still loaded on access
+        with self.assertNumQueries(1):
+            self.assertEqual("<p>en</p>", legal_code.html)
+
+    def test_with_html(self):
+        tool = ToolFactory(unit="by", version="4.0")
+        LegalCodeFactory(tool=tool, language_code="en", html="<p>en</p>")
+        legal_code = LegalCode.objects.with_html().get()
+        self.assertEqual(set(), legal_code.get_deferred_fields())
+        with self.assertNumQueries(0):
+            self.assertEqual("<p>en</p>", legal_code.html)
+
+    def test_validgroups_memory(self):
+        # Walking all of the valid legal codes (as the list views and publish
+        # do) must not load the html of every legal code into memory
+        html_size = 256 * 1024
+        tool = ToolFactory(unit="by", version="4.0")
+        for language_code in ["de", "en", "es", "fr", "ja", "nl", "pt"]:
+            LegalCodeFactory(
+                tool=tool,
+                language_code=language_code,
+                html=language_code * (html_size // 2),
+            )
+        total_html_size = 7 * html_size
+
+        def walk_peak(queryset):
+            tracemalloc.start()
+            try:
+                for legal_codes in queryset.validgroups().values():
+                    for legal_code in legal_codes:
+                        legal_code.tool
+            finally:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            return peak
+
+        deferred_peak = walk_peak(LegalCode.objects.all())
+        loaded_peak = walk_peak(LegalCode.objects.with_html())
+        self.assertGreater(loaded_peak, total_html_size)
+        self.assertLess(deferred_peak, total_html_size // 4)
+
 
 class LegalCodeModelTest(TestCase):
     def test_str(self):
@@ -1101,6 +1150,29 @@ class ToolModelTest(TestCase):
         tool = ToolFactory(unit="qwerty", version="2.7", jurisdiction_code="")
         self.assertEqual("qwerty_27", tool.resource_slug)
 
+    def test_save_denormalized_fields(self):
+        tool = ToolFactory(
+            category="licenses",
+            unit="by-nc",
+            version="3.0",
+            jurisdiction_code="pl",
+        )
+        legal_code = LegalCodeFactory(tool=tool, language_code="pl")
+        self.assertEqual("licenses/by-nc/3.0/pl", tool.save_path)
+        self.assertEqual("by-nc_30_pl", tool.resource_slug)
+        self.assertEqual("CC BY-NC 3.0 PL", tool.identifier_text)
+        self.assertEqual("Poland", tool.jurisdiction_name)
+        self.assertEqual("licenses/by-nc/3.0/pl", legal_code.save_path)
+        self.assertEqual("by-nc-30-pl-pl", legal_code.translation_branch_name)
+
+        # Changes to the tool are copied to its legal codes
+        tool.jurisdiction_code = ""
+        tool.save()
+        legal_code.refresh_from_db()
+        self.assertEqual("International (unported)", tool.jurisdiction_name)
+        self.assertEqual("licenses/by-nc/3.0", legal_code.save_path)
+        self.assertEqual("by-nc-30-pl", legal_code.translation_branch_name)
+
     def test_str(self):
         tool = ToolFactory(
             unit="bx-oh", version="1.3", jurisdiction_code="any"
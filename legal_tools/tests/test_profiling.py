@@ -0,0 +1,206 @@
+# Standard library
+import json
+import os
+import tempfile
+import threading
+
+# Third-party
+from django.test import TestCase
+
+# First-party/Local
+from legal_tools.models import Tool
+from legal_tools.profiling import (
+    MIB,
+    PROFILE_REPORT_FILENAME,
+    PROFILE_STATS_FILENAME,
+    MemoryLimitExceeded,
+    PublishProfiler,
+)
+from legal_tools.tests.factories import LegalCodeFactory
+from legal_tools.utils import OutputWriter
+
+
+class PublishProfilerTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.writer = OutputWriter()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get_profiler(self, **kwargs):
+        return PublishProfiler(
+            self.writer, output_dir=self.tmpdir.name, top=2, **kwargs
+        )
+
+    def save(self, name, content):
+        self.writer.save_bytes_to_file(
+            content, os.path.join(self.tmpdir.name, "docs", name)
+        )
+
+    def test_disabled(self):
+        profiler = self.get_profiler()
+        with profiler:
+            with profiler.stage("stage"):
+                with profiler.page("deed", "deed.html") as record:
+                    record["bytes"] = 1
+        self.assertEqual({}, profiler.stages)
+        self.assertEqual([], profiler.pages)
+        self.assertEqual([], os.listdir(self.tmpdir.name))
+
+    def test_report(self):
+        profiler = self.get_profiler(enabled=True)
+        with profiler:
+            with profiler.stage("write_legal_tools"):
+                with profiler.page("deed", "deed.en.html"):
+                    list(Tool.objects.all())
+                    self.save("deed.en.html", b"deed")
+                with profiler.page("legal_code", "legalcode.en.html"):
+                    self.save("legalcode.en.html", b"legal code")
+                with profiler.page("deed", "deed.nl.html"):
+                    self.save("deed.nl.html", b"deed")
+            with profiler.stage("write_lists"):
+
+                def render_list():
+                    with profiler.page("list", "list.en.html") as record:
+                        record["bytes"] = 4
+
+                thread = threading.Thread(target=render_list)
+                thread.start()
+                thread.join()
+        with open(
+            os.path.join(self.tmpdir.name, PROFILE_REPORT_FILENAME)
+        ) as report_file:
+            report = json.load(report_file)
+        self.assertEqual(
+            ["write_legal_tools", "write_lists"], list(report["stages"])
+        )
+        stage = report["stages"]["write_legal_tools"]
+        self.assertEqual(1, stage["count"])
+        self.assertEqual(1, stage["queries"])
+        self.assertEqual(18, stage["bytes"])
+        self.assertEqual(18, stage["bytes_written"])
+        self.assertEqual(1, report["total"]["queries"])
+        self.assertEqual(
+            {"deed": 2, "legal_code": 1, "list": 1},
+            {
+                page_type: entry["count"]
+                for page_type, entry in report["page_types"].items()
+            },
+        )
+        self.assertEqual(1, report["page_types"]["deed"]["queries"])
+        self.assertEqual(8, report["page_types"]["deed"]["bytes"])
+        self.assertEqual(4, report["page_types"]["list"]["bytes"])
+        self.assertEqual(4, len(report["pages"]))
+        self.assertEqual(2, len(report["slowest_pages"]))
+        self.assertGreaterEqual(
+            report["slowest_pages"][0]["wall"],
+            report["slowest_pages"][1]["wall"],
+        )
+        self.assertFalse(
+            os.path.exists(
+                os.path.join(self.tmpdir.name, PROFILE_STATS_FILENAME)
+            )
+        )
+
+    def test_cprofile(self):
+        profiler = self.get_profiler(cprofile=True)
+        with profiler:
+            pass
+        self.assertTrue(profiler.enabled)
+        self.assertTrue(
+            os.path.exists(
+                os.path.join(self.tmpdir.name, PROFILE_STATS_FILENAME)
+            )
+        )
+
+    def test_query_budget(self):
+        profiler = self.get_profiler(query_budget=1)
+        with profiler:
+            with profiler.stage("write_legal_tools"):
+                with profiler.page("deed", "deed.en.html"):
+                    list(Tool.objects.all())
+                with profiler.page("legal_code", "legalcode.en.html"):
+                    list(Tool.objects.all())
+                    list(Tool.objects.all())
+
+                def render_list():
+                    with profiler.page("list", "list.en.html"):
+                        list(Tool.objects.all())
+                        list(Tool.objects.all())
+
+                thread = threading.Thread(target=render_list)
+                thread.start()
+                thread.join()
+        self.assertFalse(profiler.enabled)
+        self.assertEqual(
+            [("legal_code", 2), ("list", 2)],
+            [
+                (page["type"], page["queries"])
+                for page in profiler.get_pages_over_query_budget()
+            ],
+        )
+        self.assertGreater(
+            profiler.get_pages_over_query_budget()[0]["query_time"], 0
+        )
+        self.assertEqual(3, profiler.stages["write_legal_tools"]["queries"])
+        # The report is only written when profiling is enabled
+        self.assertEqual([], os.listdir(self.tmpdir.name))
+
+    def test_max_memory(self):
+        profiler = self.get_profiler(max_memory=1024 * 1024)
+        with profiler:
+            with profiler.stage("write_lists"):
+                with profiler.page("list", "list.en.html"):
+                    data = bytearray(1024)
+            self.assertLess(0, profiler.stages["write_lists"]["peak_memory"])
+            with self.assertRaises(MemoryLimitExceeded):
+                with profiler.stage("write_legal_tools"):
+                    with profiler.page("deed", "deed.en.html"):
+                        data = bytearray(2 * 1024 * 1024)
+        del data
+        self.assertGreater(profiler.peak_memory, 2 * 1024 * 1024)
+        self.assertEqual(["write_lists"], list(profiler.stages))
+        self.assertEqual([], os.listdir(self.tmpdir.name))
+
+
+class PublishProfilerPageRenderTest(TestCase):
+    # A separate test case, as the rows written by the factories lock their
+    # (shared in memory) tables for the other threads until the test case
+    # is rolled back
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get_profiler(self, **kwargs):
+        return PublishProfiler(
+            OutputWriter(), output_dir=self.tmpdir.name, **kwargs
+        )
+
+    def test_max_memory_page_render(self):
+        legal_code = LegalCodeFactory(
+            tool__canonical_url="https://creativecommons.org/licenses/by/4.0/",
+            tool__unit="by",
+            tool__version="4.0",
+            language_code="en",
+        )
+        # Render once so that the templates are loaded (and cached)
+        content = self.client.get(legal_code.deed_url).content
+        profiler = self.get_profiler(max_memory=64 * MIB)
+        with profiler:
+            with profiler.stage("write_legal_tools"):
+                with profiler.page("deed", "deed.en.html"):
+                    self.assertEqual(
+                        content, self.client.get(legal_code.deed_url).content
+                    )
+        peak_memory = profiler.stages["write_legal_tools"]["peak_memory"]
+        self.assertGreater(peak_memory, len(content))
+        # A page render that exceeds the limit fails the run
+        profiler = self.get_profiler(max_memory=len(content))
+        with self.assertRaises(MemoryLimitExceeded):
+            with profiler:
+                with profiler.stage("write_legal_tools"):
+                    with profiler.page("deed", "deed.en.html"):
+                        self.client.get(legal_code.deed_url)
@@ -0,0 +1,237 @@
+# Standard library
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+from unittest import mock
+
+# Third-party
+from django.test import TestCase
+
+# First-party/Local
+from legal_tools.management.commands import publish
+from legal_tools.tests.factories import LegalCodeFactory
+from legal_tools.utils import OutputWriter, init_utils_writer
+
+
+class PublishWatchTest(TestCase):
+    def get_command(self):
+        command = publish.Command()
+        command.options = {"watch_poll": True}
+        command.writer = mock.Mock()
+        command.pages = ["licenses/list.en.html"]
+        command.sources = {"licenses/list.en.html": {}}
+        command.targeted_categories = {"licenses"}
+
+        def target_changed_files(changed_files, description):
+            command.changed_pages = set(changed_files)
+
+        command.target_changed_files = mock.Mock(
+            side_effect=target_changed_files
+        )
+        command.distill_and_copy = mock.Mock()
+        return command
+
+    def test_watch_continues_after_failure(self):
+        command = self.get_command()
+        watcher = mock.Mock()
+        with mock.patch.object(
+            publish, "get_watcher", return_value=watcher
+        ), mock.patch.object(
+            publish,
+            "wait_for_changes",
+            side_effect=[{"/po/a.po"}, {"/po/a.po"}, KeyboardInterrupt],
+        ), mock.patch.object(
+            publish,
+            "compile_pofile",
+            side_effect=[OSError("Syntax error in po file"), "/po/a.mo"],
+        ), mock.patch.object(
+            publish.os.path, "isfile", return_value=True
+        ), mock.patch.object(
+            publish, "reset_translations"
+        ):
+            with self.assertLogs(publish.LOG, "INFO") as logs:
+                command.watch()
+        failures = [
+            record for record in logs.records if record.levelname == "ERROR"
+        ]
+        self.assertEqual(1, len(failures))
+        self.assertIn("Still watching", failures[0].getMessage())
+        self.assertIsInstance(failures[0].exc_info[1], OSError)
+        # The second change was published
+        command.target_changed_files.assert_called_once()
+        command.distill_and_copy.assert_called_once()
+        self.assertIn("Stopped watching", logs.output[-1])
+        watcher.close.assert_called_once()
+        # The state of the previous publish was reset
+        self.assertEqual([], command.pages)
+        self.assertEqual({}, command.sources)
+        self.assertEqual(set(), command.targeted_categories)
+
+
+class PublishOutputTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.live_dir = os.path.join(self.tmpdir.name, "live")
+        self.staging_dir = os.path.join(self.tmpdir.name, "staging")
+        self.writer = OutputWriter()
+        init_utils_writer(self.writer)
+        self.command = publish.Command()
+        self.command.options = {"brotli": False}
+        self.command.writer = self.writer
+        self.command.output_dir = self.staging_dir
+        self.command.live_output_dir = self.live_dir
+        self.command.pages = []
+        self.command.sources = {}
+        self.command.targeted = False
+
+    def tearDown(self):
+        init_utils_writer(None)
+        self.tmpdir.cleanup()
+
+    def write_manifest(self, output_dir, files):
+        self.writer.save_bytes_to_file(
+            json.dumps({"files": files}).encode("utf-8"),
+            os.path.join(output_dir, publish.MANIFEST_FILENAME),
+        )
+
+    def get_entry(self, filebytes, **kwargs):
+        return dict(
+            sha256=hashlib.sha256(filebytes).hexdigest(),
+            size=len(filebytes),
+            **kwargs,
+        )
+
+    def test_compress_output(self):
+        same = b"<p>Same</p>" * 100
+        changed = b"<p>Changed</p>" * 100
+        # The previous build, with its compressed siblings
+        previous_gz = gzip.compress(same)
+        self.writer.save_bytes_to_file(same, f"{self.live_dir}/same.html")
+        self.writer.save_bytes_to_file(
+            previous_gz, f"{self.live_dir}/same.html.gz"
+        )
+        self.write_manifest(
+            self.live_dir,
+            {
+                "same.html": self.get_entry(same),
+                "same.html.gz": self.get_entry(previous_gz),
+                "changed.html": self.get_entry(b"<p>Before</p>" * 100),
+                "changed.html.gz": self.get_entry(b"previous"),
+            },
+        )
+        self.writer.save_bytes_to_file(
+            b"previous", f"{self.live_dir}/changed.html.gz"
+        )
+        # This build
+        self.writer.save_bytes_to_file(same, f"{self.staging_dir}/same.html")
+        self.writer.save_bytes_to_file(
+            changed, f"{self.staging_dir}/changed.html"
+        )
+        self.writer.save_bytes_to_file(
+            b"<p>Small</p>", f"{self.staging_dir}/small.html"
+        )
+        self.writer.save_bytes_to_file(same, f"{self.staging_dir}/same.png")
+        os.symlink("same.html", f"{self.staging_dir}/link.html")
+
+        with self.assertLogs(publish.LOG, "INFO") as logs:
+            self.command.compress_output()
+
+        self.assertIn("1 compressed, 1 reused", logs.output[-1])
+        with open(f"{self.staging_dir}/same.html.gz", "rb") as f:
+            self.assertEqual(previous_gz, f.read())
+        with open(f"{self.staging_dir}/changed.html.gz", "rb") as f:
+            self.assertEqual(changed, gzip.decompress(f.read()))
+        self.assertFalse(os.path.exists(f"{self.staging_dir}/small.html.gz"))
+        self.assertFalse(os.path.exists(f"{self.staging_dir}/same.png.gz"))
+        # The symlinks get symlinked compressed siblings
+        self.assertEqual(
+            "same.html.gz", os.readlink(f"{self.staging_dir}/link.html.gz")
+        )
+
+    def test_write_metadata(self):
+        LegalCodeFactory(
+            tool__category="licenses",
+            tool__unit="by",
+            tool__version="4.0",
+            language_code="en",
+        )
+        with mock.patch.object(
+            publish, "save_bytes_to_file"
+        ) as save_bytes_to_file, self.assertLogs(publish.LOG, "INFO"):
+            self.command.write_metadata()
+        # The documents are streamed to their files
+        save_bytes_to_file.assert_not_called()
+        for relpath, iter_metadata in (
+            ("licenses/metadata.yaml", publish.iter_metadata_yaml),
+            ("licenses/metadata.json", publish.iter_metadata_json),
+        ):
+            with open(f"{self.staging_dir}/{relpath}", "rb") as f:
+                self.assertEqual(
+                    b"".join(iter_metadata(publish.iter_tools_metadata())),
+                    f.read(),
+                )
+        with open(f"{self.staging_dir}/licenses/metadata.yaml", "rb") as f:
+            self.assertIn(b"- by_40:\n", f.read())
+
+    def test_write_sitemap(self):
+        self.command.pages = [
+            "licenses/by/4.0/legalcode.en.html",
+            "licenses/by/4.0/deed.en",
+            "licenses/list.en.html",
+        ]
+        with self.assertLogs(publish.LOG, "INFO"):
+            self.command.write_sitemap()
+        with open(f"{self.staging_dir}/{publish.SITEMAP_FILENAME}") as f:
+            sitemap = f.read()
+        self.assertEqual(
+            [
+                "https://creativecommons.org/licenses/by/4.0/deed.en",
+                "https://creativecommons.org/licenses/by/4.0/legalcode.en",
+                "https://creativecommons.org/licenses/list.en",
+            ],
+            re.findall(r"<loc>(.*)</loc>", sitemap),
+        )
+
+    def test_write_manifest_targeted(self):
+        self.command.output_dir = self.live_dir
+        self.command.targeted = True
+        kept = b"<p>Kept</p>"
+        before = b"<p>Before</p>"
+        after = b"<p>After</p>"
+        by_30 = {"canonical_url": "by/3.0", "language_code": "en"}
+        by_40 = {"canonical_url": "by/4.0", "language_code": "en"}
+        # The previous build
+        self.writer.save_bytes_to_file(kept, f"{self.live_dir}/kept.html")
+        self.writer.save_bytes_to_file(before, f"{self.live_dir}/new.html")
+        self.write_manifest(
+            self.live_dir,
+            {
+                "kept.html": self.get_entry(kept, legal_code=by_30),
+                "new.html": self.get_entry(before, legal_code=by_30),
+            },
+        )
+        # This targeted build only writes new.html
+        self.writer = OutputWriter()
+        init_utils_writer(self.writer)
+        self.command.writer = self.writer
+        self.writer.save_bytes_to_file(after, f"{self.live_dir}/new.html")
+        self.command.sources = {"new.html": by_40}
+        os.symlink("new.html", f"{self.live_dir}/link.html")
+
+        with self.assertLogs(publish.LOG, "INFO"):
+            self.command.write_manifest()
+
+        files = publish.load_manifest(self.live_dir)
+        self.assertEqual(
+            self.get_entry(kept, content_type="text/html", legal_code=by_30),
+            files["kept.html"],
+        )
+        self.assertEqual(
+            self.get_entry(after, content_type="text/html", legal_code=by_40),
+            files["new.html"],
+        )
+        self.assertEqual({"symlink": "new.html"}, files["link.html"])
+        self.assertNotIn(publish.MANIFEST_FILENAME, files)
@@ -0,0 +1,159 @@
+# Standard library
+import io
+import os
+import tempfile
+import threading
+from unittest import mock
+
+# Third-party
+from django.conf import settings
+from django.http import Http404
+from django.test import TransactionTestCase
+
+# First-party/Local
+from legal_tools import utils
+from legal_tools.dependencies import record_templates
+from legal_tools.render_daemon import (
+    RenderDaemonClient,
+    RenderRequestHandler,
+    RenderServer,
+    get_render_info,
+)
+from legal_tools.tests.factories import LegalCodeFactory, ToolFactory
+
+
+# The render daemon uses its own database connections (one per client
+# connection), so the test data must be committed
+class RenderDaemonTest(TransactionTestCase):
+    def setUp(self):
+        tool = ToolFactory(
+            canonical_url="https://creativecommons.org/licenses/by/4.0/",
+            category="licenses",
+            unit="by",
+            version="4.0",
+            jurisdiction_code="",
+        )
+        self.legal_code = LegalCodeFactory(tool=tool, language_code="en")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.socket_path = os.path.join(self.tmpdir.name, "render.sock")
+        self.server = RenderServer(self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.client = RenderDaemonClient.connect(self.socket_path)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        self.tmpdir.cleanup()
+
+    def test_connect(self):
+        self.assertIsNotNone(self.client)
+        self.assertIsNone(
+            RenderDaemonClient.connect(
+                os.path.join(self.tmpdir.name, "missing.sock")
+            )
+        )
+
+    def test_connect_different_settings(self):
+        info = get_render_info()
+        with mock.patch(
+            "legal_tools.render_daemon.get_render_info",
+            side_effect=[info, dict(info, template_engine="other")],
+        ):
+            self.assertIsNone(RenderDaemonClient.connect(self.socket_path))
+
+    def test_get_url_content(self):
+        for url in [self.legal_code.deed_url, self.legal_code.legal_code_url]:
+            with self.subTest(url):
+                self.assertEqual(
+                    utils.render_url(url), self.client.get_url_content(url)
+                )
+
+    def test_get_url_content_records_templates(self):
+        with record_templates() as templates:
+            self.client.get_url_content(self.legal_code.deed_url)
+        self.assertIn(
+            "templates/deed.html",
+            [
+                os.path.relpath(path, settings.PROJECT_ROOT)
+                for path in templates
+            ],
+        )
+
+    def test_get_url_content_not_found(self):
+        with self.assertRaisesMessage(Http404, "invalid language: xyz"):
+            self.client.get_url_content("/licenses/by/4.0/deed.xyz")
+
+    def test_render_legal_codes(self):
+        pages = self.client.render(legal_codes=[self.legal_code.id])
+        self.assertEqual(
+            [self.legal_code.deed_url, self.legal_code.legal_code_url],
+            [page["url"] for page, content in pages],
+        )
+        for page, content in pages:
+            self.assertEqual(200, page["status"])
+            self.assertEqual(utils.render_url(page["url"]), content)
+
+    def test_reload(self):
+        self.assertEqual(["data"], self.client.reload())
+        with mock.patch(
+            "legal_tools.render_daemon.get_templates_snapshot",
+            return_value={"changed.html": 1},
+        ), mock.patch("legal_tools.render_daemon.reset_templates") as reset:
+            self.assertEqual(["data", "templates"], self.client.reload())
+        reset.assert_called_once()
+
+    def test_reload_waits_for_renders(self):
+        state = self.server.state
+        reloaded = []
+        with state.rendering():
+            thread = threading.Thread(
+                target=lambda: reloaded.append(self.client.reload())
+            )
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+        thread.join()
+        self.assertEqual([["data"]], reloaded)
+
+    def test_render_waits_for_reload(self):
+        state = self.server.state
+        pages = []
+        with state.reloading_state():
+            thread = threading.Thread(
+                target=lambda: pages.extend(
+                    self.client.render(legal_codes=[self.legal_code.id])
+                )
+            )
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual([], pages)
+        thread.join()
+        self.assertEqual(2, len(pages))
+
+    def test_client_disconnected(self):
+        handler = RenderRequestHandler.__new__(RenderRequestHandler)
+        handler.server = self.server
+        handler.rfile = io.BytesIO(b'{"job": "info"}\n')
+        handler.wfile = mock.Mock()
+        handler.wfile.write.side_effect = BrokenPipeError()
+        with self.assertLogs("legal_tools.render_daemon", "DEBUG") as logs:
+            handler.handle()
+        self.assertEqual(
+            "DEBUG:legal_tools.render_daemon:Client disconnected",
+            logs.output[-1],
+        )
+
+    def test_utils_renderer(self):
+        url = self.legal_code.deed_url
+        utils.init_utils_renderer(self.client)
+        try:
+            with mock.patch.object(utils, "render_url") as render_url:
+                content = utils.get_url_content(url)
+            render_url.assert_not_called()
+        finally:
+            utils.init_utils_renderer()
+        self.assertEqual(utils.render_url(url), content)
@@ -1,12 +1,22 @@
+# Standard library
+from unittest import mock
+
 # Third-party
+from django.core.cache import caches
+from django.template import Context, Template, TemplateSyntaxError
 from django.test import TestCase
 from django.urls import get_resolver
+from django.utils import translation
 
 # First-party/Local
 from legal_tools.models import build_path
 from legal_tools.templatetags.license_tags import (
+    FRAGMENT_CACHE_ALIAS,
     current_letter,
+    get_fragment_cache_stats,
+    get_fragment_translation_files,
     next_letter,
+    reset_fragment_cache_stats,
     reset_letters,
     units,
 )
@@ -236,3 +246,64 @@ class ToolTagsTest(TestCase):
                 )
                 result = build_path(canonical_url, "deed", language)
                 self.assertEqual(expected_result, result)
+
+
+class FragmentCacheTest(TestCase):
+    template = Template(
+        "{% load i18n license_tags %}"
+        '{% fragmentcache "test" unit %}'
+        "{% trans 'Deed' %} {{ unit }} {{ other }}"
+        "{% endfragmentcache %}"
+    )
+
+    def setUp(self):
+        caches[FRAGMENT_CACHE_ALIAS].clear()
+        reset_fragment_cache_stats()
+        get_fragment_translation_files.cache_clear()
+
+    def render(self, language_code, **context):
+        with translation.override(language_code):
+            return self.template.render(Context(context))
+
+    def test_fragmentcache(self):
+        self.assertEqual("Deed by 1", self.render("en", unit="by", other=1))
+        # Context that isn't varied on is cached
+        self.assertEqual("Deed by 1", self.render("en", unit="by", other=2))
+        self.assertEqual(
+            "Deed by-sa 2", self.render("en", unit="by-sa", other=2)
+        )
+        self.assertEqual({"hits": 1, "misses": 2}, get_fragment_cache_stats())
+        reset_fragment_cache_stats()
+        self.assertEqual({"hits": 0, "misses": 0}, get_fragment_cache_stats())
+
+    def test_fragmentcache_language(self):
+        english = self.render("en", unit="by", other="")
+        with translation.override("nl"):
+            dutch_deed = translation.gettext("Deed")
+        dutch = self.render("nl", unit="by", other="")
+        self.assertEqual(f"{dutch_deed} by ", dutch)
+        self.assertEqual("Deed by ", english)
+        self.assertEqual({"hits": 0, "misses": 2}, get_fragment_cache_stats())
+
+    def test_fragmentcache_translation_files(self):
+        self.render("nl", unit="by")
+        with mock.patch(
+            "legal_tools.templatetags.license_tags.get_translation_files"
+        ) as mock_get_translation_files:
+            # Updated translation files (once the translations are reloaded)
+            mock_get_translation_files.return_value = (("django.mo", 1, 1),)
+            self.render("nl", unit="by")
+            mock_get_translation_files.assert_not_called()
+            get_fragment_translation_files.cache_clear()
+            self.render("nl", unit="by")
+            self.render("nl", unit="by")
+            self.render("nl", unit="by")
+            mock_get_translation_files.assert_called_once_with("nl", "django")
+        self.assertEqual({"hits": 3, "misses": 2}, get_fragment_cache_stats())
+
+    def test_fragmentcache_syntax_error(self):
+        with self.assertRaises(TemplateSyntaxError):
+            Template(
+                "{% load license_tags %}"
+                "{% fragmentcache %}{% endfragmentcache %}"
+            )
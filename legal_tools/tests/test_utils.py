@@ -1,6 +1,9 @@
 # Standard library
+import gzip
+import hashlib
 import logging
 import os
+import re
 import tempfile
 from io import StringIO
 from unittest import mock
@@ -13,7 +16,7 @@ from django.urls import Resolver404, URLResolver
 
 # First-party/Local
 from legal_tools import utils
-from legal_tools.models import Tool
+from legal_tools.models import LegalCode, Tool
 from .factories import LegalCodeFactory, ToolFactory
 
 
@@ -89,6 +92,29 @@ class SaveURLAsStaticFileTest(TestCase):
                             relpath="/output/licenses/metadata.yaml",
                         )
 
+    def test_get_url_content_streaming(self):
+        url = "/licenses/metadata.yaml"
+
+        class MockResponse:
+            status_code = 200
+            streaming = True
+            streaming_content = iter([b"xx", b"xxx"])
+
+        class MockResolverMatch:
+            def __init__(self, func):
+                self.func = func
+                self.args = []
+                self.kwargs = {}
+
+        mock_view_metadata = MagicMock()
+        mock_view_metadata.return_value = MockResponse()
+
+        with mock.patch.object(URLResolver, "resolve") as mock_resolve:
+            mock_resolve.return_value = MockResolverMatch(
+                func=mock_view_metadata
+            )
+            self.assertEqual(b"xxxxx", utils.get_url_content(url))
+
     def test_save_url_as_static_file_200(self):
         output_dir = "/output"
         url = "/licenses/metadata.yaml"
@@ -113,8 +139,11 @@ class SaveURLAsStaticFileTest(TestCase):
                 mock_resolve.return_value = MockResolverMatch(
                     func=mock_view_metadata
                 )
-                utils.save_url_as_static_file(output_dir, url, relpath)
+                content = utils.save_url_as_static_file(
+                    output_dir, url, relpath
+                )
 
+        self.assertEqual(file_content, content)
         mock_resolve.assert_called_with(url)
         mock_view_metadata.assert_called()
         mock_save.assert_called_with(
@@ -147,6 +176,21 @@ class SaveURLAsStaticFileTest(TestCase):
         finally:
             tmpdir.cleanup()
 
+    def test_relative_symlink_replace(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name in ["source1", "source2", "file"]:
+                with open(os.path.join(tmpdir, name), "wb") as f:
+                    f.write(name.encode())
+            utils.relative_symlink(tmpdir, "source1", "link")
+            # An existing symlink is replaced
+            utils.relative_symlink(tmpdir, "source2", "link")
+            self.assertEqual(
+                "source2", os.readlink(os.path.join(tmpdir, "link"))
+            )
+            # An existing file is not
+            with self.assertRaises(FileExistsError):
+                utils.relative_symlink(tmpdir, "source1", "file")
+
     def test_save_redirect(self):
         output_dir = "/OUTPUT_DIR"
         redirect_data = {
@@ -163,8 +207,9 @@ class SaveURLAsStaticFileTest(TestCase):
             with mock.patch(
                 "legal_tools.utils.save_bytes_to_file"
             ) as mock_save:
-                utils.save_redirect(output_dir, redirect_data)
+                content = utils.save_redirect(output_dir, redirect_data)
 
+        self.assertEqual("STRING", content)
         mock_render.assert_called_with(
             title="TITLE",
             destination="DESTINATION",
@@ -173,6 +218,547 @@ class SaveURLAsStaticFileTest(TestCase):
         mock_save.assert_called_with("STRING", "/OUTPUT_DIR/FILE_PATH")
 
 
+class OutputWriterTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.writer = utils.OutputWriter()
+
+    def tearDown(self):
+        utils.init_utils_writer(None)
+        self.tmpdir.cleanup()
+
+    def test_save_bytes_to_file(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyz", contents)
+        self.assertEqual(0o644, os.stat(filename).st_mode & 0o777)
+        self.assertEqual(["level2"], os.listdir(os.path.dirname(filename)))
+        self.assertEqual(1, self.writer.files_written)
+        self.assertEqual(6, self.writer.bytes_written)
+        self.assertEqual(0, self.writer.files_skipped)
+
+    def test_save_bytes_to_file_unchanged(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        inode = os.stat(filename).st_ino
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.assertEqual(inode, os.stat(filename).st_ino)
+        self.writer.save_bytes_to_file(b"abcxyZ", filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyZ", contents)
+        self.assertEqual(2, self.writer.files_written)
+        self.assertEqual(1, self.writer.files_skipped)
+        self.assertEqual(6, self.writer.bytes_skipped)
+        self.assertEqual(
+            "2 files written (12 bytes), 1 files unchanged (6 bytes)",
+            str(self.writer),
+        )
+
+    def test_save_bytes_to_file_replaces_symlink(self):
+        target = os.path.join(self.tmpdir.name, "target")
+        link = os.path.join(self.tmpdir.name, "link")
+        self.writer.save_bytes_to_file(b"abcxyz", target)
+        os.symlink("target", link)
+        self.writer.save_bytes_to_file(b"abcxyz", link)
+        self.assertFalse(os.path.islink(link))
+        self.assertEqual(2, self.writer.files_written)
+
+    def test_save_bytes_to_file_links_previous_build(self):
+        live_dir = os.path.join(self.tmpdir.name, "live")
+        staging_dir = os.path.join(self.tmpdir.name, "staging")
+        self.writer.save_bytes_to_file(b"abcxyz", f"{live_dir}/a/same")
+        self.writer.save_bytes_to_file(b"abcxyz", f"{live_dir}/a/changed")
+        previous_files = {
+            relpath: {
+                "sha256": hashlib.sha256(b"abcxyz").hexdigest(),
+                "size": 6,
+            }
+            for relpath in ["a/same", "a/changed", "a/missing"]
+        }
+        self.writer.reset()
+        self.writer.set_previous_build(staging_dir, live_dir, previous_files)
+        self.writer.save_bytes_to_file(b"abcxyz", f"{staging_dir}/a/same")
+        self.writer.save_bytes_to_file(b"abcxyZ", f"{staging_dir}/a/changed")
+        self.writer.save_bytes_to_file(b"abcxyz", f"{staging_dir}/a/missing")
+        self.assertTrue(
+            os.path.samefile(f"{live_dir}/a/same", f"{staging_dir}/a/same")
+        )
+        self.assertFalse(
+            os.path.samefile(
+                f"{live_dir}/a/changed", f"{staging_dir}/a/changed"
+            )
+        )
+        with open(f"{staging_dir}/a/changed", "rb") as f:
+            self.assertEqual(b"abcxyZ", f.read())
+        self.assertEqual(2, self.writer.files_written)
+        self.assertEqual(1, self.writer.files_skipped)
+        self.writer.clear_previous_build()
+        self.writer.save_bytes_to_file(b"abcxyz", f"{staging_dir}/b/same")
+        self.assertEqual(3, self.writer.files_written)
+
+    def test_save_lines_to_file_links_previous_build(self):
+        live_dir = os.path.join(self.tmpdir.name, "live")
+        staging_dir = os.path.join(self.tmpdir.name, "staging")
+        self.writer.save_lines_to_file(["abc", "xyz"], f"{live_dir}/a")
+        previous_files = {
+            "a": {
+                "sha256": hashlib.sha256(b"abc\nxyz").hexdigest(),
+                "size": 7,
+            }
+        }
+        self.writer.set_previous_build(staging_dir, live_dir, previous_files)
+        self.writer.save_lines_to_file(["abc", "xyz"], f"{staging_dir}/a")
+        self.assertTrue(os.path.samefile(f"{live_dir}/a", f"{staging_dir}/a"))
+        self.assertEqual(["a"], os.listdir(staging_dir))
+        self.assertEqual(1, self.writer.files_skipped)
+
+    def test_save_lines_to_file(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+
+        def lines():
+            yield "abc"
+            # Nothing is replaced before all of the lines are written
+            self.assertFalse(os.path.exists(filename))
+            yield "xyz"
+            yield ""
+
+        self.writer.save_lines_to_file(lines(), filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abc\nxyz\n", contents)
+        self.assertEqual(0o644, os.stat(filename).st_mode & 0o777)
+        self.assertEqual(
+            hashlib.sha256(b"abc\nxyz\n").hexdigest(),
+            self.writer.digests[filename],
+        )
+        inode = os.stat(filename).st_ino
+        self.writer.save_lines_to_file(["abc", "xyz", ""], filename)
+        self.assertEqual(inode, os.stat(filename).st_ino)
+        self.assertEqual(["level2"], os.listdir(os.path.dirname(filename)))
+        self.assertEqual(
+            "1 files written (8 bytes), 1 files unchanged (8 bytes)",
+            str(self.writer),
+        )
+
+    def test_save_chunks_to_file(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+
+        def chunks():
+            yield b"abc"
+            # Nothing is replaced before all of the chunks are written
+            self.assertFalse(os.path.exists(filename))
+            yield b""
+            yield b"xyz\n"
+
+        self.writer.save_chunks_to_file(chunks(), filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyz\n", contents)
+        self.assertEqual(
+            hashlib.sha256(b"abcxyz\n").hexdigest(),
+            self.writer.digests[filename],
+        )
+        self.assertEqual(1, self.writer.files_written)
+        self.assertEqual(7, self.writer.bytes_written)
+
+    def test_save_lines_to_file_error(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+
+        def lines():
+            yield "abc"
+            raise ValueError("error")
+
+        with self.assertRaises(ValueError):
+            self.writer.save_lines_to_file(lines(), filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyz", contents)
+        self.assertEqual(["level2"], os.listdir(os.path.dirname(filename)))
+
+    def test_makedirs_file_in_the_way(self):
+        dirname = os.path.join(self.tmpdir.name, "level1")
+        self.writer.save_bytes_to_file(b"abcxyz", dirname)
+        filename = os.path.join(dirname, "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.assertTrue(os.path.isdir(dirname))
+        self.assertIn(dirname, self.writer.directories)
+
+    def test_directory_removed_after_cached(self):
+        dirname = os.path.join(self.tmpdir.name, "level1")
+        filename = os.path.join(dirname, "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        os.remove(filename)
+        os.rmdir(dirname)
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.assertTrue(os.path.isfile(filename))
+        self.writer.forget_directories()
+        self.assertEqual(set(), self.writer.directories)
+
+    def test_copyfile(self):
+        src = os.path.join(self.tmpdir.name, "src")
+        dst = os.path.join(self.tmpdir.name, "a", "b", "dst")
+        with open(src, "wb") as f:
+            f.write(b"abcxyz")
+        self.writer.copyfile(src, dst)
+        with open(dst, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyz", contents)
+
+    def test_get_digests(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        other = os.path.join(f"{self.tmpdir.name}-other", "file")
+        self.writer.digests[other] = "xxx"
+        self.assertEqual(
+            {
+                os.path.join("level1", "level2"): hashlib.sha256(
+                    b"abcxyz"
+                ).hexdigest(),
+            },
+            self.writer.get_digests(self.tmpdir.name),
+        )
+
+    def test_reset(self):
+        filename = os.path.join(self.tmpdir.name, "level1")
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.writer.save_bytes_to_file(b"abcxyz", filename)
+        self.writer.reset()
+        self.assertEqual({}, self.writer.get_digests(self.tmpdir.name))
+        self.assertEqual(
+            "0 files written (0 bytes), 0 files unchanged (0 bytes)",
+            str(self.writer),
+        )
+
+    def test_init_utils_writer(self):
+        utils.init_utils_writer(self.writer)
+        filename = os.path.join(self.tmpdir.name, "level1")
+        utils.save_bytes_to_file(b"abcxyz", filename)
+        self.assertEqual(1, self.writer.files_written)
+        utils.init_utils_writer(None)
+        self.assertIsNone(utils.OUTPUT_WRITER)
+
+    def test_save_lines_to_file_without_writer(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        utils.save_lines_to_file(iter(["abc", "xyz"]), filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abc\nxyz", contents)
+
+    def test_save_chunks_to_file_without_writer(self):
+        filename = os.path.join(self.tmpdir.name, "level1", "level2")
+        utils.save_chunks_to_file(iter([b"abc", b"xyz"]), filename)
+        with open(filename, "rb") as f:
+            contents = f.read()
+        self.assertEqual(b"abcxyz", contents)
+
+
+class ExchangePathsTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir1 = os.path.join(self.tmpdir.name, "dir1")
+        self.dir2 = os.path.join(self.tmpdir.name, "dir2")
+        os.makedirs(self.dir1)
+        os.makedirs(self.dir2)
+        utils.save_bytes_to_file(b"111", os.path.join(self.dir1, "file1"))
+        utils.save_bytes_to_file(b"222", os.path.join(self.dir2, "file2"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_exchanged(self):
+        self.assertEqual(["file2"], os.listdir(self.dir1))
+        self.assertEqual(["file1"], os.listdir(self.dir2))
+        self.assertEqual(
+            sorted(["dir1", "dir2"]), sorted(os.listdir(self.tmpdir.name))
+        )
+
+    def test_exchange_paths(self):
+        utils.exchange_paths(self.dir1, self.dir2)
+        self.assert_exchanged()
+
+    def test_exchange_paths_fallback(self):
+        with mock.patch(
+            "legal_tools.utils._renameat2_exchange", return_value=False
+        ):
+            utils.exchange_paths(self.dir1, self.dir2)
+        self.assert_exchanged()
+
+    def test_exchange_paths_missing(self):
+        with self.assertRaises(OSError):
+            utils.exchange_paths(
+                self.dir1, os.path.join(self.tmpdir.name, "missing")
+            )
+
+
+class CompressBytesTest(TestCase):
+    def test_compress_bytes_gzip(self):
+        filebytes = b"abcxyz" * 100
+        compressed = utils.compress_bytes(filebytes, ".gz")
+        self.assertEqual(filebytes, gzip.decompress(compressed))
+        # Output does not vary with time
+        self.assertEqual(compressed, utils.compress_bytes(filebytes, ".gz"))
+
+    def test_compress_bytes_brotli_unavailable(self):
+        with mock.patch("legal_tools.utils.brotli", None):
+            with self.assertRaisesMessage(
+                ValueError, "The brotli module is required"
+            ):
+                utils.compress_bytes(b"abcxyz", ".br")
+
+    def test_compress_bytes_brotli(self):
+        mock_brotli = MagicMock()
+        mock_brotli.compress.return_value = b"xxx"
+        with mock.patch("legal_tools.utils.brotli", mock_brotli):
+            self.assertEqual(b"xxx", utils.compress_bytes(b"abcxyz", ".br"))
+        mock_brotli.compress.assert_called_with(b"abcxyz")
+
+    def test_compress_bytes_invalid(self):
+        with self.assertRaisesMessage(
+            ValueError, "Unsupported compression suffix: .zip"
+        ):
+            utils.compress_bytes(b"abcxyz", ".zip")
+
+
+def get_nginx_rewrite_redirects(redirect_pairs):
+    """
+    Reference: the sequential rewrite form of the language redirects that was
+    previously generated by the publish command.
+    """
+    redirect_pairs = sorted(redirect_pairs, key=lambda x: x[0], reverse=True)
+    return [
+        f"rewrite ^/{re.escape(redirect_relpath)} {relpath} permanent;"
+        for redirect_relpath, relpath in redirect_pairs
+    ]
+
+
+def resolve_nginx_rewrite_redirects(lines, uri):
+    for line in lines:
+        __, regex, replacement, __ = line.split()
+        if re.match(regex, uri):
+            return replacement
+    return None
+
+
+def resolve_nginx_variables(value, variables):
+    return re.sub(r"\$\w+", lambda match: variables[match.group()], value)
+
+
+def resolve_nginx_redirects_map(lines, uri):
+    """
+    Resolve the request URI like nginx does with the map blocks: the string
+    keys are lowercased (which fails with duplicates) and matched with the
+    lowercased source value, the regular expressions (~) are case-sensitive.
+    """
+    variables = {"$uri": uri}
+    for line in lines:
+        line = line.strip()
+        if line.startswith("map_hash"):
+            continue
+        elif line.startswith("map "):
+            source, target = line[4:-1].strip().rsplit(maxsplit=1)
+            source = source.strip('"')
+            default, exact, regexes = None, {}, []
+            continue
+        elif line == "}":
+            # Exact matches take precedence over regex matches, which take
+            # precedence over the default
+            value = resolve_nginx_variables(source, variables)
+            replacement = exact.get(value.lower())
+            if replacement is None:
+                for regex, regex_replacement in regexes:
+                    match = re.match(regex, value)
+                    if match:
+                        for name, group in match.groupdict().items():
+                            variables[f"${name}"] = group
+                        replacement = regex_replacement
+                        break
+            if replacement is None:
+                replacement = default
+            variables[target] = resolve_nginx_variables(replacement, variables)
+            continue
+        key, replacement = line.rstrip(";").split()
+        replacement = replacement.strip('"')
+        if key == "default":
+            default = replacement
+        elif key.startswith("~"):
+            regexes.append((key[1:].replace("(?<", "(?P<"), replacement))
+        else:
+            if key.lower() in exact:
+                raise ValueError(f"conflicting parameter {key}")
+            exact[key.lower()] = replacement
+    return variables[utils.NGINX_REDIRECT_VARIABLE] or None
+
+
+class NginxRedirectsMapTest(TestCase):
+    def setUp(self):
+        data = [
+            ("licenses", "by", "4.0", "", ["en", "es", "nl", "sr-latn"]),
+            ("licenses", "by-sa", "4.0", "", ["zh-hans", "zh-hant", "zh-hk"]),
+            ("licenses", "by-nc-sa", "3.0", "at", ["de-at"]),
+            ("licenses", "by", "3.0", "es", ["es", "oc-aranes", "eu"]),
+            ("licenses", "nc-sampling+", "1.0", "", ["en"]),
+            ("publicdomain", "zero", "1.0", "", ["en", "pt-br", "sr"]),
+        ]
+        for category, unit, version, jurisdiction, language_codes in data:
+            tool = ToolFactory(
+                category=category,
+                unit=unit,
+                version=version,
+                jurisdiction_code=jurisdiction,
+                canonical_url=utils.compute_canonical_url(
+                    category, unit, version, jurisdiction
+                ),
+            )
+            for language_code in language_codes:
+                LegalCodeFactory(tool=tool, language_code=language_code)
+        self.redirect_pairs = []
+        for legal_code in LegalCode.objects.all():
+            for document in ["deed", "legalcode"]:
+                self.redirect_pairs += legal_code.get_redirect_pairs(document)
+
+    def test_redirects_resolve_identically(self):
+        rewrite_lines = get_nginx_rewrite_redirects(self.redirect_pairs)
+        map_lines = list(utils.get_nginx_redirects_map(self.redirect_pairs))
+        self.assertGreater(len(self.redirect_pairs), 100)
+        for redirect_relpath, relpath in self.redirect_pairs:
+            for uri in [f"/{redirect_relpath}", f"/{redirect_relpath}.html"]:
+                with self.subTest(uri):
+                    self.assertEqual(
+                        resolve_nginx_rewrite_redirects(rewrite_lines, uri),
+                        resolve_nginx_redirects_map(map_lines, uri),
+                    )
+                    self.assertEqual(
+                        relpath,
+                        resolve_nginx_redirects_map(map_lines, uri),
+                    )
+
+    def test_destinations_do_not_redirect(self):
+        map_lines = list(utils.get_nginx_redirects_map(self.redirect_pairs))
+        for __, relpath in self.redirect_pairs:
+            for uri in [f"/{relpath}", f"/{relpath}.html"]:
+                with self.subTest(uri):
+                    self.assertIsNone(
+                        resolve_nginx_redirects_map(map_lines, uri)
+                    )
+
+    def test_get_nginx_redirects_map(self):
+        redirect_pairs = [
+            ["licenses/by/4.0/deed.EN", "licenses/by/4.0/deed.en"],
+            ["licenses/by/4.0/deed.EN", "licenses/by/4.0/deed.xx"],
+            ["licenses/by/4.0/deed.en-us", "licenses/by/4.0/deed.en"],
+        ]
+        self.assertEqual(
+            [
+                "map_hash_bucket_size 64;",
+                "map_hash_max_size 2048;",
+                "map $uri $cc_redirect_uri {",
+                "    default                     $uri;",
+                "    ~^(?<cc_redirect_prefix>/.+/(?:deed|legalcode)\\.[^./]+)"
+                "\\. $cc_redirect_prefix;",
+                "}",
+                "map $cc_redirect_uri $cc_redirect_destination {",
+                '    default                     "";',
+                "    /licenses/by/4.0/deed.en    licenses/by/4.0/deed.en;",
+                "    /licenses/by/4.0/deed.en-us licenses/by/4.0/deed.en;",
+                "    /licenses/by/4.0/deed.xx    licenses/by/4.0/deed.xx;",
+                "}",
+                'map "$cc_redirect_uri /$cc_redirect_destination"'
+                " $cc_redirect {",
+                "    default         $cc_redirect_destination;",
+                '    ~^(\\S+)\\s\\1$ "";',
+                "}",
+            ],
+            list(utils.get_nginx_redirects_map(redirect_pairs)),
+        )
+
+    def test_keys_differ_ignoring_case(self):
+        map_lines = list(utils.get_nginx_redirects_map(self.redirect_pairs))
+        keys = [
+            line.split()[0] for line in map_lines if line.startswith("    /")
+        ]
+        self.assertIn("/licenses/by-sa/4.0/deed.zh-hant", keys)
+        self.assertEqual(
+            len(keys), len({key.lower() for key in keys}), "conflicting keys"
+        )
+
+    def test_redirects_differing_only_by_case(self):
+        map_lines = list(utils.get_nginx_redirects_map(self.redirect_pairs))
+        for uri, relpath in [
+            ("/licenses/by/4.0/deed.EN", "licenses/by/4.0/deed.en"),
+            (
+                "/licenses/by/4.0/legalcode.EN.html",
+                "licenses/by/4.0/legalcode.en",
+            ),
+            (
+                "/licenses/by-sa/4.0/deed.zh-Hant",
+                "licenses/by-sa/4.0/deed.zh-hant",
+            ),
+            (
+                "/licenses/by-sa/4.0/deed.ZH-HANT",
+                "licenses/by-sa/4.0/deed.zh-hant",
+            ),
+            ("/licenses/by/4.0/deed.en", None),
+            ("/licenses/by/4.0/deed.en.html", None),
+            ("/licenses/by/4.0/", None),
+        ]:
+            with self.subTest(uri):
+                self.assertEqual(
+                    relpath, resolve_nginx_redirects_map(map_lines, uri)
+                )
+
+    def test_get_nginx_redirects_map_spilled(self):
+        with utils.RedirectPairsSpool(max_buffered=7) as spool:
+            for redirect_relpath, relpath in self.redirect_pairs:
+                spool.add([[redirect_relpath, relpath]])
+            self.assertGreater(len(spool.runs), 10)
+            self.assertEqual(
+                list(utils.get_nginx_redirects_map(self.redirect_pairs)),
+                list(utils.get_nginx_redirects_map(spool)),
+            )
+
+
+class RedirectPairsSpoolTest(TestCase):
+    def test_iter(self):
+        with utils.RedirectPairsSpool(max_buffered=3) as spool:
+            spool.add([["b", "x"], ["a", "x"]])
+            spool.add([["b", "y"], ["c", "z"], ["a", "y"]])
+            self.assertEqual(2, len(spool.runs))
+            self.assertEqual(
+                [
+                    ("a", "x"),
+                    ("b", "x"),
+                    ("c", "z"),
+                    ("x", "x"),
+                    ("y", "y"),
+                    ("z", "z"),
+                ],
+                list(spool),
+            )
+            # Can be iterated more than once
+            self.assertEqual(6, len(list(spool)))
+        self.assertEqual([], spool.runs)
+
+    def test_iter_not_spilled(self):
+        spool = utils.RedirectPairsSpool(max_buffered=None)
+        spool.add([["b", "x"], ["a", "x"]] * 10)
+        self.assertEqual([], spool.runs)
+        self.assertEqual([("a", "x"), ("b", "x"), ("x", "x")], list(spool))
+
+    def test_iter_ignoring_case(self):
+        with utils.RedirectPairsSpool(max_buffered=2) as spool:
+            spool.add([["b", "a"], ["A", "a"]])
+            spool.add([["B", "c"], ["C", "c"]])
+            self.assertEqual(
+                [("a", "a"), ("b", "a"), ("c", "c")],
+                list(spool),
+            )
+
+
 class ParseLegalcodeFilenameTest(TestCase):
     def test_parse_legal_code_filename(self):
         data = [
@@ -441,6 +1027,24 @@ class TestMisc(TestCase):
             utils.validate_dictionary_is_all_text({"a": {"b": "foo"}}),
         )
 
+    def test_get_extraction_cache_key(self):
+        html_file = "/legacy/legalcode/by_4.0.nl.html"
+        key = utils.get_extraction_cache_key(
+            "import_by_40_license_html", 1, html_file, "<html>"
+        )
+        self.assertEqual(
+            "extraction:import_by_40_license_html:1:by_4.0.nl.html:"
+            f"{hashlib.sha256(b'<html>').hexdigest()}",
+            key,
+        )
+        for args in [
+            ("import_by_40_license_html", 2, html_file, "<html>"),
+            ("import_by_40_license_html", 1, "by_4.0.de.html", "<html>"),
+            ("import_by_40_license_html", 1, html_file, "<html> "),
+        ]:
+            with self.subTest(args):
+                self.assertNotEqual(key, utils.get_extraction_cache_key(*args))
+
     def test_cleanup_current_branch_output(self):
         expected_list = ["some-branch", "another-branch", "main"]
         unmodified_list = ["some-branch", "* another-branch", "main"]
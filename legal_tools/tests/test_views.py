@@ -1,13 +1,24 @@
 # Standard library
-from unittest import mock
+import json
+from unittest import mock, skipUnless
 
 # Third-party
+import yaml
+from bs4 import BeautifulSoup
 from django.conf import settings
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from django.utils import timezone
+from django.utils import timezone, translation
 from django.utils.translation.trans_real import DjangoTranslation
 
+try:
+    # Third-party
+    import jinja2
+except ImportError:  # pragma: no cover
+    jinja2 = None
+
 # First-party/Local
 from legal_tools.models import UNITS_LICENSES, LegalCode, Tool, build_path
 from legal_tools.tests.factories import (
@@ -20,8 +31,16 @@ from legal_tools.views import (
     branch_status_helper,
     get_category_and_category_title,
     get_deed_rel_path,
+    get_language_table,
+    get_languages_and_links_for_deeds_ux,
+    get_languages_and_links_for_legal_codes,
     get_legal_code_rel_path,
+    init_views_list_cache,
+    iter_metadata_json,
+    iter_metadata_yaml,
+    iter_tools_metadata,
     normalize_path_and_lang,
+    prettify_html,
     render_redirect,
 )
 
@@ -338,6 +357,27 @@ class ViewListTest(ToolsTestsMixin, TestCase):
         self.assertEqual(404, rsp.status_code)
         self.assertTemplateUsed("list.html")
 
+    def test_view_list_cache(self):
+        urls = [
+            reverse(
+                "view_list_language_specified",
+                kwargs={"category": "licenses", "language_code": code},
+            )
+            for code in ["en", "nl"]
+        ]
+        init_views_list_cache({})
+        try:
+            rsp_en = self.client.get(urls[0])
+            # The list data is reused, not queried, for the other languages
+            with self.assertNumQueries(0):
+                rsp_nl = self.client.get(urls[1])
+        finally:
+            init_views_list_cache()
+        self.assertEqual(200, rsp_nl.status_code)
+        self.assertIs(rsp_en.context["tools"], rsp_nl.context["tools"])
+        with self.assertNumQueries(1):
+            self.client.get(urls[1])
+
     def test_view_list(self):
         url = reverse("view_list", kwargs={"category": "publicdomain"})
         rsp = self.client.get(url)
@@ -810,6 +850,118 @@ class ViewLegalCodeTest(TestCase):
         self.assertContains(rsp, "Sección 8 – Interpretación")
 
 
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite")
+class ViewQueryPlanTest(ToolsTestsMixin, TestCase):
+    # Tables that must never be read with a full table scan when serving a
+    # single deed or legal code page
+    indexed_tables = ["legal_tools_legalcode", "legal_tools_tool"]
+
+    def get_full_scans(self, url):
+        with CaptureQueriesContext(connection) as context:
+            rsp = self.client.get(url)
+        self.assertEqual(200, rsp.status_code)
+        full_scans = []
+        for query in context.captured_queries:
+            if not query["sql"].startswith("SELECT"):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for detail in plan:
+                # "SCAN <table>" (SQLite < 3.36: "SCAN TABLE <table>")
+                # without "USING ... INDEX" reads every row of the table
+                words = detail.replace(" TABLE ", " ").split()
+                if (
+                    words[0] == "SCAN"
+                    and words[1] in self.indexed_tables
+                    and "INDEX" not in words
+                ):
+                    full_scans.append(f"{detail}: {query['sql']}")
+        return full_scans
+
+    def test_view_deed_uses_indexes(self):
+        for url in [
+            "/licenses/by/4.0/deed.en",
+            "/licenses/by-sa/3.0/es/deed.es",
+        ]:
+            with self.subTest(url):
+                self.assertEqual([], self.get_full_scans(url))
+
+    def test_view_legal_code_uses_indexes(self):
+        for url in [
+            "/licenses/by/4.0/legalcode.en",
+            "/licenses/by-sa/3.0/es/legalcode.es",
+        ]:
+            with self.subTest(url):
+                self.assertEqual([], self.get_full_scans(url))
+
+
+@skipUnless(jinja2, "requires the jinja2 module")
+@override_settings(LANGUAGES_MOSTLY_TRANSLATED=["ar", "en", "nl"])
+class Jinja2TemplatesTest(ToolsTestsMixin, TestCase):
+    # The Jinja2 templates must render the same bytes as the Django templates
+
+    def setUp(self):
+        super().setUp()
+        Tool.objects.filter(unit="by", version="2.0").update(
+            deprecated_on=timezone.datetime(2020, 6, 1).date()
+        )
+        LegalCode.objects.filter(tool=self.by_sa_20_es).update(
+            html="<p>Reconocimiento-CompartirIgual 2.0 Espa\u00f1a</p>",
+            translation_last_update=timezone.now(),
+        )
+
+    def get_content(self, url, engine):
+        with override_settings(PUBLIC_TEMPLATE_ENGINE=engine):
+            rsp = self.client.get(url)
+        self.assertEqual(200, rsp.status_code)
+        return rsp.content
+
+    def assert_same_content(self, urls):
+        for url in urls:
+            with self.subTest(url):
+                self.assertEqual(
+                    self.get_content(url, "django"),
+                    self.get_content(url, "jinja2"),
+                )
+
+    def test_deeds(self):
+        urls = [
+            legal_code.deed_url.replace(".en", f".{language_code}")
+            for legal_code in LegalCode.objects.filter(language_code="en")
+            for language_code in ("en", "nl", "ar")
+        ]
+        self.assert_same_content(urls)
+
+    def test_legal_codes(self):
+        urls = [
+            legal_code.legal_code_url for legal_code in LegalCode.objects.all()
+        ]
+        self.assert_same_content(urls)
+
+    def test_lists(self):
+        urls = [
+            reverse(
+                "view_list_language_specified",
+                kwargs={"category": category, "language_code": language_code},
+            )
+            for category in ("licenses", "publicdomain")
+            for language_code in ("en", "nl", "ar")
+        ]
+        self.assert_same_content(urls)
+
+    def test_redirects(self):
+        for language_code in ("en", "nl", "ar"):
+            with self.subTest(language_code):
+                rendered = {}
+                for engine in ("django", "jinja2"):
+                    with override_settings(PUBLIC_TEMPLATE_ENGINE=engine):
+                        rendered[engine] = render_redirect(
+                            "TITLE", "DESTINATION", language_code
+                        )
+                self.assertEqual(rendered["django"], rendered["jinja2"])
+
+
 class ViewBranchStatusTest(TestCase):
     def setUp(self):
         self.translation_branch = TranslationBranchFactory(
@@ -991,12 +1143,170 @@ class ViewMetadataTest(TestCase):
         with mock.patch.object(Tool, "get_metadata") as mock_get_metadata:
             mock_get_metadata.return_value = {"foo": "bar"}
             rsp = self.client.get(reverse("metadata"))
-        self.assertEqual(200, rsp.status_code)
+            self.assertEqual(200, rsp.status_code)
+            # The metadata is built as the response is streamed
+            mock_get_metadata.assert_not_called()
+            content = b"".join(rsp.streaming_content)
         mock_get_metadata.assert_called_with()
         self.assertEqual(
-            b"licenses:\n- by_11: &id001\n    foo: bar\n"
-            b"publicdomain:\n- zero_11: *id001\n",
-            rsp.content,
+            b"licenses:\n- by_11:\n    foo: bar\n"
+            b"publicdomain:\n- zero_11:\n    foo: bar\n",
+            content,
+        )
+
+    def test_view_metadata_json(self):
+        ToolFactory(category="licenses", unit="by", version="1.1")
+        with mock.patch.object(Tool, "get_metadata") as mock_get_metadata:
+            mock_get_metadata.return_value = {"foo": "bar"}
+            rsp = self.client.get(reverse("metadata_json"))
+            content = b"".join(rsp.streaming_content)
+        self.assertEqual(200, rsp.status_code)
+        self.assertEqual("application/json", rsp["Content-Type"])
+        self.assertEqual(
+            {"licenses": [{"by_11": {"foo": "bar"}}], "publicdomain": []},
+            json.loads(content),
+        )
+
+    def test_view_metadata_same_as_single_document(self):
+        for category, unit, version in [
+            ("licenses", "by", "4.0"),
+            ("licenses", "by-sa", "4.0"),
+            ("licenses", "by", "3.0"),
+            ("publicdomain", "zero", "1.0"),
+        ]:
+            tool = ToolFactory(
+                category=category,
+                unit=unit,
+                version=version,
+                deprecated_on="2011-09-12",
+            )
+            for language_code in ["de", "en", "ja"]:
+                LegalCodeFactory(tool=tool, language_code=language_code)
+        data = {"licenses": [], "publicdomain": []}
+        for category, tool_metadata in iter_tools_metadata():
+            data[category].append(tool_metadata)
+        self.assertEqual(3, len(data["licenses"]))
+        self.assertEqual(
+            yaml.dump(
+                data,
+                default_flow_style=False,
+                encoding="utf-8",
+                allow_unicode=True,
+            ),
+            b"".join(iter_metadata_yaml(iter_tools_metadata())),
+        )
+        self.assertEqual(
+            json.dumps(
+                data,
+                ensure_ascii=False,
+                indent=2,
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+            + b"\n",
+            b"".join(iter_metadata_json(iter_tools_metadata())),
+        )
+
+    def test_metadata_without_tools(self):
+        self.assertEqual(
+            b"licenses: []\npublicdomain: []\n",
+            b"".join(iter_metadata_yaml(iter([]))),
+        )
+        self.assertEqual(
+            b'{\n  "licenses": [],\n  "publicdomain": []\n}\n',
+            b"".join(iter_metadata_json(iter([]))),
+        )
+
+    def test_metadata_unknown_category(self):
+        tools_metadata = iter([("licenses", {"by_40": {}}), ("x", {})])
+        with self.assertRaises(ValueError):
+            b"".join(iter_metadata_json(tools_metadata))
+
+    def test_iter_tools_metadata_queries(self):
+        for version in ["1.0", "2.0", "3.0", "4.0"]:
+            tool = ToolFactory(category="licenses", unit="by", version=version)
+            for language_code in ["en", "nl"]:
+                LegalCodeFactory(tool=tool, language_code=language_code)
+        LegalCodeFactory(
+            tool__category="publicdomain",
+            tool__unit="zero",
+            tool__version="1.0",
+            language_code="en",
+        )
+        tools_metadata = iter_tools_metadata()
+        with self.assertNumQueries(2):
+            first = next(tools_metadata)
+        self.assertEqual("licenses", first[0])
+        with self.assertNumQueries(0):
+            categories = [category for category, __ in tools_metadata]
+        self.assertEqual(["licenses"] * 3 + ["publicdomain"], categories)
+
+
+class LanguageTableTest(TestCase):
+    def setUp(self):
+        get_language_table.cache_clear()
+
+    def test_get_language_table(self):
+        self.assertEqual(
+            (
+                ("de", "Deutsch", "deutsch"),
+                ("en", "English", "english"),
+                ("nl", "Nederlands", "nederlands"),
+            ),
+            get_language_table(("nl", "en", "de")),
+        )
+
+    @override_settings(LANGUAGES_MOSTLY_TRANSLATED=["nl", "en", "de"])
+    def test_languages_and_links_for_deeds_ux_cached(self):
+        with mock.patch(
+            "legal_tools.views.translation.get_language_info",
+            wraps=translation.get_language_info,
+        ) as mock_get_language_info:
+            for selected_language_code in ["de", "en", "nl"]:
+                languages_and_links = get_languages_and_links_for_deeds_ux(
+                    f"/licenses/by/4.0/deed.{selected_language_code}",
+                    selected_language_code,
+                )
+        # The language information is only looked up for the first page
+        self.assertEqual(3, mock_get_language_info.call_count)
+        self.assertEqual(
+            [
+                ("de", "/licenses/by/4.0/deed.de", False),
+                ("en", "/licenses/by/4.0/deed.en", False),
+                ("nl", "/licenses/by/4.0/deed.nl", True),
+            ],
+            [
+                (item["cc_language_code"], item["link"], item["selected"])
+                for item in languages_and_links
+            ],
+        )
+
+    def test_languages_and_links_for_legal_codes(self):
+        tool = ToolFactory(
+            canonical_url="https://creativecommons.org/licenses/by/4.0/"
+        )
+        for language_code in ["en", "nl", "de"]:
+            LegalCodeFactory(tool=tool, language_code=language_code)
+        languages_and_links = get_languages_and_links_for_legal_codes(
+            "/licenses/by/4.0",
+            tool.legal_codes.all(),
+            "en",
+        )
+        self.assertEqual(
+            [
+                ("de", "Deutsch", "legalcode.de", False),
+                ("en", "English", "legalcode.en", True),
+                ("nl", "Nederlands", "legalcode.nl", False),
+            ],
+            [
+                (
+                    item["cc_language_code"],
+                    item["name_local"],
+                    item["link"],
+                    item["selected"],
+                )
+                for item in languages_and_links
+            ],
         )
 
 
@@ -1008,6 +1318,24 @@ class ViewPageNotFoundTest(TestCase):
         self.assertEqual(rsp.status_code, 404)
 
 
+class PrettifyHtmlTest(TestCase):
+    def test_prettify_html(self):
+        content = (
+            '<html><head><meta charset="utf-8"></head><body><p>Licència'
+            " <a href='/a?b=1&amp;c=2'>link</a></p></body></html>"
+        )
+        with mock.patch(
+            "legal_tools.views.BeautifulSoup.decompose", autospec=True
+        ) as decompose:
+            prettified = prettify_html(content.encode("utf-8"))
+        self.assertEqual(
+            BeautifulSoup(content, features="lxml").prettify(),
+            prettified.decode("utf-8"),
+        )
+        decompose.assert_called_once()
+        self.assertEqual(prettified, prettify_html(content))
+
+
 class RenderRedirect(TestCase):
     def test_render_redirect_en_ltr(self):
         destination = "DESTINATION"
@@ -0,0 +1,108 @@
+# Standard library
+import os
+import tempfile
+from unittest import mock
+
+# Third-party
+from django.test import TestCase
+
+# First-party/Local
+from legal_tools import watch
+
+
+def write_file(path, content="content"):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class WatcherTestMixin:
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.dir = self.tmpdir.name
+        write_file(os.path.join(self.dir, "existing.html"))
+
+    def get_watcher(self):
+        raise NotImplementedError()
+
+    def test_wait(self):
+        watcher = self.get_watcher()
+        self.addCleanup(watcher.close)
+        self.assertEqual(set(), watcher.wait(0))
+
+        changed = os.path.join(self.dir, "existing.html")
+        write_file(changed, "changed content")
+        created = os.path.join(self.dir, "subdir", "created.po")
+        os.makedirs(os.path.dirname(created))
+        write_file(created)
+        paths = set()
+        for __ in range(10):
+            paths |= watcher.wait(1)
+            if {changed, created} <= paths:
+                break
+        self.assertEqual({changed, created}, paths)
+
+        # The new subdirectory is watched
+        write_file(created, "changed content")
+        self.assertEqual({created}, watcher.wait(1))
+
+
+class InotifyWatcherTest(WatcherTestMixin, TestCase):
+    def get_watcher(self):
+        try:
+            return watch.InotifyWatcher([self.dir])
+        except (AttributeError, OSError) as e:  # pragma: no cover
+            self.skipTest(f"inotify is not available ({e})")
+
+
+class PollingWatcherTest(WatcherTestMixin, TestCase):
+    def get_watcher(self):
+        return watch.PollingWatcher([self.dir], interval=0.01)
+
+    def test_get_watcher_fallback(self):
+        with mock.patch.object(
+            watch, "InotifyWatcher", side_effect=OSError("not supported")
+        ):
+            with self.assertLogs(watch.LOG, "INFO"):
+                watcher = watch.get_watcher([self.dir])
+        self.assertIsInstance(watcher, watch.PollingWatcher)
+        self.assertIsInstance(
+            watch.get_watcher([self.dir], polling=True), watch.PollingWatcher
+        )
+
+
+class WaitForChangesTest(TestCase):
+    def test_is_ignored(self):
+        for path, ignored in [
+            ("/templates/deed.html", False),
+            ("/locale/nl/LC_MESSAGES/django.po", False),
+            ("/templates/.deed.html.swp", True),
+            ("/templates/deed.html~", True),
+            ("/templates/#deed.html#", True),
+            ("/locale/nl/LC_MESSAGES/.django.mo.123.tmp", True),
+        ]:
+            with self.subTest(path):
+                self.assertEqual(ignored, watch.is_ignored(path))
+
+    def test_debounce(self):
+        watcher = mock.Mock()
+        watcher.wait.side_effect = [
+            {"/a.html"},
+            {"/b.html", "/.b.html.swp"},
+            set(),
+            {"/c.html"},
+        ]
+        self.assertEqual(
+            {"/a.html", "/b.html"},
+            watch.wait_for_changes(watcher, debounce=0.01, max_delay=10),
+        )
+        self.assertEqual(3, watcher.wait.call_count)
+
+    def test_max_delay(self):
+        watcher = mock.Mock()
+        watcher.wait.return_value = {"/a.html"}
+        self.assertEqual(
+            {"/a.html"},
+            watch.wait_for_changes(watcher, debounce=0.01, max_delay=0),
+        )
+        self.assertEqual(1, watcher.wait.call_count)
@@ -166,6 +166,12 @@ urlpatterns = [
         view_metadata,
         name="metadata",
     ),
+    path(
+        "licenses/metadata.json",
+        view_metadata,
+        kwargs=dict(output_format="json"),
+        name="metadata_json",
+    ),
     # LIST PAGES ##############################################################
     # List: with language
     path(
@@ -1,7 +1,15 @@
 # Standard library
+import ctypes
+import errno
+import gzip
+import hashlib
+import heapq
+import json
 import logging
 import os
 import posixpath
+import stat
+import tempfile
 
 # Third-party
 from bs4 import NavigableString
@@ -16,7 +24,22 @@ from i18n.utils import (
 )
 from legal_tools.views import render_redirect
 
+try:
+    # Third-party
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
 LOG = logging.getLogger(__name__)
+OUTPUT_WRITER = None
+RENDERER = None
+# https://man7.org/linux/man-pages/man2/rename.2.html
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+# nginx variable set to the redirect destination by the language redirects map
+NGINX_REDIRECT_VARIABLE = "$cc_redirect"
+# Size of the chunks in which files are read to compute their digests
+FILE_CHUNK_SIZE = 1024 * 1024
 
 
 def init_utils_logger(logger: logging.Logger = None):
@@ -27,7 +50,277 @@ def init_utils_logger(logger: logging.Logger = None):
         LOG = logger
 
 
+def init_utils_writer(writer=None):
+    global OUTPUT_WRITER
+    OUTPUT_WRITER = writer
+
+
+def init_utils_renderer(renderer=None):
+    """
+    Set the renderer (ex. a render daemon client) that get_url_content() uses
+    instead of rendering the URLs in this process.
+    """
+    global RENDERER
+    RENDERER = renderer
+
+
+class OutputWriter:
+    """
+    Writes the output files of a publish run.
+
+    - directories that have already been created are remembered, so each
+      directory is only checked/created once per run
+    - files are written to a temporary file in the destination directory and
+      then renamed into place, so readers never see a partially written file
+    - files whose content is identical to the content already on disk are
+      left untouched
+    - files whose content is identical to the same file of the previous
+      build (see ``set_previous_build``) are hard-linked from it
+    - the sha256 digest of every file is recorded (see ``digests``)
+    """
+
+    def __init__(self):
+        self.directories = set()
+        self.digests = {}
+        self.previous_build = None
+        self.files_written = 0
+        self.files_skipped = 0
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+
+    def __str__(self):
+        return (
+            f"{self.files_written} files written ({self.bytes_written}"
+            f" bytes), {self.files_skipped} files unchanged"
+            f" ({self.bytes_skipped} bytes)"
+        )
+
+    def forget_directories(self):
+        """
+        Clear the cache of created directories (ex. after purging the output
+        directory).
+        """
+        self.directories.clear()
+
+    def reset(self):
+        """
+        Clear the recorded digests and counts (ex. before another run into the
+        same output directory).
+        """
+        self.digests.clear()
+        self.files_written = 0
+        self.files_skipped = 0
+        self.bytes_written = 0
+        self.bytes_skipped = 0
+
+    def set_previous_build(self, output_dir, previous_dir, previous_files):
+        """
+        Hard-link the files written under output_dir (ex. a staging
+        directory) from previous_dir when they are unchanged, per the files
+        of the manifest of the previous build (their size and sha256 digest).
+        The files of the previous build must not be modified in place (they
+        are only ever replaced).
+        """
+        self.previous_build = (output_dir, previous_dir, previous_files)
+
+    def clear_previous_build(self):
+        self.previous_build = None
+
+    def link_previous(self, size, digest, output_filename):
+        """
+        Hard-link the file of the previous build if it has the same content
+        and return True, or return False.
+        """
+        if self.previous_build is None:
+            return False
+        output_dir, previous_dir, previous_files = self.previous_build
+        if not output_filename.startswith(os.path.join(output_dir, "")):
+            return False
+        relpath = os.path.relpath(output_filename, output_dir)
+        previous = previous_files.get(relpath, {})
+        if previous.get("sha256") != digest or previous.get("size") != size:
+            return False
+        previous_filename = os.path.join(previous_dir, relpath)
+        try:
+            file_stat = os.lstat(previous_filename)
+        except FileNotFoundError:
+            return False
+        if not stat.S_ISREG(file_stat.st_mode) or file_stat.st_size != size:
+            return False
+        if os.path.lexists(output_filename):
+            return False
+        try:
+            os.link(previous_filename, output_filename)
+        except OSError:
+            # Ex. a file system without hard links
+            return False
+        return True
+
+    def makedirs(self, dirname):
+        if dirname in self.directories:
+            return
+        if os.path.isfile(dirname):
+            os.remove(dirname)
+        os.makedirs(dirname, mode=0o755, exist_ok=True)
+        self.directories.add(dirname)
+
+    def is_unchanged(self, size, digest, output_filename):
+        try:
+            file_stat = os.lstat(output_filename)
+        except FileNotFoundError:
+            return False
+        if not stat.S_ISREG(file_stat.st_mode):
+            return False
+        if file_stat.st_size != size:
+            return False
+        return get_file_digest(output_filename) == digest
+
+    def get_digests(self, output_dir):
+        """
+        Return a dictionary of the sha256 digests of the files written under
+        output_dir, keyed by path relative to output_dir.
+        """
+        prefix = os.path.join(output_dir, "")
+        return {
+            os.path.relpath(output_filename, output_dir): digest
+            for output_filename, digest in self.digests.items()
+            if output_filename.startswith(prefix)
+        }
+
+    def mkstemp(self, dirname):
+        self.makedirs(dirname)
+        try:
+            return tempfile.mkstemp(dir=dirname, prefix=".", suffix=".tmp")
+        except FileNotFoundError:
+            # The directory was removed after it was cached
+            self.directories.discard(dirname)
+            self.makedirs(dirname)
+            return tempfile.mkstemp(dir=dirname, prefix=".", suffix=".tmp")
+
+    def replace(self, temp_filename, output_filename, size):
+        os.chmod(temp_filename, 0o644)
+        os.replace(temp_filename, output_filename)
+        self.files_written += 1
+        self.bytes_written += size
+
+    def skip(self, size):
+        self.files_skipped += 1
+        self.bytes_skipped += size
+
+    def save_bytes_to_file(self, filebytes, output_filename):
+        dirname = os.path.dirname(output_filename)
+        self.makedirs(dirname)
+        digest = hashlib.sha256(filebytes).hexdigest()
+        self.digests[output_filename] = digest
+        if self.is_unchanged(
+            len(filebytes), digest, output_filename
+        ) or self.link_previous(len(filebytes), digest, output_filename):
+            self.skip(len(filebytes))
+            return
+        fd, temp_filename = self.mkstemp(dirname)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(filebytes)
+            self.replace(temp_filename, output_filename, len(filebytes))
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+
+    def save_chunks_to_file(self, chunks, output_filename):
+        """
+        Save the chunks (bytes) as they are produced, so that the content of
+        large files is never held in memory.
+        """
+        fd, temp_filename = self.mkstemp(os.path.dirname(output_filename))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                digest, size = write_chunks(f, chunks)
+            self.digests[output_filename] = digest
+            if self.is_unchanged(
+                size, digest, output_filename
+            ) or self.link_previous(size, digest, output_filename):
+                os.remove(temp_filename)
+                self.skip(size)
+                return
+            self.replace(temp_filename, output_filename, size)
+        except BaseException:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+
+    def save_lines_to_file(self, lines, output_filename):
+        """
+        Save the lines (strings, joined with newlines) as they are produced.
+        """
+        self.save_chunks_to_file(iter_line_chunks(lines), output_filename)
+
+    def copyfile(self, src, dst):
+        with open(src, "rb") as f:
+            self.save_bytes_to_file(f.read(), dst)
+
+
+def get_file_digest(filename):
+    """
+    Return the sha256 digest of the file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(FILE_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_line_chunks(lines):
+    """
+    Yield the lines (strings), joined with newlines, as UTF-8 chunks.
+    """
+    for index, line in enumerate(lines):
+        chunk = f"\n{line}" if index else line
+        yield chunk.encode("utf-8")
+
+
+def write_chunks(f, chunks):
+    """
+    Write the chunks (bytes) to the binary file f and return the sha256
+    digest and the size of what was written.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in chunks:
+        f.write(chunk)
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def save_chunks_to_file(chunks, output_filename):
+    """
+    Save the chunks (bytes) as they are produced (see
+    OutputWriter.save_chunks_to_file).
+    """
+    if OUTPUT_WRITER is not None:
+        OUTPUT_WRITER.save_chunks_to_file(chunks, output_filename)
+        return
+    dirname = os.path.dirname(output_filename)
+    if os.path.isfile(dirname):
+        os.remove(dirname)
+    os.makedirs(dirname, mode=0o755, exist_ok=True)
+    with open(output_filename, "w+b") as f:
+        write_chunks(f, chunks)
+
+
+def save_lines_to_file(lines, output_filename):
+    """
+    Save the lines (strings, joined with newlines) as they are produced (see
+    OutputWriter.save_lines_to_file).
+    """
+    save_chunks_to_file(iter_line_chunks(lines), output_filename)
+
+
 def save_bytes_to_file(filebytes, output_filename):
+    if OUTPUT_WRITER is not None:
+        OUTPUT_WRITER.save_bytes_to_file(filebytes, output_filename)
+        return
     dirname = os.path.dirname(output_filename)
     if os.path.isfile(dirname):
         os.remove(dirname)
@@ -36,6 +329,69 @@ def save_bytes_to_file(filebytes, output_filename):
         f.write(filebytes)
 
 
+def _renameat2_exchange(path1, path2):
+    """
+    Atomically exchange path1 and path2 using the Linux renameat2() system
+    call. Returns False if renameat2() or RENAME_EXCHANGE is not supported.
+    """
+    try:
+        renameat2 = ctypes.CDLL(None, use_errno=True).renameat2
+    except (AttributeError, OSError):
+        return False
+    renameat2.argtypes = [
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.c_char_p,
+        ctypes.c_uint,
+    ]
+    result = renameat2(
+        AT_FDCWD,
+        os.fsencode(path1),
+        AT_FDCWD,
+        os.fsencode(path2),
+        RENAME_EXCHANGE,
+    )
+    if result == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS):
+        return False
+    raise OSError(error, os.strerror(error), path1, None, path2)
+
+
+def exchange_paths(path1, path2):
+    """
+    Exchange two existing paths (ex. a freshly built staging directory and the
+    live output directory) so that each ends up where the other was.
+
+    The exchange is atomic where the platform supports it. Otherwise it falls
+    back to three renames (readers may briefly see path2 missing).
+    """
+    if _renameat2_exchange(path1, path2):
+        return
+    temp_path = f"{path2}.{os.getpid()}.exchange"
+    os.rename(path2, temp_path)
+    os.rename(path1, path2)
+    os.rename(temp_path, path1)
+
+
+def compress_bytes(filebytes, suffix):
+    """
+    Return filebytes compressed for the given file suffix (".gz" or ".br").
+
+    The gzip output does not include a timestamp, so unchanged content always
+    results in identical compressed content.
+    """
+    if suffix == ".gz":
+        return gzip.compress(filebytes, compresslevel=9, mtime=0)
+    elif suffix == ".br":
+        if brotli is None:
+            raise ValueError("The brotli module is required for .br files")
+        return brotli.compress(filebytes)
+    raise ValueError(f"Unsupported compression suffix: {suffix}")
+
+
 class MockRequest:
     method = "GET"
     META = {}
@@ -45,24 +401,44 @@ class MockRequest:
         self.path = path
 
 
-def save_url_as_static_file(output_dir, url, relpath):
+def get_url_content(url):
     """
-    Get the output from the URL and save it in an appropriate file
-    under output_dir. For making static files from a site.
+    Return the content (bytes) of the response of the view for the URL.
+    """
+    if RENDERER is not None:
+        return RENDERER.get_url_content(url)
+    return render_url(url)
+
 
-    Pass in open_func just for testing, not in regular use.
+def render_url(url):
+    """
+    Render the URL in this process and return the content (bytes) of the
+    response of its view.
     """
     # Was using test Client, but it runs middleware and fails at runtime
     # because the request host wasn't in the ALLOWED_HOSTS. So, resolve the URL
     # and call the view directly.
-    LOG.debug(f"    {relpath}")
     resolver = get_resolver()
     match = resolver.resolve(url)  # ResolverMatch
     rsp = match.func(request=MockRequest(url), *match.args, **match.kwargs)
     if rsp.status_code != 200:
         raise ValueError(f"ERROR: Status {rsp.status_code} for url {url}")
+    if getattr(rsp, "streaming", False):
+        return b"".join(rsp.streaming_content)
+    return rsp.content
+
+
+def save_url_as_static_file(output_dir, url, relpath):
+    """
+    Get the output from the URL and save it in an appropriate file
+    under output_dir. For making static files from a site. Return the
+    content.
+    """
+    LOG.debug(f"    {relpath}")
     output_filename = os.path.join(output_dir, relpath)
-    save_bytes_to_file(rsp.content, output_filename)
+    content = get_url_content(url)
+    save_bytes_to_file(content, output_filename)
+    return content
 
 
 def relative_symlink(src1, src2, dst):
@@ -77,13 +453,25 @@ def relative_symlink(src1, src2, dst):
         padding = padding[:-3]
     dir_fd = os.open(dir_path, os.O_RDONLY)
     try:
-        os.symlink(src_file, dst, dir_fd=dir_fd)
+        try:
+            os.symlink(src_file, dst, dir_fd=dir_fd)
+        except FileExistsError:
+            # Replace a symlink of a previous build (ex. targeted publish
+            # writes into the existing output directory)
+            if not stat.S_ISLNK(os.lstat(dst, dir_fd=dir_fd).st_mode):
+                raise
+            os.unlink(dst, dir_fd=dir_fd)
+            os.symlink(src_file, dst, dir_fd=dir_fd)
         LOG.debug(f"    {padding}^{dst}")
     finally:
         os.close(dir_fd)
 
 
 def save_redirect(output_dir, redirect_data):
+    """
+    Render the redirect page and save it under output_dir. Return the
+    content.
+    """
     relpath = redirect_data["redirect_file"]
     content = render_redirect(
         title=redirect_data["title"],
@@ -95,6 +483,147 @@ def save_redirect(output_dir, redirect_data):
     LOG.debug(f"{padding}*{filename}")
     output_filename = os.path.join(output_dir, relpath)
     save_bytes_to_file(content, output_filename)
+    return content
+
+
+class RedirectPairsSpool:
+    """
+    Collects the redirect pairs (see LegalCode.get_redirect_pairs) of a
+    publish run. Up to max_buffered pairs are kept in memory; beyond that, they
+    are spilled to sorted runs in temporary files (max_buffered=None: never).
+
+    Iterating yields the unique redirect pairs sorted by redirect path,
+    ignoring case (like nginx map string keys, redirect paths that differ only
+    by case are the same: the first one added is used). The destinations are
+    included as pairs redirecting to themselves, which take precedence over
+    the redirects that differ from them only by case.
+    """
+
+    def __init__(self, max_buffered=10000):
+        self.max_buffered = max_buffered
+        self.count = 0
+        self.buffer = []
+        self.runs = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, redirect_pairs):
+        destinations = []
+        for redirect_relpath, relpath in redirect_pairs:
+            if relpath not in destinations:
+                destinations.append(relpath)
+                self.append(relpath, relpath, destination=True)
+            self.append(redirect_relpath, relpath)
+
+    def append(self, redirect_relpath, relpath, destination=False):
+        # Destinations sort before the redirects that differ only by case and
+        # the count orders the other duplicate redirects by when they were
+        # added
+        self.buffer.append(
+            (
+                redirect_relpath.lower(),
+                0 if destination else 1,
+                self.count,
+                redirect_relpath,
+                relpath,
+            )
+        )
+        self.count += 1
+        if (
+            self.max_buffered is not None
+            and len(self.buffer) >= self.max_buffered
+        ):
+            self.spill()
+
+    def spill(self):
+        run = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+        for item in sorted(self.buffer):
+            run.write(f"{json.dumps(item)}\n")
+        self.runs.append(run)
+        self.buffer = []
+
+    @staticmethod
+    def read_run(run):
+        run.seek(0)
+        for line in run:
+            yield tuple(json.loads(line))
+
+    def __iter__(self):
+        runs = [self.read_run(run) for run in self.runs]
+        previous = None
+        for key, __, __, redirect_relpath, relpath in heapq.merge(
+            sorted(self.buffer), *runs
+        ):
+            if key != previous:
+                yield redirect_relpath, relpath
+            previous = key
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+        self.buffer = []
+
+
+def get_nginx_redirects_map(redirect_pairs):
+    """
+    Given redirect pairs (a list, see LegalCode.get_redirect_pairs, or a
+    RedirectPairsSpool), yield the lines of the nginx map blocks (http
+    context) that set $cc_redirect to the redirect destination for the request
+    URI (or to an empty string).
+
+    Exact matches are resolved by a hash lookup. A request URI with a suffix
+    after the redirect language code (ex. deed.de-AT.html) is looked up
+    without the suffix.
+
+    nginx matches the map string keys ignoring case, so the destinations are
+    keys too (ex. deed.EN matches deed.en): a request URI that is exactly its
+    destination (compared with a case-sensitive regular expression) is not
+    redirected.
+    """
+    # When there are duplicate redirects, the first one is used
+    if not isinstance(redirect_pairs, RedirectPairsSpool):
+        spool = RedirectPairsSpool(max_buffered=None)
+        spool.add(redirect_pairs)
+        redirect_pairs = spool
+    redirects = 0
+    key_width = len("default")
+    for redirect_relpath, __ in redirect_pairs:
+        redirects += 1
+        key_width = max(key_width, len(redirect_relpath) + 1)
+    hash_max_size = 2048
+    while hash_max_size < redirects:
+        hash_max_size *= 2
+    hash_bucket_size = 64
+    while hash_bucket_size < key_width + 32:
+        hash_bucket_size *= 2
+
+    yield from [
+        f"map_hash_bucket_size {hash_bucket_size};",
+        f"map_hash_max_size {hash_max_size};",
+        "map $uri $cc_redirect_uri {",
+        f"    {'default'.ljust(key_width)} $uri;",
+        "    ~^(?<cc_redirect_prefix>/.+/(?:deed|legalcode)\\.[^./]+)\\."
+        " $cc_redirect_prefix;",
+        "}",
+        "map $cc_redirect_uri $cc_redirect_destination {",
+        f"    {'default'.ljust(key_width)} \"\";",
+    ]
+    for redirect_relpath, relpath in redirect_pairs:
+        key = f"/{redirect_relpath}"
+        yield f"    {key.ljust(key_width)} {relpath};"
+    yield from [
+        "}",
+        'map "$cc_redirect_uri /$cc_redirect_destination"'
+        f" {NGINX_REDIRECT_VARIABLE} {{",
+        "    default         $cc_redirect_destination;",
+        '    ~^(\\S+)\\s\\1$ "";',
+        "}",
+    ]
 
 
 def parse_legal_code_filename(filename):
@@ -177,6 +706,18 @@ def parse_legal_code_filename(filename):
     return data
 
 
+def get_extraction_cache_key(importer, version, html_file, content):
+    """
+    Return the key of the results of an importer of load_html_files for the
+    content of a legacy HTML file in the extraction cache. The key includes
+    the importer and its version, the name of the file (which identifies the
+    legal code), and the sha256 digest of the content.
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    filename = os.path.basename(html_file)
+    return f"extraction:{importer}:{version}:{filename}:{digest}"
+
+
 def compute_canonical_url(category, unit, version, jurisdiction_code):
     """
     Compute the unique canonical URL for a license with the given attributes.
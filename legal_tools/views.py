@@ -1,6 +1,9 @@
 # Standard library
+import json
 import os.path
 import re
+from functools import lru_cache
+from itertools import chain, groupby
 from operator import itemgetter
 from typing import Iterable
 
@@ -10,7 +13,7 @@ import yaml
 from bs4 import BeautifulSoup
 from django.conf import settings
 from django.core.cache import caches
-from django.http import Http404, HttpResponse
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.template.loader import render_to_string
 from django.utils import translation
@@ -19,7 +22,6 @@ from django.utils import translation
 from i18n.utils import (
     active_translation,
     get_default_language_for_jurisdiction,
-    get_jurisdiction_name,
     load_deeds_ux_translations,
     map_django_to_transifex_language_code,
 )
@@ -36,6 +38,34 @@ NUM_COMMITS = 3
 # For removing the deed.foo section of a deed url
 REMOVE_DEED_URL_RE = re.compile(r"^(.*?/)(?:deed)?(?:\..*)?$")
 
+# The categories of the tools, in the order of the metadata documents
+METADATA_CATEGORIES = ("licenses", "publicdomain")
+
+# Use the libyaml based dumper when PyYAML was built with it
+YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+# Language independent list page data, by (category, path_start). This is
+# only set during a publish run (see init_views_list_cache()), where the list
+# pages of all of the languages are rendered from the same data.
+LIST_CACHE = None
+
+
+def init_views_list_cache(cache=None):
+    global LIST_CACHE
+    LIST_CACHE = cache
+
+
+def prettify_html(content):
+    """
+    Return the HTML content (bytes or a string) prettified by BeautifulSoup,
+    as bytes. The parse tree is decomposed as soon as the prettified string
+    is built, so that a page is not held as the content, its tree, and the
+    prettified string at once while the response is built.
+    """
+    soup = BeautifulSoup(content, features="lxml")
+    prettified = soup.prettify()
+    soup.decompose()
+    return prettified.encode("utf-8")
+
 
 def get_category_and_category_title(category=None, tool=None):
     # category
@@ -52,11 +82,36 @@ def get_category_and_category_title(category=None, tool=None):
     return category, category_title
 
 
-def get_languages_and_links_for_deeds_ux(request_path, selected_language_code):
-    languages_and_links = []
+@lru_cache(maxsize=None)
+def get_language_table(language_codes):
+    """
+    Return a tuple of (language_code, name_local, name_for_sorting) tuples,
+    sorted by name_for_sorting, for the given tuple of language codes.
 
-    for language_code in settings.LANGUAGES_MOSTLY_TRANSLATED:
+    The language selectors of every page are built from these tables, so
+    they are only built once for each set of languages.
+    """
+    language_table = []
+    for language_code in language_codes:
         language_info = translation.get_language_info(language_code)
+        language_table.append(
+            (
+                language_code,
+                # name_local: name of language in its own language
+                language_info["name_local"],
+                language_info["name_local"].lower(),
+            )
+        )
+    language_table.sort(key=itemgetter(2))
+    return tuple(language_table)
+
+
+def get_languages_and_links_for_deeds_ux(request_path, selected_language_code):
+    language_table = get_language_table(
+        tuple(settings.LANGUAGES_MOSTLY_TRANSLATED)
+    )
+    languages_and_links = []
+    for language_code, name_local, name_for_sorting in language_table:
         link = request_path.replace(
             f".{selected_language_code}",
             f".{language_code}",
@@ -64,13 +119,12 @@ def get_languages_and_links_for_deeds_ux(request_path, selected_language_code):
         languages_and_links.append(
             {
                 "cc_language_code": language_code,
-                "name_local": language_info["name_local"],
-                "name_for_sorting": language_info["name_local"].lower(),
+                "name_local": name_local,
+                "name_for_sorting": name_for_sorting,
                 "link": link,
                 "selected": selected_language_code == language_code,
             }
         )
-    languages_and_links.sort(key=itemgetter("name_for_sorting"))
     return languages_and_links
 
 
@@ -103,20 +157,27 @@ def get_languages_and_links_for_legal_codes(
     selected_language_code is a Django language code (lowercase IETF language
     tag)
     """
+    links = {}
+    for legal_code in legal_codes:
+        dirname, filename = os.path.split(legal_code.legal_code_url)
+        if dirname == path_start:
+            # Same directory (all of the legal codes of a tool are)
+            links[legal_code.language_code] = filename
+        else:
+            links[legal_code.language_code] = os.path.relpath(
+                legal_code.legal_code_url, start=path_start
+            )
+    language_table = get_language_table(tuple(links.keys()))
     languages_and_links = [
         {
-            "cc_language_code": legal_code.language_code,
-            # name_local: name of language in its own language
-            "name_local": name_local(legal_code),
-            "name_for_sorting": name_local(legal_code).lower(),
-            "link": os.path.relpath(
-                legal_code.legal_code_url, start=path_start
-            ),
-            "selected": selected_language_code == legal_code.language_code,
+            "cc_language_code": language_code,
+            "name_local": name_local,
+            "name_for_sorting": name_for_sorting,
+            "link": links[language_code],
+            "selected": selected_language_code == language_code,
         }
-        for legal_code in legal_codes
+        for language_code, name_local, name_for_sorting in language_table
     ]
-    languages_and_links.sort(key=itemgetter("name_for_sorting"))
     if len(languages_and_links) < 2:
         # Return an empty list if there are not multiple languages available
         # (this will result in the language dropdown not being shown with a
@@ -146,12 +207,6 @@ def get_deed_rel_path(
     return deed_rel_path
 
 
-def name_local(legal_code):
-    return translation.get_language_info(legal_code.language_code)[
-        "name_local"
-    ]
-
-
 def normalize_path_and_lang(request_path, jurisdiction, language_code):
     if not language_code:
         language_code = get_default_language_for_jurisdiction(
@@ -238,22 +293,19 @@ def view_dev_index(request):
         },
     )
 
-    html_response.content = bytes(
-        BeautifulSoup(html_response.content, features="lxml").prettify(),
-        "utf-8",
-    )
+    html_response.content = prettify_html(html_response.content)
     return html_response
 
 
-def view_list(request, category, language_code=None):
+def get_list_tools_and_units(category, path_start):
     """
-    Display all the available deeds and legal code for the given category.
+    Return the tools (one dict per legal code) and the units of the list page
+    for the given category. None of this depends on the language of the page,
+    so while LIST_CACHE is set it is only built once per category.
     """
-    request.path, language_code = normalize_path_and_lang(
-        request.path, None, language_code
-    )
-    if language_code not in settings.LANGUAGES_MOSTLY_TRANSLATED:
-        raise Http404(f"invalid language: {language_code}")
+    cache_key = (category, path_start)
+    if LIST_CACHE is not None and cache_key in LIST_CACHE:
+        return LIST_CACHE[cache_key]
     # Get the list of units and languages that occur among the tools
     # to let the template iterate over them as it likes.
     legal_code_objects = (
@@ -268,20 +320,14 @@ def view_list(request, category, language_code=None):
         )
     )
     tools = []
-    path_start = os.path.dirname(request.path)
     for lc in legal_code_objects:
-        lc_category = lc.tool.category
         lc_unit = lc.tool.unit
         lc_version = lc.tool.version
         lc_language_default = get_default_language_for_jurisdiction(
             lc.tool.jurisdiction_code,
         )
-        jurisdiction_name = get_jurisdiction_name(
-            lc_category,
-            lc_unit,
-            lc_version,
-            lc.tool.jurisdiction_code,
-        )
+        # Lazy, so it is translated when each list page is rendered
+        jurisdiction_name = translation.gettext_lazy(lc.tool.jurisdiction_name)
         deed_rel_path = get_deed_rel_path(
             lc.deed_url,
             path_start,
@@ -304,29 +350,48 @@ def view_list(request, category, language_code=None):
             identifier=lc.tool.identifier(),
         )
         tools.append(data)
-    category, category_title = get_category_and_category_title(
-        category,
-        None,
-    )
     if category == "licenses":
         # licenses
         tools = sorted(tools, reverse=True, key=itemgetter("version"))
         units = sorted(UNITS_LICENSES)
-        category_list = translation.gettext("Licenses List")
     else:
         # publicdomain
         tools = sorted(tools, key=itemgetter("identifier"))
         units = sorted(UNITS_PUBLIC_DOMAIN)
+    if LIST_CACHE is not None:
+        LIST_CACHE[cache_key] = (tools, units)
+    return tools, units
+
+
+def view_list(request, category, language_code=None):
+    """
+    Display all the available deeds and legal code for the given category.
+    """
+    request.path, language_code = normalize_path_and_lang(
+        request.path, None, language_code
+    )
+    if language_code not in settings.LANGUAGES_MOSTLY_TRANSLATED:
+        raise Http404(f"invalid language: {language_code}")
+    path_start = os.path.dirname(request.path)
+    tools, units = get_list_tools_and_units(category, path_start)
+    translation.activate(language_code)
+    category, category_title = get_category_and_category_title(
+        category,
+        None,
+    )
+    if category == "licenses":
+        category_list = translation.gettext("Licenses List")
+    else:
         category_list = translation.gettext("Public Domain List")
 
     languages_and_links = get_languages_and_links_for_deeds_ux(
         request_path=request.path,
         selected_language_code=language_code,
     )
-    translation.activate(language_code)
     html_response = render(
         request,
         template_name="list.html",
+        using=settings.PUBLIC_TEMPLATE_ENGINE,
         context={
             "category": category,
             "category_title": category_title,
@@ -336,10 +401,7 @@ def view_list(request, category, language_code=None):
             "units": units,
         },
     )
-    html_response.content = bytes(
-        BeautifulSoup(html_response.content, features="lxml").prettify(),
-        "utf-8",
-    )
+    html_response.content = prettify_html(html_response.content)
     return html_response
 
 
@@ -426,6 +488,7 @@ def view_deed(
     html_response = render(
         request,
         template_name="deed.html",
+        using=settings.PUBLIC_TEMPLATE_ENGINE,
         context={
             "additional_classes": "",
             "body_template": body_template,
@@ -438,10 +501,7 @@ def view_deed(
             "tool": tool,
         },
     )
-    html_response.content = bytes(
-        BeautifulSoup(html_response.content, features="lxml").prettify(),
-        "utf-8",
-    )
+    html_response.content = prettify_html(html_response.content)
     return html_response
 
 
@@ -471,7 +531,7 @@ def view_legal_code(
     #         legal_code_url=request.path,
     #     )
     legal_code = get_object_or_404(
-        LegalCode,
+        LegalCode.objects.with_html(),
         legal_code_url=request.path,
     )
 
@@ -497,6 +557,7 @@ def view_legal_code(
 
     kwargs = dict(
         template_name="legalcode.html",
+        using=settings.PUBLIC_TEMPLATE_ENGINE,
         context={
             "category": category,
             "category_title": category_title,
@@ -537,10 +598,7 @@ def view_legal_code(
         #         return response
         #
         html_response = render(request, **kwargs)
-        html_response.content = bytes(
-            BeautifulSoup(html_response.content, features="lxml").prettify(),
-            "utf-8",
-        )
+        html_response.content = prettify_html(html_response.content)
         return html_response
 
 
@@ -602,26 +660,99 @@ def view_branch_status(request, id):
                 "dev/branch_status.html",
                 context,
             )
-            html_response.content = bytes(
-                BeautifulSoup(
-                    html_response.content, features="lxml"
-                ).prettify(),
-                "utf-8",
-            )
+            html_response.content = prettify_html(html_response.content)
         cache.set(cachekey, html_response, 5 * 60)
     return html_response
 
 
-def view_metadata(request):
-    data = {"licenses": [], "publicdomain": []}
-    for tool in Tool.objects.all():
-        category = tool.category
-        data[category].append({f"{tool.resource_slug}": tool.get_metadata()})
-    yaml_bytes = yaml.dump(
-        data, default_flow_style=False, encoding="utf-8", allow_unicode=True
+def iter_tools_metadata():
+    """
+    Yield the category and the metadata of each tool, sorted by category.
+    The legal codes are prefetched so this uses two queries in total, and
+    the metadata of a tool is only built when it is consumed.
+    """
+    tools = Tool.objects.prefetch_related("legal_codes").order_by(
+        "category", *Tool._meta.ordering
+    )
+    for tool in tools:
+        yield tool.category, {f"{tool.resource_slug}": tool.get_metadata()}
+
+
+def group_tools_metadata(tools_metadata):
+    """
+    Yield each of METADATA_CATEGORIES and an iterator of the metadata of its
+    tools, from the (category, metadata) pairs of iter_tools_metadata().
+    """
+    groups = groupby(tools_metadata, key=itemgetter(0))
+    group = next(groups, None)
+    for category in METADATA_CATEGORIES:
+        if group is None or group[0] != category:
+            yield category, iter(())
+            continue
+        yield category, map(itemgetter(1), group[1])
+        group = next(groups, None)
+    if group is not None:
+        raise ValueError(f"Unknown tool category: {group[0]}")
+
+
+def iter_metadata_yaml(tools_metadata):
+    """
+    Yield the metadata as YAML (bytes), one tool at a time.
+    """
+    for category, tools in group_tools_metadata(tools_metadata):
+        first_tool = next(tools, None)
+        if first_tool is None:
+            yield f"{category}: []\n".encode("utf-8")
+            continue
+        yield f"{category}:\n".encode("utf-8")
+        for tool in chain([first_tool], tools):
+            # A block sequence in a mapping is not indented, so the tools
+            # can be dumped one by one
+            yield yaml.dump(
+                [tool],
+                Dumper=YAML_DUMPER,
+                default_flow_style=False,
+                encoding="utf-8",
+                allow_unicode=True,
+            )
+
+
+def iter_metadata_json(tools_metadata):
+    """
+    Yield the metadata as JSON (bytes), one tool at a time. The output is the
+    same as the encoding of the whole document.
+    """
+    encoder = json.JSONEncoder(
+        ensure_ascii=False, indent=2, sort_keys=True, default=str
     )
-    return HttpResponse(
-        yaml_bytes,
+    category_separator = "{"
+    for category, tools in group_tools_metadata(tools_metadata):
+        yield (
+            f"{category_separator}\n  {encoder.encode(category)}: ["
+        ).encode("utf-8")
+        category_separator = ","
+        tool_separator = "\n    "
+        closing = b"]"
+        for tool in tools:
+            # Newlines in strings are escaped, so the newlines of the encoded
+            # tool are its line breaks, which are indented to its level
+            tool_json = encoder.encode(tool).replace("\n", "\n    ")
+            yield f"{tool_separator}{tool_json}".encode("utf-8")
+            tool_separator = ",\n    "
+            closing = b"\n  ]"
+        yield closing
+    yield b"\n}\n"
+
+
+def view_metadata(request, output_format="yaml"):
+    tools_metadata = iter_tools_metadata()
+    if output_format == "json":
+        return StreamingHttpResponse(
+            iter_metadata_json(tools_metadata),
+            content_type="application/json",
+        )
+    return StreamingHttpResponse(
+        iter_metadata_yaml(tools_metadata),
         content_type="text/yaml; charset=utf-8",
     )
 
@@ -643,9 +774,6 @@ def render_redirect(title, destination, language_code):
     html_content = render_to_string(
         "redirect.html",
         context={"title": title, "destination": destination},
+        using=settings.PUBLIC_TEMPLATE_ENGINE,
     )
-    html_content = bytes(
-        BeautifulSoup(html_content, features="lxml").prettify(),
-        "utf-8",
-    )
-    return html_content
+    return prettify_html(html_content)
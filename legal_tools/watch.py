@@ -0,0 +1,209 @@
+"""
+Watch directories for changed files (see publish --watch): with inotify on
+Linux (called through ctypes, like renameat2() in legal_tools.utils), and by
+polling the modification times of the files elsewhere.
+"""
+# Standard library
+import ctypes
+import errno
+import logging
+import os
+import select
+import struct
+import time
+
+# First-party/Local
+from legal_tools.render_daemon import get_files_snapshot
+
+LOG = logging.getLogger(__name__)
+
+# See inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+IN_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len (of the name)
+IN_READ_SIZE = 64 * 1024
+
+# Changes are reported once the files have not changed for DEBOUNCE seconds,
+# or MAX_DELAY seconds after the first change
+DEBOUNCE = 0.2
+MAX_DELAY = 0.5
+POLLING_INTERVAL = 0.25
+
+
+def is_ignored(path):
+    """
+    Return True if the file is hidden, or is a temporary or backup file (ex.
+    of an editor).
+    """
+    filename = os.path.basename(path)
+    return filename.startswith((".", "#")) or filename.endswith(
+        ("~", ".swp", ".tmp")
+    )
+
+
+class InotifyWatcher:
+    """
+    Watch the directories (and their subdirectories) with inotify.
+    """
+
+    def __init__(self, dirs):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.inotify_add_watch = libc.inotify_add_watch
+        self.inotify_add_watch.argtypes = [
+            ctypes.c_int,
+            ctypes.c_char_p,
+            ctypes.c_uint32,
+        ]
+        self.dirs = dirs
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watched_dirs = {}
+        for top in dirs:
+            self.add_tree(top)
+
+    def add_tree(self, top):
+        """
+        Watch the directory and its subdirectories, and return the files in
+        them.
+        """
+        paths = set()
+        for dirpath, __, filenames in os.walk(top, followlinks=True):
+            wd = self.inotify_add_watch(
+                self.fd, os.fsencode(dirpath), IN_WATCH_MASK
+            )
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOENT:  # pragma: no cover
+                    continue
+                raise OSError(error, os.strerror(error), dirpath)
+            self.watched_dirs[wd] = dirpath
+            paths.update(
+                os.path.join(dirpath, filename) for filename in filenames
+            )
+        return paths
+
+    def read_events(self):
+        """
+        Return the files changed by the queued events.
+        """
+        paths = set()
+        while True:
+            try:
+                data = os.read(self.fd, IN_READ_SIZE)
+            except BlockingIOError:
+                return paths
+            offset = 0
+            while offset < len(data):
+                wd, mask, __, length = IN_EVENT.unpack_from(data, offset)
+                offset += IN_EVENT.size
+                (name,) = struct.unpack_from(f"{length}s", data, offset)
+                name = os.fsdecode(name.rstrip(b"\0"))
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost: report every file as changed
+                    LOG.warning("inotify event queue overflow")
+                    paths.update(get_files_snapshot(self.dirs))
+                    continue
+                dirpath = self.watched_dirs.get(wd)
+                if dirpath is None or not name:
+                    continue
+                path = os.path.join(dirpath, name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        paths.update(self.add_tree(path))
+                    continue
+                paths.add(path)
+
+    def wait(self, timeout=None):
+        """
+        Wait (up to timeout seconds, or forever) for changes and return the
+        changed files.
+        """
+        readable, __, __ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        return self.read_events()
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """
+    Watch the directories by comparing snapshots of the modification times of
+    their files.
+    """
+
+    def __init__(self, dirs, interval=POLLING_INTERVAL):
+        self.dirs = dirs
+        self.interval = interval
+        self.snapshot = get_files_snapshot(dirs)
+
+    def wait(self, timeout=None):
+        """
+        Wait (up to timeout seconds, or forever) for changes and return the
+        changed files.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = get_files_snapshot(self.dirs)
+            paths = {
+                path
+                for path in snapshot.keys() | self.snapshot.keys()
+                if snapshot.get(path) != self.snapshot.get(path)
+            }
+            self.snapshot = snapshot
+            if paths:
+                return paths
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - time.monotonic())
+                if delay <= 0:
+                    return set()
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+def get_watcher(dirs, polling=False):
+    """
+    Return an inotify watcher of the directories, or a polling watcher if
+    inotify is not available (or polling is requested).
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(dirs)
+        except (AttributeError, OSError) as e:
+            LOG.info(f"inotify is not available ({e}): polling for changes")
+    return PollingWatcher(dirs)
+
+
+def wait_for_changes(watcher, debounce=DEBOUNCE, max_delay=MAX_DELAY):
+    """
+    Wait for changes and return the changed files (except the ignored ones)
+    once the files have not changed for debounce seconds, or max_delay seconds
+    after the first change (so that a burst of writes, ex. a git checkout, is
+    handled at once).
+    """
+    paths = watcher.wait()
+    deadline = time.monotonic() + max_delay
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        more_paths = watcher.wait(min(debounce, remaining))
+        if not more_paths:
+            break
+        paths |= more_paths
+    return {path for path in paths if not is_ignored(path)}